@@ -1,17 +1,55 @@
 import json
-from fastapi import FastAPI
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Tuple
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from sqlalchemy import text
-from src.database.manager import SessionLocal, ScrapedPage, create_tables, save_scraped_content
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from src.config.memory import LOW_MEMORY_MODE, MEMORY_REPORT, release_memory, track_peak_memory
+from src.database.manager import (
+    create_tables, get_page_keywords, vector_search, vector_search_batch, load_page_contents, search_pages_by_passages,
+    get_topic_summaries,
+)
 from src.scrapers.web_scraper import scrape_url
-from src.analyzers.content_analyzer import analyze_qae_score, generate_embedding_for_long_text
+from src.scrapers.site_crawler import normalize_url
+from src.analyzers.content_analyzer import (
+    generate_embedding, generate_embedding_for_long_text, generate_passage_embeddings_batch,
+)
 from src.agents.researcher import find_top_competitor_urls
-from src.analyzers.strategist import generate_content_strategy
-import struct
+from src.agents.indexer import index_content, index_contents
+from src.agents.reembedder import start_background_reembedding
+from src.agents.deadline import Deadline
+from src.agents.topic_indexer import find_topic_competition, find_topic_gaps, start_background_topic_indexing
+from src.analyzers.strategist import StrategyGenerationError, generate_content_strategy
+from src.analyzers.bm25 import rank_texts
+from src.analyzers.near_duplicates import unique_text_indices
 
 app = FastAPI()
 
+MAX_BATCH_URLS = 500
+MAX_SCRAPE_CONCURRENCY = 4 if LOW_MEMORY_MODE else 16
+EMBED_BATCH_SIZE = 4 if LOW_MEMORY_MODE else 16  # Scraped pages embedded and saved together
+EMBED_BATCH_MAX_WAIT = 2.0  # Seconds a scraped page may wait for its batch to fill
+
+# End-to-end budget of /api/generate-full-strategy; each stage gets a share of what is left
+STRATEGY_DEADLINE_SECONDS = float(os.getenv("STRATEGY_DEADLINE_SECONDS", "60"))
+MAX_STRATEGY_DEADLINE_SECONDS = 300
+ENOUGH_COMPETITORS = 2  # Stop waiting on slow competitor pages once this many are scraped
+STRAGGLER_GRACE_SECONDS = 1.0
+MIN_SEARCH_SECONDS = 2.0
+MIN_LLM_SECONDS = 3.0  # Kept back for the LLM by every earlier stage
+RESPONSE_MARGIN_SECONDS = 0.5
+
+MAX_PORTFOLIO_KEYWORDS = 50
+PORTFOLIO_DEADLINE_SECONDS = float(os.getenv("PORTFOLIO_DEADLINE_SECONDS", "300"))
+MAX_PORTFOLIO_DEADLINE_SECONDS = 900
+SERP_CONCURRENCY = 8
+PORTFOLIO_LLM_CONCURRENCY = 2 if LOW_MEMORY_MODE else 4
+MAX_PORTFOLIO_LLM_CONCURRENCY = 8
+
 origins = [
     "https://atlas-ai-source-auth-0iyo.bolt.host",
     "https://atlas-seo-agent-nsa8.onrender.com",
@@ -26,26 +64,117 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def report_memory(request: Request, call_next):
+    """Report each request's peak memory (MEMORY_REPORT) and trim the heap afterwards (LOW_MEMORY_MODE)."""
+    if not (MEMORY_REPORT or LOW_MEMORY_MODE):
+        return await call_next(request)
+    # Streaming responses are measured up to their first byte
+    with track_peak_memory(f"{request.method} {request.url.path}") as report:
+        response = await call_next(request)
+    for key, value in report.items():
+        response.headers[f"X-Memory-{key.replace('_', '-')}"] = str(value)
+    if LOW_MEMORY_MODE:
+        release_memory()
+    return response
+
 class UrlRequest(BaseModel):
     url: str
 
 class KeywordRequest(BaseModel):
     keyword: str
+    deadline_seconds: Optional[float] = Field(None, gt=0, le=MAX_STRATEGY_DEADLINE_SECONDS)
+
+class BatchAnalyzeRequest(BaseModel):
+    urls: List[str]
+    concurrency: int = 8
+
+class PortfolioRequest(BaseModel):
+    keywords: List[str]
+    llm_concurrency: int = PORTFOLIO_LLM_CONCURRENCY
+    deadline_seconds: Optional[float] = Field(None, gt=0, le=MAX_PORTFOLIO_DEADLINE_SECONDS)
+
+class TopicGapRequest(BaseModel):
+    url: str
+    keywords: List[str] = []
+
+class PassageSearchRequest(BaseModel):
+    query: str
+    limit: int = 5
 
 @app.on_event("startup")
 def on_startup():
     create_tables()
+    # Pages stored under another embedding model or dimension are migrated while the API serves
+    start_background_reembedding()
+    # Topic clusters back gap analysis and prune vector search
+    start_background_topic_indexing()
 
 @app.post("/api/analyze")
 def analyze_and_store_url(request: UrlRequest):
-    # This endpoint is working perfectly and needs no changes.
     target_url = request.url
-    content = scrape_url(target_url)
+    content = scrape_url(target_url, learn=True)
     if not content: return {"error": "Failed to scrape the URL."}
-    qae_score = analyze_qae_score(content)
-    embedding = generate_embedding_for_long_text(content)
-    save_scraped_content(target_url, content, qae_score, embedding)
-    return {"url": target_url, "qae_score": qae_score, "status": "Analyzed and Saved Successfully"}
+    result = index_content(target_url, content)
+    if "duplicate_of" not in result:
+        result["top_keywords"] = [term for term, _ in get_page_keywords(target_url)]
+    return result
+
+def _ndjson(result: dict) -> str:
+    return json.dumps(result) + "\n"
+
+def _stream_batch_analysis(urls: List[str], concurrency: int):
+    """Scrape concurrently, index in batches, and yield one NDJSON line per URL as it finishes."""
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    futures = {executor.submit(scrape_url, url, learn=True): url for url in urls}
+    pending = set(futures)
+    scraped = []
+    batch_started = None
+    try:
+        while pending or scraped:
+            timeout = None
+            if scraped:
+                timeout = max(0.0, batch_started + EMBED_BATCH_MAX_WAIT - time.monotonic())
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED) if pending else (set(), set())
+            for future in done:
+                url = futures[future]
+                try:
+                    content = future.result()
+                except Exception as e:
+                    yield _ndjson({"url": url, "error": f"Failed to scrape the URL: {e}"})
+                    continue
+                if not content:
+                    yield _ndjson({"url": url, "error": "Failed to scrape the URL."})
+                    continue
+                if not scraped:
+                    batch_started = time.monotonic()
+                scraped.append((url, content))
+
+            batch_due = scraped and time.monotonic() >= batch_started + EMBED_BATCH_MAX_WAIT
+            if len(scraped) >= EMBED_BATCH_SIZE or batch_due or (scraped and not pending):
+                batch, scraped = scraped[:EMBED_BATCH_SIZE], scraped[EMBED_BATCH_SIZE:]
+                batch_started = time.monotonic()
+                try:
+                    results = index_contents(batch)
+                except Exception as e:
+                    print(f"❌ Error indexing batch: {e}")
+                    results = [{"url": url, "error": str(e)} for url, _ in batch]
+                for result in results:
+                    yield _ndjson(result)
+    finally:
+        # Client disconnected or we are done: drop scrapes that have not started
+        executor.shutdown(wait=False, cancel_futures=True)
+
+@app.post("/api/analyze-batch")
+def analyze_and_store_urls(request: BatchAnalyzeRequest):
+    """Analyze many URLs, streaming one JSON result per line (application/x-ndjson) in completion order."""
+    urls = list(dict.fromkeys(url.strip() for url in request.urls if url.strip()))
+    if not urls:
+        raise HTTPException(status_code=400, detail="No URLs given.")
+    if len(urls) > MAX_BATCH_URLS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_URLS} URLs per batch.")
+    concurrency = min(max(request.concurrency, 1), MAX_SCRAPE_CONCURRENCY)
+    return StreamingResponse(_stream_batch_analysis(urls, concurrency), media_type="application/x-ndjson")
 
 @app.post("/api/search")
 def search_similar_articles(request: UrlRequest):
@@ -54,116 +183,369 @@ def search_similar_articles(request: UrlRequest):
     if not content: return {"error": "Failed to scrape the target URL for search."}
     
     search_embedding = generate_embedding_for_long_text(content)
-    search_embedding_list = search_embedding.tolist()
-    search_binary = struct.pack('384f', *search_embedding_list)
-    
-    db = SessionLocal()
+    results = vector_search(search_embedding, top_k=5)
+    similar_articles = [
+        {"url": row["url"], "qae_score": row["qae_score"], "distance": f"{row['distance']:.4f}"}
+        for row in results
+    ]
+    return {"search_target": target_url, "similar_articles": similar_articles}
+
+@app.post("/api/search-passages")
+def search_passages(request: PassageSearchRequest):
+    query_embedding = generate_embedding(request.query)
+    pages = search_pages_by_passages(query_embedding, top_k=request.limit)
+    return {"query": request.query, "pages": pages}
+
+@app.get("/api/topics")
+def list_topics():
+    return {"topics": get_topic_summaries()}
+
+@app.post("/api/topic-gaps")
+def topic_gaps(request: TopicGapRequest):
+    gaps = find_topic_gaps(request.url, request.keywords)
+    if gaps is None:
+        raise HTTPException(status_code=503, detail="The topic index has not been built yet.")
+    gaps["competition"] = find_topic_competition(request.url)
+    return gaps
+
+def _scrape_competitors(urls: List[str], timeout: float, enough: int,
+                        max_workers: Optional[int] = None) -> Tuple[Dict[str, str], List[str]]:
+    """
+    Scrape competitor pages concurrently within ``timeout`` seconds.
+
+    Once ``enough`` pages have been scraped, stragglers get a short grace
+    period and are then abandoned; pages not yet started are cancelled.
+    ``max_workers`` bounds the concurrent fetches (default: all at once).
+
+    Returns:
+        ``(contents, abandoned)``: scraped text by URL and the URLs given up on
+    """
+    contents = {}
+    stage_end = time.monotonic() + timeout
+    abandon = threading.Event()
+    executor = ThreadPoolExecutor(max_workers=min(max_workers or len(urls), len(urls)))
+    futures = {executor.submit(scrape_url, url, timeout=max(1.0, timeout), cancelled=abandon): url for url in urls}
+    pending = set(futures)
     try:
-        query = text("""
-            SELECT url, qae_score,
-                   VEC_L2_DISTANCE(VECTOR_FROM_BINARY(content_embedding, 384), VECTOR_FROM_BINARY(:search_vec, 384)) AS distance
-            FROM scraped_pages
-            WHERE content_embedding IS NOT NULL
-            ORDER BY distance ASC LIMIT 5;
-        """)
-        
-        results = db.execute(query, {"search_vec": search_binary}).fetchall()
-        similar_articles = [
-            {"url": row.url, "qae_score": row.qae_score, "distance": f"{row.distance:.4f}"}
-            for row in results
-        ]
-        return {"search_target": target_url, "similar_articles": similar_articles}
+        while pending:
+            wait_for = stage_end - time.monotonic()
+            if wait_for <= 0:
+                break
+            done, pending = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+            for future in done:
+                url = futures[future]
+                try:
+                    content = future.result()
+                except Exception as scrape_error:
+                    print(f"Error scraping URL: {url} - {scrape_error}")
+                    continue
+                if content:
+                    contents[url] = content
+                    print(f"Successfully scraped: {url}")
+                else:
+                    print(f"No content scraped for: {url}")
+            if len(contents) >= enough:
+                stage_end = min(stage_end, time.monotonic() + STRAGGLER_GRACE_SECONDS)
+    finally:
+        # Fetches already running stop at their next body chunk and skip parsing, so nothing is
+        # written on behalf of a response that has already been sent
+        abandon.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+    return contents, [futures[future] for future in pending]
+
+def _run_with_timeout(timeout: float, fn, *args):
+    """
+    Run ``fn(*args)`` on a worker thread and wait at most ``timeout`` seconds for it.
+
+    Returns:
+        ``(finished, result)``; an unfinished call keeps running in the background and its result is dropped.
+        Exceptions raised by ``fn`` propagate.
+    """
+    executor = ThreadPoolExecutor(max_workers=1)
+    future = executor.submit(fn, *args)
+    try:
+        done, _ = wait([future], timeout=timeout)
     finally:
-        db.close()
+        executor.shutdown(wait=False)
+    if not done:
+        return False, None
+    return True, future.result()
+
+def _semantic_search(query_text: str):
+    """Vector hits for a competitor page and the stored texts of the hits."""
+    search_embedding = generate_embedding_for_long_text(query_text)
+    print("Generated search embedding, dimensions:", len(search_embedding))
+    print("Executing vector similarity query...")
+    results = vector_search(search_embedding, top_k=5)
+    return results, load_page_contents([row["page_id"] for row in results])
+
+def _batched_semantic_search(query_pages: List[str]):
+    """Vector hits for each query page from one batched search, and the stored texts of all hits."""
+    embedded = generate_passage_embeddings_batch(query_pages)
+    hits = vector_search_batch([embedding for embedding, _ in embedded], top_k=5)
+    return hits, load_page_contents(list({row["page_id"] for rows in hits for row in rows}))
 
 @app.post("/api/generate-full-strategy")
 def generate_full_strategy(request: KeywordRequest):
-    print(f"--- Starting Full Strategy Generation for keyword: {request.keyword} ---")
+    budget = min(request.deadline_seconds or STRATEGY_DEADLINE_SECONDS, MAX_STRATEGY_DEADLINE_SECONDS)
+    deadline = Deadline(budget)
+    print(f"--- Starting Full Strategy Generation for keyword: {request.keyword} ({budget:.0f}s budget) ---")
     try:
         print("[1/4] Researching top competitors...")
-        competitor_urls = find_top_competitor_urls(request.keyword)
+        with deadline.stage("research", deadline.stage_timeout(0.3, cap=30, reserve=MIN_LLM_SECONDS)) as stage:
+            competitor_urls = find_top_competitor_urls(request.keyword, timeout=max(1.0, stage["timeout_s"]))
         if not competitor_urls:
-            return {"error": "Could not find any competitors for the keyword."}
+            return {"error": "Could not find any competitors for the keyword.", "deadline": deadline.report()}
         print(f"Found competitors: {competitor_urls}")
         
         print("\n[2/4] Analyzing and vectorizing competitors...")
-        competitor_texts = []
-        for url in competitor_urls:
-            try:
-                content = scrape_url(url)
-                if content:
-                    competitor_texts.append(content)
-                    print(f"Successfully scraped and embedded: {url}")
-                else:
-                    print(f"No content scraped for: {url}")
-            except Exception as scrape_error:
-                print(f"Error scraping URL: {url} - {scrape_error}")
-                continue  # Skip failed URLs
+        with deadline.stage("scrape", deadline.stage_timeout(0.5, cap=20, reserve=MIN_LLM_SECONDS)) as stage:
+            scraped, abandoned = _scrape_competitors(
+                competitor_urls, stage["timeout_s"], min(ENOUGH_COMPETITORS, len(competitor_urls)))
+            if abandoned:
+                deadline.cut_short("scrape", f"gave up on {len(abandoned)} slow page(s)")
+                stage["abandoned"] = abandoned
+        competitor_texts = [scraped[url] for url in competitor_urls if url in scraped]
         
         if not competitor_texts:
-            return {"error": "Could not scrape any competitor content. Try a different keyword."}
+            return {"error": "Could not scrape any competitor content. Try a different keyword.",
+                    "deadline": deadline.report()}
+        unique_indices = unique_text_indices(competitor_texts)
+        if len(unique_indices) < len(competitor_texts):
+            print(f"Dropped {len(competitor_texts) - len(unique_indices)} near-duplicate competitor pages")
+        competitor_texts = [competitor_texts[i] for i in unique_indices]
         print(f"Analyzed {len(competitor_texts)} competitors")
         
-        print("\n[3/4] Performing semantic analysis in TiDB...")
-        # Use the first scraped content for search embedding
-        first_content = competitor_texts[0]
-        search_embedding = generate_embedding_for_long_text(first_content)
-        search_embedding_list = search_embedding.tolist()
-        search_binary = struct.pack('384f', *search_embedding_list)
-        print("Generated search embedding, binary length:", len(search_binary))
-        
-        db = SessionLocal()
         similar_texts = []
         results = []
-        try:
-            print("Executing TiDB vector similarity query...")
-            query = text("""
-                SELECT url, content FROM scraped_pages
-                WHERE content_embedding IS NOT NULL
-                ORDER BY VEC_L2_DISTANCE(VECTOR_FROM_BINARY(content_embedding, 384), VECTOR_FROM_BINARY(:search_vec, 384)) ASC
-                LIMIT 5;
-            """)
-            
-            results = db.execute(query, {"search_vec": search_binary}).fetchall()
-            if results:
-                similar_texts = [row.content for row in results if row.content]
-                print(f"Retrieved {len(similar_texts)} competitor texts from TiDB vector search")
-        except Exception as vector_error:
-            print(f"TiDB vector query failed (expected if not enabled): {vector_error}")
-            results = []  # Ensure results is defined for suggested_article
+        contents = {}
+        if deadline.remaining() - MIN_LLM_SECONDS < MIN_SEARCH_SECONDS:
+            print("\n[3/4] Skipping semantic analysis: deadline nearly spent")
+            deadline.skip("search", "deadline nearly spent")
+        else:
+            print("\n[3/4] Performing semantic analysis in TiDB...")
+            with deadline.stage("search", deadline.stage_timeout(0.3, reserve=MIN_LLM_SECONDS)) as stage:
+                try:
+                    # Use the first scraped content for search embedding
+                    finished, found = _run_with_timeout(stage["timeout_s"], _semantic_search, competitor_texts[0])
+                    if finished:
+                        results, contents = found
+                        similar_texts = [contents[row["page_id"]] for row in results if row["page_id"] in contents]
+                        print(f"Retrieved {len(similar_texts)} competitor texts from vector search")
+                    else:
+                        print("Vector search ran past its budget")
+                        deadline.cut_short("search", "gave up on vector search")
+                except Exception as vector_error:
+                    print(f"Vector query failed: {vector_error}")
+                    results = []  # Ensure results is defined for suggested_article
+        
+        if not similar_texts:
             # Fallback to text search on scraped content
             try:
-                print("Falling back to text search...")
-                for competitor_text in competitor_texts:
-                    if request.keyword.lower() in competitor_text.lower():
-                        similar_texts.append(competitor_text)
-                similar_texts = similar_texts[:3]
+                print("Falling back to BM25 text search...")
+                ranked = rank_texts(request.keyword, competitor_texts, top_k=3)
+                similar_texts = [competitor_texts[index] for index, _ in ranked]
                 print(f"Fallback text search retrieved {len(similar_texts)} texts")
             except Exception as text_error:
                 print(f"Text fallback also failed: {text_error}")
                 similar_texts = []
-        finally:
-            db.close()
+        
+        similar_texts = [similar_texts[i] for i in unique_text_indices(similar_texts)]
         
         if not similar_texts:
             print("No similar texts found, using scraped competitor texts")
             similar_texts = competitor_texts[:3]  # Use scraped ones as fallback
         
-        print("\n[4/4] Generating final content blueprint with Kimi AI...")
-        strategy_blueprint = generate_content_strategy(similar_texts)
+        strategy_blueprint = None
+        strategy_error = None
+        llm_timeout = deadline.remaining() - RESPONSE_MARGIN_SECONDS
+        if llm_timeout < MIN_LLM_SECONDS:
+            print("\n[4/4] Skipping content blueprint: deadline spent")
+            deadline.skip("strategy", "deadline spent")
+        else:
+            print(f"\n[4/4] Generating final content blueprint with Kimi AI ({llm_timeout:.1f}s left)...")
+            with deadline.stage("strategy", llm_timeout):
+                try:
+                    strategy_blueprint = generate_content_strategy(similar_texts, timeout=llm_timeout)
+                except StrategyGenerationError as llm_error:
+                    strategy_error = f"Strategy generation failed: {llm_error}"
         
         # Add suggested article from top similar result
         suggested_article = None
         if results and len(results) > 0:
             top_result = results[0]
-            suggested_article = {"url": top_result.url, "content": top_result.content}
+            suggested_article = {"url": top_result["url"], "content": contents.get(top_result["page_id"])}
         
-        print("\n--- ✅ Full Strategy Generation Complete! ---")
-        return {
+        report = deadline.report()
+        print(f"\n--- ✅ Full Strategy Generation Complete{' (partial)' if report['partial'] else ''}! ---")
+        response = {
             "strategy_blueprint": strategy_blueprint,
-            "suggested_article": suggested_article
+            "suggested_article": suggested_article,
+            "deadline": report,
         }
+        if strategy_error:
+            response["error"] = strategy_error
+        return response
 
     except Exception as e:
         print(f"An unexpected error occurred in the full strategy workflow: {e}")
-        return {"error": str(e)}
\ No newline at end of file
+        return {"error": str(e), "deadline": deadline.report()}
+
+def _research_keywords(keywords: List[str], timeout: float) -> Tuple[Dict[str, List[str]], List[str]]:
+    """
+    Run the SERP lookups for ``keywords`` concurrently within ``timeout`` seconds.
+
+    Returns:
+        ``(competitor_urls, unfinished)``: competitor URLs by keyword and the keywords still pending at the deadline
+    """
+    competitor_urls = {}
+    executor = ThreadPoolExecutor(max_workers=min(SERP_CONCURRENCY, len(keywords)))
+    futures = {executor.submit(find_top_competitor_urls, keyword, timeout=max(1.0, timeout)): keyword
+               for keyword in keywords}
+    try:
+        done, pending = wait(futures, timeout=timeout)
+        for future in done:
+            keyword = futures[future]
+            try:
+                competitor_urls[keyword] = future.result()
+            except Exception as research_error:
+                print(f"Error researching keyword: {keyword} - {research_error}")
+                competitor_urls[keyword] = []
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    return competitor_urls, [futures[future] for future in pending]
+
+def _similar_texts(keyword: str, competitor_texts: List[str], results: List[dict], contents: Dict[int, str]) -> List[str]:
+    """Texts handed to the LLM for one keyword: vector hits, else BM25 over its competitors, deduplicated."""
+    similar_texts = [contents[row["page_id"]] for row in results if row["page_id"] in contents]
+    if not similar_texts:
+        ranked = rank_texts(keyword, competitor_texts, top_k=3)
+        similar_texts = [competitor_texts[index] for index, _ in ranked]
+    similar_texts = [similar_texts[i] for i in unique_text_indices(similar_texts)]
+    return similar_texts or competitor_texts[:3]
+
+@app.post("/api/generate-portfolio-strategy")
+def generate_portfolio_strategy(request: PortfolioRequest):
+    """
+    Content strategies for a list of related keywords with shared fetch and embed work.
+
+    SERP lookups fan out concurrently and the union of competitor URLs is
+    deduplicated, so each unique page is scraped and embedded once however
+    many keywords rank it. All keyword queries run as one batched vector
+    search, and strategies are generated with bounded LLM concurrency.
+    """
+    keywords = list(dict.fromkeys(" ".join(keyword.split()) for keyword in request.keywords if keyword.strip()))
+    if not keywords:
+        raise HTTPException(status_code=400, detail="Provide at least one keyword.")
+    if len(keywords) > MAX_PORTFOLIO_KEYWORDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_PORTFOLIO_KEYWORDS} keywords per portfolio.")
+    llm_concurrency = max(1, min(request.llm_concurrency, MAX_PORTFOLIO_LLM_CONCURRENCY))
+    budget = min(request.deadline_seconds or PORTFOLIO_DEADLINE_SECONDS, MAX_PORTFOLIO_DEADLINE_SECONDS)
+    deadline = Deadline(budget)
+    print(f"--- Starting Portfolio Strategy Generation for {len(keywords)} keywords ({budget:.0f}s budget) ---")
+    report = {keyword: {"competitors": []} for keyword in keywords}
+
+    print("[1/4] Researching top competitors for every keyword...")
+    with deadline.stage("research", deadline.stage_timeout(0.2, cap=60, reserve=MIN_LLM_SECONDS)) as stage:
+        competitor_urls, unfinished = _research_keywords(keywords, stage["timeout_s"])
+        if unfinished:
+            deadline.cut_short("research", f"{len(unfinished)} SERP lookup(s) still pending")
+
+    # Canonical URL -> URL as returned by the first keyword ranking it
+    unique_urls: Dict[str, str] = {}
+    keyword_urls: Dict[str, List[str]] = {}
+    for keyword in keywords:
+        canonical = []
+        for url in competitor_urls.get(keyword, []):
+            key = normalize_url(url) or url
+            unique_urls.setdefault(key, url)
+            if key not in canonical:
+                canonical.append(key)
+        keyword_urls[keyword] = canonical
+        report[keyword]["competitors"] = [unique_urls[key] for key in canonical]
+    pairs = sum(len(urls) for urls in keyword_urls.values())
+    print(f"Found {len(unique_urls)} unique competitor pages across {pairs} keyword rankings")
+
+    scraped_texts: Dict[str, str] = {}
+    if unique_urls:
+        print(f"\n[2/4] Scraping {len(unique_urls)} unique competitor pages...")
+        with deadline.stage("scrape", deadline.stage_timeout(0.5, cap=180, reserve=MIN_LLM_SECONDS)) as stage:
+            by_url, abandoned = _scrape_competitors(list(unique_urls.values()), stage["timeout_s"],
+                                                    len(unique_urls), max_workers=MAX_SCRAPE_CONCURRENCY)
+            if abandoned:
+                deadline.cut_short("scrape", f"gave up on {len(abandoned)} slow page(s)")
+                stage["abandoned"] = abandoned
+        scraped_texts = {key: by_url[url] for key, url in unique_urls.items() if url in by_url}
+
+    keyword_texts: Dict[str, List[str]] = {}
+    for keyword in keywords:
+        texts = [scraped_texts[key] for key in keyword_urls[keyword] if key in scraped_texts]
+        keyword_texts[keyword] = [texts[i] for i in unique_text_indices(texts)]
+        if not keyword_texts[keyword]:
+            report[keyword]["error"] = ("Could not find any competitors for the keyword." if not keyword_urls[keyword]
+                                        else "Could not scrape any competitor content.")
+    ready = [keyword for keyword in keywords if keyword_texts[keyword]]
+
+    # Like the single-keyword flow, each keyword searches with its first competitor page;
+    # keywords sharing that page share the query
+    query_pages = list(dict.fromkeys(keyword_texts[keyword][0] for keyword in ready))
+    search_results: Dict[str, List[dict]] = {}
+    contents: Dict[int, str] = {}
+    if query_pages and deadline.remaining() - MIN_LLM_SECONDS < MIN_SEARCH_SECONDS:
+        print("\n[3/4] Skipping semantic analysis: deadline nearly spent")
+        deadline.skip("search", "deadline nearly spent")
+    elif query_pages:
+        print(f"\n[3/4] Embedding {len(query_pages)} query pages and running one batched vector search...")
+        with deadline.stage("search", deadline.stage_timeout(0.3, reserve=MIN_LLM_SECONDS)) as stage:
+            try:
+                finished, found = _run_with_timeout(stage["timeout_s"], _batched_semantic_search, query_pages)
+                if finished:
+                    hits, contents = found
+                    by_page = dict(zip(query_pages, hits))
+                    search_results = {keyword: by_page[keyword_texts[keyword][0]] for keyword in ready}
+                    print(f"Retrieved {len(contents)} stored pages from vector search")
+                else:
+                    print("Vector search ran past its budget")
+                    deadline.cut_short("search", "gave up on vector search")
+            except Exception as vector_error:
+                print(f"Vector query failed: {vector_error}")
+                search_results = {}
+
+    print(f"\n[4/4] Generating {len(ready)} content blueprints with Kimi AI ({llm_concurrency} at a time)...")
+    with deadline.stage("strategy", max(0.0, deadline.remaining() - RESPONSE_MARGIN_SECONDS)) as stage:
+        def generate(keyword: str):
+            """Blueprint for one keyword, or None and the reason; one failure must not lose the others."""
+            llm_timeout = deadline.remaining() - RESPONSE_MARGIN_SECONDS
+            if llm_timeout < MIN_LLM_SECONDS:
+                skipped.append(keyword)
+                return None, "Deadline spent before the strategy could be generated."
+            try:
+                similar_texts = _similar_texts(keyword, keyword_texts[keyword], search_results.get(keyword, []), contents)
+                return generate_content_strategy(similar_texts, timeout=llm_timeout), None
+            except Exception as strategy_error:
+                print(f"❌ Strategy generation failed for '{keyword}': {strategy_error}")
+                return None, f"Strategy generation failed: {strategy_error}"
+
+        skipped = []
+        if ready:
+            with ThreadPoolExecutor(max_workers=min(llm_concurrency, len(ready))) as executor:
+                for keyword, (blueprint, error) in zip(ready, executor.map(generate, ready)):
+                    if error:
+                        report[keyword]["error"] = error
+                        continue
+                    report[keyword]["strategy_blueprint"] = blueprint
+                    results = search_results.get(keyword)
+                    report[keyword]["suggested_article"] = (
+                        {"url": results[0]["url"], "content": contents.get(results[0]["page_id"])} if results else None)
+        if skipped:
+            deadline.cut_short("strategy", f"{len(skipped)} keyword(s) skipped")
+
+    deadline_report = deadline.report()
+    print(f"\n--- ✅ Portfolio Strategy Generation Complete{' (partial)' if deadline_report['partial'] else ''}! ---")
+    return {
+        "keywords": report,
+        "unique_pages": len(unique_urls),
+        "scraped_pages": len(scraped_texts),
+        "fetches_saved": pairs - len(unique_urls),
+        "deadline": deadline_report,
+    }
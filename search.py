@@ -1,15 +1,8 @@
 import sys
-import numpy as np
-from src.database.manager import SessionLocal, ScrapedPage
+from src.database.manager import vector_search
 from src.scrapers.web_scraper import scrape_url
 from src.analyzers.content_analyzer import generate_embedding
 
-def cosine_similarity(vec1, vec2):
-    """Calculate cosine similarity between two vectors."""
-    vec1 = np.array(vec1)
-    vec2 = np.array(vec2)
-    return np.dot(vec1, vec2) / (np.linalg.norm(vec1) * np.linalg.norm(vec2))
-
 def find_similar_articles(url: str, limit: int = 5):
     """
     Finds and prints the most semantically similar articles
@@ -29,37 +22,24 @@ def find_similar_articles(url: str, limit: int = 5):
     
     search_embedding = generate_embedding(content)
     
-    db = SessionLocal()
     try:
         print("\nSearching the database for similar content...")
         
-        # 2. Fetch all articles from the database
-        articles = db.query(ScrapedPage).filter(ScrapedPage.content_embedding.isnot(None)).all()
+        # 2. Search pages embedded with the active version, in its stored vector space
+        top_articles = vector_search(search_embedding, top_k=limit)
         
-        if not articles:
-            print("No articles with embeddings found in the database.")
+        if not top_articles:
+            print("No articles with current embeddings found in the database.")
             return
         
-        # 3. Calculate similarity scores
-        similarities = []
-        for article in articles:
-            if article.content_embedding:
-                similarity = cosine_similarity(search_embedding, article.content_embedding)
-                similarities.append((article, similarity))
-        
-        # 4. Sort by similarity (higher is better)
-        similarities.sort(key=lambda x: x[1], reverse=True)
-        
         print("\n--- Top Similar Articles Found ---")
-        for i, (article, similarity) in enumerate(similarities[:limit]):
-            print(f"{i+1}. URL: {article.url}")
-            print(f"   QAE Score: {article.qae_score}")
-            print(f"   Similarity Score: {similarity:.4f}\n")
+        for i, article in enumerate(top_articles):
+            print(f"{i+1}. URL: {article['url']}")
+            print(f"   QAE Score: {article['qae_score']}")
+            print(f"   Distance: {article['distance']:.4f} (lower is more similar)\n")
 
     except Exception as e:
         print(f"❌ An error occurred during the search: {e}")
-    finally:
-        db.close()
 
 if __name__ == "__main__":
     if len(sys.argv) < 2:
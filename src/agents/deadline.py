@@ -0,0 +1,70 @@
+"""Request-level time budget that the stages of a pipeline draw their timeouts from."""
+import contextlib
+import time
+from typing import Any, Dict, Iterator, Optional
+
+
+class Deadline:
+    """
+    A fixed end time for a whole request.
+
+    Each stage asks for a share of whatever is left, so an early stage that
+    runs long shrinks the later ones instead of pushing the response past
+    the budget. Stages are recorded, along with whether they were cut short,
+    for the response.
+    """
+
+    def __init__(self, budget_seconds: float):
+        self.budget = budget_seconds
+        self.started_at = time.monotonic()
+        self.expires_at = self.started_at + budget_seconds
+        self.stages: Dict[str, Dict[str, Any]] = {}
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def stage_timeout(self, share: float, cap: Optional[float] = None, reserve: float = 0.0) -> float:
+        """
+        Seconds granted to the next stage.
+
+        Args:
+            share: Fraction of the remaining time (after ``reserve``) to grant
+            cap: Upper bound regardless of how much time is left
+            reserve: Seconds to keep back for the stages that must follow
+        """
+        timeout = max(0.0, self.remaining() - reserve) * share
+        return min(timeout, cap) if cap is not None else timeout
+
+    @contextlib.contextmanager
+    def stage(self, name: str, timeout: float) -> Iterator[Dict[str, Any]]:
+        """
+        Time a stage against its granted timeout.
+
+        Yields the stage record; a stage that used up its timeout is marked
+        as cut short automatically, others can be marked with ``cut_short``.
+        """
+        record = {"timeout_s": round(timeout, 2), "cut_short": False}
+        self.stages[name] = record
+        started = time.monotonic()
+        try:
+            yield record
+        finally:
+            record["elapsed_s"] = round(time.monotonic() - started, 2)
+            if not record["cut_short"] and time.monotonic() - started >= timeout:
+                self.cut_short(name, "ran past its budget")
+
+    def skip(self, name: str, reason: str):
+        """Record a stage that did not run for lack of time."""
+        self.stages[name] = {"timeout_s": 0.0, "elapsed_s": 0.0, "cut_short": True, "reason": reason}
+
+    def cut_short(self, name: str, reason: str):
+        self.stages[name]["cut_short"] = True
+        self.stages[name]["reason"] = reason
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "budget_s": self.budget,
+            "elapsed_s": round(time.monotonic() - self.started_at, 2),
+            "partial": any(stage["cut_short"] for stage in self.stages.values()),
+            "stages": self.stages,
+        }
@@ -0,0 +1,101 @@
+"""Shared analyze-and-store path for freshly scraped page content."""
+from typing import Any, Dict, List, Tuple
+
+from src.database.manager import (
+    find_near_duplicates, find_near_duplicates_batch, save_scraped_content, save_scraped_pages,
+)
+from src.analyzers.content_analyzer import (
+    analyze_qae_score, generate_passage_embeddings, generate_passage_embeddings_batch,
+)
+from src.analyzers.near_duplicates import LSHIndex, minhash_signature
+
+SAVED_STATUS = "Analyzed and Saved Successfully"
+DUPLICATE_STATUS = "Near-duplicate Saved Without Embedding"
+
+
+def index_content(url: str, content: str) -> Dict[str, Any]:
+    """
+    Score, embed and store a page's content.
+
+    Near-duplicates of a page already in the corpus are stored without
+    running the embedding model.
+
+    Returns:
+        Summary dict with ``url``, ``qae_score``, ``status`` and, for
+        near-duplicates, ``duplicate_of``
+    """
+    qae_score = analyze_qae_score(content)
+    signature = minhash_signature(content)
+    duplicates = find_near_duplicates(signature, exclude_url=url)
+    if duplicates:
+        # Syndicated copy or mirror: store it, but skip the embedding model
+        original = duplicates[0]
+        print(f"{url} is a near-duplicate of {original['url']} ({original['similarity']:.2f}), skipping embedding.")
+        save_scraped_content(url, content, qae_score, None, status="duplicate",
+                             signature=signature, duplicate_of=original["page_id"])
+        return {"url": url, "qae_score": qae_score, "duplicate_of": original["url"], "status": DUPLICATE_STATUS}
+
+    embedding, passages = generate_passage_embeddings(content)
+    save_scraped_content(url, content, qae_score, embedding, signature=signature, passages=passages)
+    return {"url": url, "qae_score": qae_score, "status": SAVED_STATUS}
+
+
+def _save_batch(records: List[Dict[str, Any]], summaries: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    errors = save_scraped_pages(records)
+    return [
+        {"url": record["url"], "error": f"Failed to save: {errors[record['url']]}"} if errors.get(record["url"])
+        else summaries[record["url"]]
+        for record in records
+    ]
+
+
+def index_contents(pages: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+    """
+    Batch version of ``index_content`` for ``(url, content)`` pairs.
+
+    The chunks of every page are embedded in shared model batches and the
+    pages are written in one transaction. Near-duplicates are detected
+    against the stored corpus with one lookup for the whole batch, and
+    against earlier pages of the same batch; the latter are saved after the
+    batch so they can point at their original's id.
+
+    Returns:
+        One summary per page, as from ``index_content``, or ``{"url", "error"}``
+    """
+    batch_index = LSHIndex()
+    canonical, duplicates, deferred = [], [], []
+    summaries = {}
+    signatures = [minhash_signature(content) for _, content in pages]
+    matches = find_near_duplicates_batch([(signature, url) for (url, _), signature in zip(pages, signatures)])
+    for (url, content), signature, stored in zip(pages, signatures, matches):
+        qae_score = analyze_qae_score(content)
+        if stored:
+            original = stored[0]
+            duplicates.append({"url": url, "content": content, "qae_score": qae_score, "embedding": None,
+                               "status": "duplicate", "signature": signature, "duplicate_of": original["page_id"]})
+            summaries[url] = {"url": url, "qae_score": qae_score, "duplicate_of": original["url"], "status": DUPLICATE_STATUS}
+        elif batch_index.query(signature):
+            deferred.append((url, content, qae_score, signature))
+        else:
+            batch_index.insert(url, signature)
+            canonical.append({"url": url, "content": content, "qae_score": qae_score, "signature": signature})
+            summaries[url] = {"url": url, "qae_score": qae_score, "status": SAVED_STATUS}
+
+    embeddings = generate_passage_embeddings_batch([record["content"] for record in canonical])
+    for record, (embedding, passages) in zip(canonical, embeddings):
+        record.update(embedding=embedding, passages=passages)
+    results = _save_batch(canonical + duplicates, summaries)
+
+    # Near-duplicates of pages from this batch: their originals are stored now
+    late_records = []
+    matches = find_near_duplicates_batch([(signature, url) for url, _, _, signature in deferred])
+    for (url, content, qae_score, signature), stored in zip(deferred, matches):
+        if not stored:
+            # The original failed to save; index this copy in its own right
+            results.append(index_content(url, content))
+            continue
+        original = stored[0]
+        late_records.append({"url": url, "content": content, "qae_score": qae_score, "embedding": None,
+                             "status": "duplicate", "signature": signature, "duplicate_of": original["page_id"]})
+        summaries[url] = {"url": url, "qae_score": qae_score, "duplicate_of": original["url"], "status": DUPLICATE_STATUS}
+    return results + _save_batch(late_records, summaries)
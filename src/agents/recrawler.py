@@ -0,0 +1,107 @@
+"""Adaptive re-crawl of stored pages, driven by how often each one changes."""
+import sys
+import threading
+from typing import Any, Dict, Optional, Set
+
+from src.database.manager import (
+    create_tables, get_domain_pages, get_pages_due_for_recrawl, record_failed_fetch, record_unchanged_fetch,
+)
+from src.database.change_rate import content_fingerprint
+from src.scrapers.web_scraper import scrape_url
+from src.analyzers.boilerplate import TEMPLATE_LEARN_PAGES, domain_of
+from src.agents.indexer import index_content, index_contents
+
+RESTRIP_BATCH_SIZE = 16
+
+_restrip_lock = threading.Lock()
+_restripping: Set[str] = set()  # Domains with a re-strip job running
+
+
+def recrawl_due_pages(budget: int = 50) -> Dict[str, Any]:
+    """
+    Re-fetch the pages most likely to have changed, up to ``budget`` fetches.
+
+    Only pages whose content fingerprint actually changed are re-embedded and
+    re-indexed; unchanged fetches just update the page's change history.
+
+    Returns:
+        Counts of ``fetched``, ``changed``, ``unchanged`` and ``failed`` pages
+    """
+    due_pages = get_pages_due_for_recrawl(budget)
+    print(f"--- Re-crawling {len(due_pages)} due pages (budget {budget}) ---")
+    summary = {"fetched": 0, "changed": 0, "unchanged": 0, "failed": 0}
+
+    for page in due_pages:
+        content = scrape_url(page["url"], learn=True)
+        if not content:
+            record_failed_fetch(page["page_id"])
+            summary["failed"] += 1
+            continue
+        summary["fetched"] += 1
+
+        if not record_unchanged_fetch(page["page_id"], page["url"], content_fingerprint(content)):
+            print(f"Unchanged: {page['url']}")
+            summary["unchanged"] += 1
+            continue
+
+        print(f"Changed (p={page['priority']:.2f}), re-indexing: {page['url']}")
+        index_content(page["url"], content)
+        summary["changed"] += 1
+
+    print(f"✅ Re-crawl complete: {summary}")
+    return summary
+
+
+def restrip_domain(url: str, max_pages: int = TEMPLATE_LEARN_PAGES) -> int:
+    """
+    Re-fetch and re-index the stored pages of ``url``'s domain, other than ``url`` itself.
+
+    Run once the domain's template has formed: the pages stored before it
+    were saved with their menus and footers. Pages beyond ``max_pages`` are
+    stripped at their next re-crawl, whose template version no longer
+    matches.
+
+    Returns:
+        Number of pages re-indexed
+    """
+    domain = domain_of(url)
+    urls = get_domain_pages(domain, exclude_url=url, limit=max_pages)
+    print(f"--- Template formed for {domain}: re-stripping {len(urls)} earlier pages ---")
+    done = 0
+    for start in range(0, len(urls), RESTRIP_BATCH_SIZE):
+        pages = []
+        for page_url in urls[start:start + RESTRIP_BATCH_SIZE]:
+            content = scrape_url(page_url, learn=True)
+            if content:
+                pages.append((page_url, content))
+        results = index_contents(pages) if pages else []
+        done += sum("error" not in result for result in results)
+    print(f"✅ Re-stripped {done} pages of {domain}.")
+    return done
+
+
+def start_domain_restrip(url: str) -> Optional[threading.Thread]:
+    """Run ``restrip_domain`` on a daemon thread, at most one job per domain, so the current page is not held up."""
+    domain = domain_of(url)
+
+    def run():
+        try:
+            restrip_domain(url)
+        except Exception as e:
+            print(f"❌ Error re-stripping {domain}: {e}")
+        finally:
+            with _restrip_lock:
+                _restripping.discard(domain)
+
+    with _restrip_lock:
+        if domain in _restripping:
+            return None
+        _restripping.add(domain)
+    job = threading.Thread(target=run, name=f"restrip-{domain}", daemon=True)
+    job.start()
+    return job
+
+
+if __name__ == "__main__":
+    create_tables()
+    recrawl_due_pages(int(sys.argv[1]) if len(sys.argv) > 1 else 50)
@@ -0,0 +1,98 @@
+"""Background migration of stored embeddings to the configured model and dimension."""
+import sys
+import threading
+from typing import Optional
+
+import numpy as np
+
+from src.config.embeddings import EMBEDDING_DIM, EMBEDDING_MODEL_DIM, EMBEDDING_VERSION
+from src.database.manager import (
+    count_pages_to_reembed, create_tables, get_embedding_projection, iter_pages_to_reembed,
+    sample_model_embeddings, sample_page_contents, save_embedding_projection, update_page_embeddings,
+)
+from src.database.projection import fit_pca
+from src.analyzers.content_analyzer import generate_passage_embeddings_batch
+
+PROJECTION_SAMPLE_SIZE = 2000
+
+_job: Optional[threading.Thread] = None
+
+
+def fit_projection_if_needed(sample_size: int = PROJECTION_SAMPLE_SIZE) -> bool:
+    """
+    Make sure the active version has its PCA projection, fitting one if needed.
+
+    Stored unreduced vectors of the same model are used when there are
+    enough; otherwise a sample of stored pages is embedded for the fit.
+
+    Returns:
+        True if vectors can be stored in the active version
+    """
+    if EMBEDDING_DIM == EMBEDDING_MODEL_DIM or get_embedding_projection() is not None:
+        return True
+
+    vectors = sample_model_embeddings(sample_size)
+    if len(vectors) <= EMBEDDING_DIM:
+        print("Embedding a sample of stored pages to fit the projection...")
+        embedded = generate_passage_embeddings_batch(sample_page_contents(sample_size // 10))
+        passage_vectors = [vector for _, passages in embedded for _, _, vector in passages]
+        vectors = np.stack(passage_vectors[:sample_size]) if passage_vectors else vectors
+    if len(vectors) <= EMBEDDING_DIM:
+        print(f"❌ Only {len(vectors)} sample vectors; need more than {EMBEDDING_DIM} to fit {EMBEDDING_VERSION}.")
+        return False
+
+    mean, components, explained = fit_pca(vectors, EMBEDDING_DIM)
+    save_embedding_projection(mean, components, explained, len(vectors))
+    return True
+
+
+def reembed_pages(batch_size: int = 32, max_pages: Optional[int] = None) -> int:
+    """
+    Re-embed stored pages that are missing an active-version embedding.
+
+    Pages are streamed in batches and each batch is committed on its own,
+    so the job can be stopped at any point and resumed by running it again.
+    Searches keep serving the pages already migrated while it runs.
+
+    Returns:
+        Number of pages re-embedded
+    """
+    if not fit_projection_if_needed():
+        return 0
+    remaining = count_pages_to_reembed()
+    print(f"--- Re-embedding {remaining} pages as {EMBEDDING_VERSION} ---")
+    done = 0
+    for batch in iter_pages_to_reembed(batch_size):
+        if max_pages is not None:
+            batch = batch[:max_pages - done]
+        if not batch:
+            continue
+        embedded = generate_passage_embeddings_batch([content for _, content in batch])
+        done += update_page_embeddings([
+            {"page_id": page_id, "embedding": embedding, "passages": passages}
+            for (page_id, _), (embedding, passages) in zip(batch, embedded)
+        ])
+        print(f"Re-embedded {done}/{remaining} pages.")
+        if max_pages is not None and done >= max_pages:
+            break
+    print(f"✅ Re-embedding complete: {done} pages now use {EMBEDDING_VERSION}.")
+    return done
+
+
+def start_background_reembedding(batch_size: int = 32) -> Optional[threading.Thread]:
+    """Run ``reembed_pages`` on a daemon thread if any page needs it (at most one job per process)."""
+    global _job
+    if _job is not None and _job.is_alive():
+        return _job
+    pending = count_pages_to_reembed()
+    if not pending:
+        return None
+    print(f"{pending} pages are not embedded as {EMBEDDING_VERSION}; starting background re-embedding.")
+    _job = threading.Thread(target=reembed_pages, kwargs={"batch_size": batch_size}, name="reembedder", daemon=True)
+    _job.start()
+    return _job
+
+
+if __name__ == "__main__":
+    create_tables()
+    reembed_pages(max_pages=int(sys.argv[1]) if len(sys.argv) > 1 else None)
@@ -3,11 +3,13 @@ import requests
 from dotenv import load_dotenv
 from urllib.parse import quote_plus
 import json  # Import the json library
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
+
+from src.config.memory import LOW_MEMORY_MODE
 
 load_dotenv()
 
-def find_top_competitor_urls(keyword: str) -> list[str]:
+def find_top_competitor_urls(keyword: str, timeout: float = 30) -> list[str]:
     """
     Finds top 3 unique competitor URLs for a keyword using the Bright Data Request API for SERP scraping.
     """
@@ -33,7 +35,7 @@ def find_top_competitor_urls(keyword: str) -> list[str]:
     
     try:
         print("Making Bright Data API request...")
-        response = requests.post(url, headers=headers, json=payload, timeout=30)
+        response = requests.post(url, headers=headers, json=payload, timeout=timeout)
         print("Received response from Bright Data API.")
         response.raise_for_status()
         
@@ -41,9 +43,13 @@ def find_top_competitor_urls(keyword: str) -> list[str]:
         
         # --- THIS IS THE CRITICAL DEBUGGING LINE ---
         # Print the entire JSON response to the log so we can see its structure
-        print("--- 🚨 BRIGHT DATA SERVER RESPONSE (FULL JSON): ---")
-        print(json.dumps(result, indent=2))
-        print("--- END OF BRIGHT DATA RESPONSE ---")
+        if LOW_MEMORY_MODE:
+            # A pretty-printed SERP dump is several times the size of the response itself
+            print(f"--- 🚨 BRIGHT DATA SERVER RESPONSE: {len(response.content)} bytes (full dump disabled in low-memory mode) ---")
+        else:
+            print("--- 🚨 BRIGHT DATA SERVER RESPONSE (FULL JSON): ---")
+            print(json.dumps(result, indent=2))
+            print("--- END OF BRIGHT DATA RESPONSE ---")
         # --- END OF DEBUGGING LINE ---
 
         # Parse the body if present
@@ -53,7 +59,7 @@ def find_top_competitor_urls(keyword: str) -> list[str]:
         
         if isinstance(body, str):
             # Parse HTML to extract organic links
-            soup = BeautifulSoup(body, 'html.parser')
+            soup = BeautifulSoup(body, 'html.parser', parse_only=SoupStrainer('a', href=True))
             for a in soup.find_all('a', href=True):
                 href = a['href']
                 if href.startswith('http') and 'google' not in href.lower():
@@ -1,19 +1,25 @@
 """Main SEO Agent for comprehensive SEO analysis and optimization."""
 import asyncio
 import logging
-from typing import Dict, List, Optional, Any
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Any, Tuple, Union
 from dataclasses import dataclass
 from datetime import datetime
 
-from ..config.settings import settings
-from ..scrapers.web_scraper import WebScraper, ScrapedPage
-from ..analyzers.content_analyzer import ContentAnalyzer
+from ..config.memory import LOW_MEMORY_MODE
+from ..scrapers.web_scraper import fetch_html, read_body
+from ..scrapers.page_parser import ParsedPage, parse_page
+from ..analyzers.content_quality import ContentAnalyzer
 from ..analyzers.technical_analyzer import TechnicalAnalyzer
 from ..analyzers.backlink_analyzer import BacklinkAnalyzer
 from ..analyzers.keyword_analyzer import KeywordAnalyzer
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_CONCURRENCY = int(os.getenv("CONCURRENT_REQUESTS", "5"))
+
 
 @dataclass
 class SEOAnalysis:
@@ -30,16 +36,41 @@ class SEOAnalysis:
     opportunities: List[Dict[str, Any]]
 
 
+@dataclass
+class SEOAnalysisError:
+    """A URL from a batch run that could not be analyzed."""
+    url: str
+    timestamp: datetime
+    error: str
+
+
 class SEOAgent:
     """Main SEO analysis agent."""
     
-    def __init__(self):
-        """Initialize the SEO agent with all necessary components."""
-        self.scraper = WebScraper()
-        self.content_analyzer = ContentAnalyzer()
-        self.technical_analyzer = TechnicalAnalyzer()
+    def __init__(self, max_workers: Optional[int] = None, measure_resources: bool = False):
+        """
+        Initialize the SEO agent with all necessary components.
+        
+        Args:
+            max_workers: Number of worker processes that parse and analyze
+                pages (defaults to the CPU count, 1 in low-memory mode)
+            measure_resources: Measure real page weight and resource timing
+                (fetches every page's subresources)
+        """
         self.backlink_analyzer = BacklinkAnalyzer()
-        self.keyword_analyzer = KeywordAnalyzer()
+        # HTML parsing and the analyzers are pure-Python CPU work that threads
+        # would serialize on the GIL, so they run in worker processes. Spawned
+        # workers do not inherit the parent's threads or locks.
+        self.executor = ProcessPoolExecutor(
+            max_workers=max_workers or (1 if LOW_MEMORY_MODE else None),
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(measure_resources,)
+        )
+    
+    def close(self):
+        """Shut down the worker processes."""
+        self.executor.shutdown(cancel_futures=True)
         
     async def analyze_url(self, url: str, depth: int = 1) -> SEOAnalysis:
         """
@@ -55,49 +86,9 @@ class SEOAgent:
         logger.info(f"Starting SEO analysis for {url} with depth {depth}")
         
         try:
-            # Scrape the webpage
-            page_data = await self.scraper.scrape_page(url)
-            
-            # Run parallel analysis
-            tasks = [
-                self.content_analyzer.analyze(page_data),
-                self.technical_analyzer.analyze(page_data),
-                self.backlink_analyzer.analyze(url),
-                self.keyword_analyzer.analyze(page_data)
-            ]
-            
-            # Execute all analysis tasks
-            results = await asyncio.gather(*tasks)
-            
-            # Process results
-            content_result, technical_result, backlink_result, keyword_result = results
-            
-            # Calculate scores
-            content_score = content_result.get("content_score", 0)
-            technical_score = technical_result.get("page_speed_score", 0)
-            backlink_score = backlink_result.get("backlink_score", 0)
-            keyword_score = keyword_result.get("keyword_score", 0)
-            
-            # Calculate overall score
-            overall_score = (content_score + technical_score + backlink_score + keyword_score) / 4
-            
-            # Generate recommendations
-            recommendations = self._generate_recommendations(
-                content_result, technical_result, backlink_result, keyword_result
-            )
-            
-            analysis = SEOAnalysis(
-                url=url,
-                timestamp=datetime.now(),
-                content_score=content_score,
-                technical_score=technical_score,
-                backlink_score=backlink_score,
-                keyword_score=keyword_score,
-                overall_score=overall_score,
-                recommendations=recommendations,
-                issues=self._identify_issues(content_result, technical_result),
-                opportunities=self._identify_opportunities(keyword_result)
-            )
+            # Fetching is I/O, so it runs on the default thread pool
+            html = await asyncio.to_thread(_fetch_page_html, url)
+            analysis = await self._analyze_page(url, html)
             
             logger.info(f"Completed SEO analysis for {url}")
             return analysis
@@ -106,6 +97,94 @@ class SEOAgent:
             logger.error(f"Error analyzing {url}: {str(e)}")
             raise
     
+    async def analyze_many(self, urls: Iterable[str], depth: int = 1,
+                           concurrency: Optional[int] = None
+                           ) -> AsyncIterator[Union[SEOAnalysis, SEOAnalysisError]]:
+        """
+        Analyze many URLs concurrently, yielding results as they complete.
+        
+        At most ``concurrency`` URLs are in flight at once, and ``urls`` is
+        consumed lazily, so very large site audits run in bounded memory.
+        A failure on one URL is yielded as an ``SEOAnalysisError`` instead of
+        aborting the whole batch.
+        
+        Args:
+            urls: The URLs to analyze
+            depth: Analysis depth (1=basic, 2=detailed, 3=comprehensive)
+            concurrency: Maximum number of URLs analyzed at the same time
+                (defaults to ``CONCURRENT_REQUESTS``)
+            
+        Yields:
+            SEOAnalysis or SEOAnalysisError, in completion order
+        """
+        limit = max(1, concurrency or DEFAULT_CONCURRENCY)
+        url_iter = iter(urls)
+        pending: Dict[asyncio.Task, str] = {}
+        
+        def schedule_next() -> bool:
+            url = next(url_iter, None)
+            if url is None:
+                return False
+            pending[asyncio.ensure_future(self.analyze_url(url, depth))] = url
+            return True
+        
+        try:
+            while len(pending) < limit and schedule_next():
+                pass
+            
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    url = pending.pop(task)
+                    if task.exception() is not None:
+                        yield SEOAnalysisError(url=url, timestamp=datetime.now(),
+                                               error=str(task.exception()))
+                    else:
+                        yield task.result()
+                    schedule_next()
+        finally:
+            # The consumer stopped early; don't leave orphaned fetches running
+            for task in pending:
+                task.cancel()
+    
+    async def _analyze_page(self, url: str, html: str) -> SEOAnalysis:
+        """Run all analyzers over a fetched page and build the combined analysis."""
+        # The page is parsed and analyzed in a worker process, keeping the
+        # event loop free for other fetches; the backlink lookup stays here.
+        loop = asyncio.get_running_loop()
+        page_results, backlink_result = await asyncio.gather(
+            loop.run_in_executor(self.executor, _analyze_html, url, html),
+            self.backlink_analyzer.analyze(url)
+        )
+        content_result, technical_result, keyword_result = page_results
+        
+        # Calculate scores
+        content_score = content_result.get("content_score", 0)
+        technical_score = technical_result.get("page_speed_score", 0)
+        backlink_score = backlink_result.get("backlink_score", 0)
+        keyword_score = keyword_result.get("keyword_score", 0)
+        
+        # Calculate overall score
+        overall_score = (content_score + technical_score + backlink_score + keyword_score) / 4
+        
+        # Generate recommendations
+        recommendations = self._generate_recommendations(
+            content_result, technical_result, backlink_result, keyword_result
+        )
+        
+        return SEOAnalysis(
+            url=url,
+            timestamp=datetime.now(),
+            content_score=content_score,
+            technical_score=technical_score,
+            backlink_score=backlink_score,
+            keyword_score=keyword_score,
+            overall_score=overall_score,
+            recommendations=recommendations,
+            issues=self._identify_issues(content_result, technical_result),
+            opportunities=self._identify_opportunities(keyword_result)
+        )
+    
     def _generate_recommendations(self, content: Dict, technical: Dict, 
                                 backlink: Dict, keyword: Dict) -> List[Dict[str, Any]]:
         """Generate actionable SEO recommendations."""
@@ -132,4 +211,95 @@ class SEOAgent:
         if technical.get("page_speed_score", 0) < 70:
             recommendations.append({
                 "title": "Improve page speed",
-                "description": "
+                "description": "Reduce page weight and defer non-critical resources",
+                "priority": "medium",
+                "impact": "high"
+            })
+        
+        if technical.get("mobile_friendly_score", 0) < 70:
+            recommendations.append({
+                "title": "Add a responsive viewport",
+                "description": "Declare a viewport meta tag and test the page on mobile devices",
+                "priority": "high",
+                "impact": "high"
+            })
+        
+        # Backlink recommendations
+        if backlink.get("backlink_score", 0) < 70:
+            recommendations.append({
+                "title": "Build authoritative backlinks",
+                "description": "Earn links from relevant, high-quality referring domains",
+                "priority": "medium",
+                "impact": "high"
+            })
+        
+        # Keyword recommendations
+        if keyword.get("keyword_score", 0) < 70:
+            recommendations.append({
+                "title": "Strengthen keyword targeting",
+                "description": "Use the primary keywords in the title, headings and opening paragraph",
+                "priority": "medium",
+                "impact": "medium"
+            })
+        
+        return recommendations
+    
+    def _identify_issues(self, content: Dict, technical: Dict) -> List[Dict[str, Any]]:
+        """Identify SEO issues that need fixing."""
+        issues = []
+        
+        if technical.get("structured_data_score", 0) < 50:
+            issues.append({
+                "issue": "Missing structured data",
+                "severity": "medium"
+            })
+        
+        if technical.get("internal_linking_score", 0) < 50:
+            issues.append({
+                "issue": "Weak internal linking",
+                "severity": "medium"
+            })
+        
+        if content.get("content_score", 0) < 50:
+            issues.append({
+                "issue": "Thin or low-quality content",
+                "severity": "high"
+            })
+        
+        return issues
+    
+    def _identify_opportunities(self, keyword: Dict) -> List[Dict[str, Any]]:
+        """Identify keyword opportunities."""
+        return [
+            {"keyword": semantic_keyword, "type": "semantic"}
+            for semantic_keyword in keyword.get("semantic_keywords", [])
+        ]
+
+
+def _fetch_page_html(url: str) -> str:
+    """Download a page (capped at MAX_HTML_BYTES) and decode it."""
+    response = fetch_html(url, stream=True)
+    body = read_body(response)
+    return body.decode(response.encoding or 'utf-8', errors='replace')
+
+
+# Analyzers of the current worker process, created once by _init_worker
+_worker_analyzers: Optional[Tuple[ContentAnalyzer, TechnicalAnalyzer, KeywordAnalyzer]] = None
+
+
+def _init_worker(measure_resources: bool):
+    global _worker_analyzers
+    _worker_analyzers = (ContentAnalyzer(), TechnicalAnalyzer(measure_resources=measure_resources), KeywordAnalyzer())
+
+
+async def _run_analyzers(page: ParsedPage) -> List[Dict[str, Any]]:
+    return [await analyzer.analyze(page) for analyzer in _worker_analyzers]
+
+
+def _analyze_html(url: str, html: str) -> List[Dict[str, Any]]:
+    """Parse a page and run the content, technical and keyword analyzers on it (in a worker process)."""
+    page = parse_page(url, html)
+    try:
+        return asyncio.run(_run_analyzers(page))
+    finally:
+        page.soup.decompose()
@@ -0,0 +1,164 @@
+"""Fitting the topic cluster index and using it for keyword gap and competition analysis."""
+import sys
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from src.analyzers.boilerplate import domain_of
+from src.analyzers.topic_clusters import (
+    TOPIC_CLUSTERS, assign_clusters, cluster_count, competition_level, coverage_gaps, fit_minibatch_kmeans,
+    kmeans_plus_plus, nearest_clusters,
+)
+from src.database.manager import (
+    count_embedded_pages, create_tables, get_page_topic, get_topic_centroids, get_topic_coverage, get_topic_domains,
+    get_topic_keywords, get_topic_summaries, iter_stored_embeddings, refresh_topic_keywords, save_topic_centroids,
+    to_stored_embedding, update_topic_assignments,
+)
+from src.analyzers.content_analyzer import generate_embedding
+
+SAMPLE_PER_CLUSTER = 20  # k-means++ seeds from a reservoir sample of this many vectors per cluster
+KEYWORD_PROBE_CLUSTERS = 3  # Topics each target keyword is compared on
+MAX_GAP_KEYWORDS = 10
+
+_job: Optional[threading.Thread] = None
+
+
+def _reservoir_sample(batches, size: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.RandomState(seed)
+    sample = []
+    seen = 0
+    for _, vectors in batches:
+        for vector in vectors:
+            seen += 1
+            if len(sample) < size:
+                sample.append(vector)
+            else:
+                slot = rng.randint(seen)
+                if slot < size:
+                    sample[slot] = vector
+    return np.stack(sample) if sample else np.empty((0, 0), dtype=np.float32)
+
+
+def rebuild_topic_index(max_clusters: int = TOPIC_CLUSTERS, epochs: int = 3, batch_size: int = 256) -> int:
+    """
+    Fit the topic index from scratch with mini-batch k-means over the stored embeddings.
+
+    Embeddings are streamed in batches, never loaded all at once: one pass
+    draws the seeding sample, ``epochs`` passes fit the centroids and a
+    final pass assigns every page. Afterwards pages saved through the
+    manager are assigned and folded in incrementally.
+
+    Returns:
+        Number of clusters fitted (0 if the corpus is too small)
+    """
+    pages = count_embedded_pages()
+    k = cluster_count(pages, max_clusters)
+    if not k:
+        print(f"❌ Only {pages} embedded pages; too few to cluster into topics.")
+        return 0
+    print(f"--- Fitting {k} topic clusters over {pages} pages ---")
+    initial = kmeans_plus_plus(_reservoir_sample(iter_stored_embeddings(batch_size), k * SAMPLE_PER_CLUSTER), k)
+    centroids, _ = fit_minibatch_kmeans(
+        (vectors for _ in range(epochs) for _, vectors in iter_stored_embeddings(batch_size)), initial)
+
+    page_ids: List[int] = []
+    batch_labels: List[np.ndarray] = []
+    for batch_ids, vectors in iter_stored_embeddings(batch_size):
+        page_ids.extend(batch_ids)
+        batch_labels.append(assign_clusters(vectors, centroids))
+    labels = np.concatenate(batch_labels) if batch_labels else np.empty(0, dtype=np.int64)
+    # Cluster sizes as learning-rate counts, so an incrementally added page moves its centroid like a running mean
+    save_topic_centroids(centroids, np.bincount(labels, minlength=k))
+    update_topic_assignments(page_ids, labels)
+    refresh_topic_keywords()
+    print(f"✅ Topic index rebuilt: {k} clusters over {len(page_ids)} pages.")
+    return k
+
+
+def start_background_topic_indexing() -> Optional[threading.Thread]:
+    """Run ``rebuild_topic_index`` on a daemon thread if no index is fitted yet but the corpus is large enough."""
+    global _job
+    if _job is not None and _job.is_alive():
+        return _job
+    if get_topic_centroids() is not None or not cluster_count(count_embedded_pages()):
+        return None
+    print("No topic index for the stored pages; fitting one in the background.")
+    _job = threading.Thread(target=rebuild_topic_index, name="topic-indexer", daemon=True)
+    _job.start()
+    return _job
+
+
+def find_topic_gaps(url: str, target_keywords: List[str]) -> Optional[Dict[str, Any]]:
+    """
+    Compare a site's topic coverage with everyone else in the stored corpus.
+
+    The topics compared are those nearest the target keywords (all topics
+    when none are given). Only per-topic page counts and centroids are
+    used; no page is scanned.
+
+    Returns:
+        The gap topics with their keywords, keyword lists for missing and
+        under-covered topics and a competition level, or None if no topic
+        index is fitted
+    """
+    index = get_topic_centroids()
+    if index is None:
+        return None
+    centroids, cluster_ids = index
+    domain = domain_of(url)
+    own, competitors = get_topic_coverage(domain)
+
+    queries = [to_stored_embedding(generate_embedding(keyword)) for keyword in target_keywords]
+    queries = [query for query in queries if query is not None and len(query)]
+    clusters = ([cluster_ids[position] for position in nearest_clusters(np.stack(queries), centroids, KEYWORD_PROBE_CLUSTERS)]
+                if queries else cluster_ids)
+
+    gaps = coverage_gaps(clusters, own, competitors)
+    keywords = get_topic_keywords(gap["cluster"] for gap in gaps)
+    for gap in gaps:
+        gap["keywords"] = keywords.get(gap["cluster"], [])
+
+    def gap_keywords(kind: str) -> List[str]:
+        terms = [term for gap in gaps if gap["kind"] == kind for term in gap["keywords"]]
+        return list(dict.fromkeys(terms))[:MAX_GAP_KEYWORDS]
+
+    return {
+        "domain": domain,
+        "topics_compared": len(clusters),
+        "gaps": gaps,
+        "missing_keywords": gap_keywords("missing"),
+        "opportunity_keywords": gap_keywords("under_covered"),
+        "competition_level": competition_level(sum(own.get(cluster, 0) for cluster in clusters),
+                                               sum(competitors.get(cluster, 0) for cluster in clusters)),
+    }
+
+
+def find_topic_competition(url: str) -> Optional[Dict[str, Any]]:
+    """
+    How crowded a stored page's topic is: competing domains and their share of its pages.
+
+    Returns:
+        None if the page is not stored or not assigned to a topic yet
+    """
+    cluster = get_page_topic(url)
+    if cluster is None:
+        return None
+    domains = get_topic_domains([cluster])
+    own_pages = domains.pop(domain_of(url), 0)
+    competitor_pages = sum(domains.values())
+    total = own_pages + competitor_pages
+    return {
+        "cluster": cluster,
+        "keywords": get_topic_keywords([cluster]).get(cluster, []),
+        "competition_score": round(100.0 * competitor_pages / total, 1) if total else 0.0,
+        "top_competitors": [domain for domain, _ in domains.most_common(5)],
+        "keyword_difficulty": competition_level(own_pages, competitor_pages, len(domains)),
+    }
+
+
+if __name__ == "__main__":
+    create_tables()
+    if rebuild_topic_index(int(sys.argv[1]) if len(sys.argv) > 1 else TOPIC_CLUSTERS):
+        for summary in get_topic_summaries():
+            print(f"Topic {summary['cluster']:>3} ({summary['pages']} pages): {', '.join(summary['keywords'])}")
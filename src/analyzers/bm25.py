@@ -0,0 +1,87 @@
+"""Okapi BM25 relevance scoring and score fusion for keyword search."""
+import heapq
+import math
+from typing import Dict, List, Sequence, Tuple
+
+from .keyword_stats import index_terms
+
+# Standard Okapi parameters: term-frequency saturation and length normalisation
+K1 = 1.2
+B = 0.75
+
+
+def bm25_idf(document_frequency: int, total_documents: int) -> float:
+    """BM25 inverse document frequency (the non-negative Lucene variant)."""
+    return math.log(1 + (total_documents - document_frequency + 0.5) / (document_frequency + 0.5))
+
+
+def bm25_term_score(term_frequency: int, document_length: int, average_length: float,
+                    idf: float, k1: float = K1, b: float = B) -> float:
+    """Contribution of one query term to one document's BM25 score."""
+    norm = k1 * (1 - b + b * document_length / (average_length or 1.0))
+    return idf * term_frequency * (k1 + 1) / (term_frequency + norm)
+
+
+def rank_texts(query: str, texts: Sequence[str], top_k: int = 3) -> List[Tuple[int, float]]:
+    """
+    Rank an in-memory list of texts against ``query`` with BM25.
+
+    Returns:
+        ``(index, score)`` pairs for texts matching at least one query term, best first
+    """
+    query_terms = set(index_terms(query))
+    if not query_terms or not texts:
+        return []
+
+    documents = [index_terms(text) for text in texts]
+    lengths = [sum(counts.values()) for counts in documents]
+    average_length = sum(lengths) / len(lengths)
+    idfs = {
+        term: bm25_idf(sum(1 for counts in documents if term in counts), len(documents))
+        for term in query_terms
+    }
+
+    scores = []
+    for index, counts in enumerate(documents):
+        score = sum(
+            bm25_term_score(counts[term], lengths[index], average_length, idfs[term])
+            for term in query_terms if term in counts
+        )
+        if score > 0:
+            scores.append((index, score))
+    return heapq.nlargest(top_k, scores, key=lambda item: item[1])
+
+
+def normalize_scores(scores: Dict[int, float]) -> Dict[int, float]:
+    """Scale non-negative scores into [0, 1] relative to the best one."""
+    if not scores:
+        return {}
+    high = max(scores.values())
+    if high <= 0:
+        return {key: 0.0 for key in scores}
+    return {key: value / high for key, value in scores.items()}
+
+
+def fuse_scores(keyword_scores: Dict[int, float], vector_scores: Dict[int, float],
+                alpha: float = 0.5) -> List[Tuple[int, float]]:
+    """
+    Combine BM25 and vector similarity scores for hybrid search.
+
+    Both score sets are scaled by their best score before mixing; a candidate missing
+    from one side contributes 0 for it.
+
+    Args:
+        keyword_scores: BM25 score per candidate id
+        vector_scores: Similarity per candidate id (higher is better)
+        alpha: Weight of the vector score, between 0 (BM25 only) and 1 (vector only)
+
+    Returns:
+        ``(id, fused_score)`` pairs, best first
+    """
+    keyword_norm = normalize_scores(keyword_scores)
+    vector_norm = normalize_scores(vector_scores)
+    fused = {
+        key: alpha * vector_norm.get(key, 0.0) + (1 - alpha) * keyword_norm.get(key, 0.0)
+        for key in set(keyword_norm) | set(vector_norm)
+    }
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
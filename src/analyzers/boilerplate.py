@@ -0,0 +1,134 @@
+"""Per-domain boilerplate detection from text-block frequency across a site's pages.
+
+Navigation, cookie banners and footers repeat verbatim on every page of a
+site. A block (the visible text of one block-level element, inline markup
+included) that appears on at least
+``TEMPLATE_MIN_SHARE`` of a domain's learned pages is treated as template
+and removed before the page text is truncated, chunked and embedded.
+
+Stripped text depends on the template it was stripped with, so change
+detection compares fingerprints only between fetches with the same
+``template_version``.
+"""
+import hashlib
+import math
+import sys
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Set
+from urllib.parse import urlsplit
+
+TEMPLATE_MIN_PAGES = 5  # No stripping until a domain has this many learned pages
+TEMPLATE_MIN_SHARE = 0.5
+TEMPLATE_LEARN_PAGES = 100  # Pages per domain counted before the model is frozen
+CHUNK_SIZE = 512  # Matches the chunking in content_analyzer
+
+
+def domain_of(url: str) -> str:
+    host = (urlsplit(url).hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def block_hash(block: str) -> int:
+    """Signed 63-bit hash of a block with case and whitespace normalized."""
+    normalized = " ".join(block.lower().split())
+    return int.from_bytes(hashlib.blake2b(normalized.encode("utf-8"), digest_size=8).digest(), "little") >> 1
+
+
+def page_block_hashes(blocks: Iterable[str]) -> Set[int]:
+    return {block_hash(block) for block in blocks}
+
+
+def template_version(template_hashes: Set[int]) -> str:
+    """Short digest identifying a template block set."""
+    digest = hashlib.blake2b(digest_size=8)
+    for hash_value in sorted(template_hashes):
+        digest.update(hash_value.to_bytes(8, "little"))
+    return digest.hexdigest()
+
+
+def template_threshold(page_count: int) -> Optional[int]:
+    """Minimum number of pages a block must appear on to count as template (None: too few pages)."""
+    if page_count < TEMPLATE_MIN_PAGES:
+        return None
+    return max(2, math.ceil(TEMPLATE_MIN_SHARE * page_count))
+
+
+def strip_template_blocks(blocks: Sequence[str], template_hashes: Set[int]) -> List[str]:
+    """Drop template blocks, keeping the rest in page order."""
+    if not template_hashes:
+        return list(blocks)
+    return [block for block in blocks if block_hash(block) not in template_hashes]
+
+
+class BoilerplateModel:
+    """In-memory template model for one domain, fitted on the block lists of its pages."""
+
+    def __init__(self, pages: Iterable[Sequence[str]] = ()):
+        self.page_count = 0
+        self.block_counts: Counter = Counter()
+        for blocks in pages:
+            self.add_page(blocks)
+
+    def add_page(self, blocks: Sequence[str]):
+        self.page_count += 1
+        self.block_counts.update(page_block_hashes(blocks))
+
+    def template_hashes(self) -> Set[int]:
+        threshold = template_threshold(self.page_count)
+        if threshold is None:
+            return set()
+        return {block for block, count in self.block_counts.items() if count >= threshold}
+
+    def strip(self, blocks: Sequence[str]) -> List[str]:
+        return strip_template_blocks(blocks, self.template_hashes())
+
+
+def _chunk_count(text: str) -> int:
+    return math.ceil(len(text) / CHUNK_SIZE)
+
+
+def evaluate_stripping(pages: List[Sequence[str]], max_length: int) -> Dict[str, float]:
+    """
+    Leave-one-out evaluation of template stripping on one domain's pages.
+
+    Each page is stripped with a model fitted on the other pages, then both
+    versions are truncated to ``max_length`` and split into embedding chunks.
+
+    Returns:
+        Totals of characters and chunks before and after stripping, and the
+        fraction of chunks saved
+    """
+    report = {"pages": len(pages), "chars_before": 0, "chars_after": 0, "chunks_before": 0, "chunks_after": 0}
+    for index, blocks in enumerate(pages):
+        model = BoilerplateModel(other for position, other in enumerate(pages) if position != index)
+        before = " ".join(blocks)
+        after = " ".join(model.strip(blocks))
+        report["chars_before"] += len(before)
+        report["chars_after"] += len(after)
+        report["chunks_before"] += _chunk_count(before[:max_length])
+        report["chunks_after"] += _chunk_count(after[:max_length])
+    report["chunk_reduction"] = 1 - report["chunks_after"] / report["chunks_before"] if report["chunks_before"] else 0.0
+    return report
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < TEMPLATE_MIN_PAGES + 2:
+        print(f"❌ Please provide at least {TEMPLATE_MIN_PAGES + 1} URLs from the same site.")
+        print("   Usage: python -m src.analyzers.boilerplate <url> <url> ...")
+    else:
+        from bs4 import BeautifulSoup
+        from src.scrapers.web_scraper import MAX_TEXT_LENGTH, extract_blocks, fetch_html, read_body
+
+        sample = []
+        for page_url in sys.argv[1:]:
+            try:
+                soup = BeautifulSoup(read_body(fetch_html(page_url, stream=True)), "html.parser")
+                sample.append(extract_blocks(soup))
+                soup.decompose()
+            except Exception as e:
+                print(f"Skipping {page_url}: {e}")
+        result = evaluate_stripping(sample, MAX_TEXT_LENGTH)
+        print(f"Pages: {result['pages']}")
+        print(f"Characters: {result['chars_before']} -> {result['chars_after']}")
+        print(f"Embedding chunks: {result['chunks_before']} -> {result['chunks_after']} "
+              f"({result['chunk_reduction']:.1%} fewer)")
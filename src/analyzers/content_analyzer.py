@@ -1,9 +1,27 @@
+from typing import List, Tuple
 from sentence_transformers import SentenceTransformer
 import numpy as np
+import torch
+
+from src.config.embeddings import EMBEDDING_MODEL, EMBEDDING_MODEL_DIM, MODEL_PRECISION
+from src.config.memory import LOW_MEMORY_MODE
+
+ENCODE_BATCH_SIZE = 8 if LOW_MEMORY_MODE else 64
 
 # Load the AI model. This is slow, so we do it once when the script starts.
-print("Loading sentence-transformer model...")
-model = SentenceTransformer('paraphrase-MiniLM-L3-v2')
+print(f"Loading sentence-transformer model {EMBEDDING_MODEL} ({MODEL_PRECISION})...")
+model = SentenceTransformer(EMBEDDING_MODEL, device='cpu' if MODEL_PRECISION == "int8" else None)
+if model.get_sentence_embedding_dimension() != EMBEDDING_MODEL_DIM:
+    raise ValueError(f"{EMBEDDING_MODEL} produces {model.get_sentence_embedding_dimension()}-dim embeddings, "
+                     f"but EMBEDDING_MODEL_DIM is {EMBEDDING_MODEL_DIM}.")
+if MODEL_PRECISION == "int8":
+    model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+elif MODEL_PRECISION == "fp16":
+    model = model.half()
+if LOW_MEMORY_MODE:
+    # Every intra-op thread keeps its own scratch buffers
+    torch.set_num_threads(1)
+model.eval()
 print("Model loaded.")
 
 def analyze_qae_score(content: str) -> int:
@@ -25,33 +43,66 @@ def generate_embedding(content: str) -> np.ndarray:
         return np.array([])  # Return an empty array if there's no content
     
     print("Generating vector embedding for the content...")
-    # The model.encode() function turns the text into a list of 384 numbers
+    # The model.encode() function turns the text into a list of EMBEDDING_MODEL_DIM numbers
     embedding = model.encode(content, normalize_embeddings=True)
     print(f"Embedding generated with shape: {embedding.shape}")
     return embedding
 
-def generate_embedding_for_long_text(content: str, chunk_size: int = 512) -> np.ndarray:
+def _chunk_spans(content: str, chunk_size: int) -> List[Tuple[int, int]]:
+    return [(i, min(i + chunk_size, len(content))) for i in range(0, len(content), chunk_size)]
+
+def generate_passage_embeddings(content: str, chunk_size: int = 512) -> Tuple[np.ndarray, List[Tuple[int, int, np.ndarray]]]:
     """
-    Generates a vector embedding for long text by chunking and averaging embeddings.
-    This prevents OOM for large content.
+    Embeds long text chunk by chunk in a single batched encode pass.
+
+    Returns:
+        The page embedding (mean of the chunk vectors) and one
+        ``(start, end, vector)`` passage per chunk, with character offsets into ``content``.
     """
     if not content:
-        return np.array([])
-    
+        return np.array([]), []
+
     # Split content into chunks
-    chunks = [content[i:i+chunk_size] for i in range(0, len(content), chunk_size)]
-    print(f"Chunking content into {len(chunks)} chunks for embedding.")
-    
-    embeddings = []
-    for chunk in chunks:
-        chunk_embedding = generate_embedding(chunk)
-        if len(chunk_embedding) > 0:
-            embeddings.append(chunk_embedding)
-    
-    if not embeddings:
-        return np.array([])
-    
+    spans = _chunk_spans(content, chunk_size)
+    print(f"Chunking content into {len(spans)} chunks for embedding.")
+
+    chunk_embeddings = model.encode([content[start:end] for start, end in spans], batch_size=ENCODE_BATCH_SIZE,
+                                    normalize_embeddings=True)
+    passages = [(start, end, vector) for (start, end), vector in zip(spans, chunk_embeddings)]
+
     # Average the embeddings
-    avg_embedding = np.mean(embeddings, axis=0)
+    avg_embedding = np.mean(chunk_embeddings, axis=0)
     print(f"Averaged embedding shape: {avg_embedding.shape}")
+    return avg_embedding, passages
+
+def generate_passage_embeddings_batch(contents: List[str], chunk_size: int = 512,
+                                      batch_size: int = ENCODE_BATCH_SIZE) -> List[Tuple[np.ndarray, List[Tuple[int, int, np.ndarray]]]]:
+    """
+    Same as ``generate_passage_embeddings`` for many texts, with the chunks of
+    all of them encoded together so the model runs on full batches.
+    """
+    spans_per_text = [_chunk_spans(content, chunk_size) if content else [] for content in contents]
+    chunks = [content[start:end] for content, spans in zip(contents, spans_per_text) for start, end in spans]
+    print(f"Embedding {len(chunks)} chunks from {len(contents)} texts in batches of {batch_size}.")
+    chunk_embeddings = model.encode(chunks, batch_size=batch_size, normalize_embeddings=True) if chunks else []
+    del chunks
+
+    results = []
+    offset = 0
+    for spans in spans_per_text:
+        if not spans:
+            results.append((np.array([]), []))
+            continue
+        vectors = chunk_embeddings[offset:offset + len(spans)]
+        offset += len(spans)
+        passages = [(start, end, vector) for (start, end), vector in zip(spans, vectors)]
+        results.append((np.mean(vectors, axis=0), passages))
+    return results
+
+def generate_embedding_for_long_text(content: str, chunk_size: int = 512) -> np.ndarray:
+    """
+    Generates a vector embedding for long text by chunking and averaging embeddings.
+    This prevents OOM for large content.
+    """
+    avg_embedding, _ = generate_passage_embeddings(content, chunk_size)
     return avg_embedding
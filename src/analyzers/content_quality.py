@@ -0,0 +1,63 @@
+"""On-page content analyzer for SEO (title, meta description, headings, depth)."""
+import logging
+from typing import Dict, Any
+
+logger = logging.getLogger(__name__)
+
+MIN_WORD_COUNT = 300  # Below this a page reads as thin content
+
+
+class ContentAnalyzer:
+    """Scores the on-page content of a parsed page."""
+
+    async def analyze(self, page_data) -> Dict[str, Any]:
+        """Analyze on-page content quality."""
+        word_count = len(page_data.text_content.split())
+        title_score = self._score_title(page_data.title)
+        meta_description_score = self._score_meta_description(page_data.meta_description)
+        heading_score = self._score_headings(page_data.h1_tags)
+        depth_score = self._score_depth(word_count)
+        return {
+            "content_score": (title_score + meta_description_score + heading_score + depth_score) / 4,
+            "title_score": title_score,
+            "meta_description_score": meta_description_score,
+            "heading_score": heading_score,
+            "word_count": word_count,
+            "question_count": page_data.text_content.count('?')
+        }
+
+    def _score_title(self, title: str) -> float:
+        """Titles of 30-60 characters display in full on results pages."""
+        if not title:
+            return 0.0
+        if 30 <= len(title) <= 60:
+            return 100.0
+        if 10 <= len(title) <= 70:
+            return 70.0
+        return 40.0
+
+    def _score_meta_description(self, description: str) -> float:
+        """Descriptions of 120-160 characters are shown without truncation."""
+        if not description:
+            return 0.0
+        if 120 <= len(description) <= 160:
+            return 100.0
+        if 70 <= len(description) <= 200:
+            return 70.0
+        return 40.0
+
+    def _score_headings(self, h1_tags) -> float:
+        """A page should have exactly one H1."""
+        if len(h1_tags) == 1:
+            return 100.0
+        if h1_tags:
+            return 70.0
+        return 30.0
+
+    def _score_depth(self, word_count: int) -> float:
+        """Score how substantial the body text is."""
+        if word_count >= MIN_WORD_COUNT:
+            return 100.0
+        if word_count >= MIN_WORD_COUNT // 3:
+            return 60.0
+        return 20.0
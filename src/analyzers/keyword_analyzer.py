@@ -1,13 +1,39 @@
 """Keyword analyzer for SEO keyword research and optimization."""
+import asyncio
 import logging
-from typing import Dict, Any, List
+from typing import Callable, Dict, Any, Iterable, List, Optional, Tuple
+
+from .keyword_stats import extract_ngrams, tfidf_keywords
 
 logger = logging.getLogger(__name__)
 
+# Looks up ``(document_frequencies, total_documents)`` for a set of terms,
+# e.g. ``src.database.manager.get_document_frequencies``
+CorpusStatsLookup = Callable[[Iterable[str]], Tuple[Dict[str, int], int]]
+
+# Topic-cluster lookups over the stored corpus, e.g. ``src.agents.topic_indexer.find_topic_gaps``
+# and ``find_topic_competition``; both return None while no topic index is fitted
+TopicGapLookup = Callable[[str, List[str]], Optional[Dict[str, Any]]]
+TopicCompetitionLookup = Callable[[str], Optional[Dict[str, Any]]]
+
 
 class KeywordAnalyzer:
     """Analyzes keywords for SEO optimization."""
     
+    def __init__(self, corpus_stats: Optional[CorpusStatsLookup] = None,
+                 topic_gaps: Optional[TopicGapLookup] = None,
+                 topic_competition: Optional[TopicCompetitionLookup] = None):
+        """
+        Args:
+            corpus_stats: Optional document-frequency lookup; when given, page
+                keywords are ranked by TF-IDF instead of raw frequency
+            topic_gaps: Optional topic coverage comparison used by ``find_keyword_gaps``
+            topic_competition: Optional topic crowding lookup used by ``analyze_serp_competition``
+        """
+        self.corpus_stats = corpus_stats
+        self.topic_gaps = topic_gaps
+        self.topic_competition = topic_competition
+    
     async def analyze(self, page_data) -> Dict[str, Any]:
         """Analyze keyword optimization."""
         return {
@@ -32,25 +58,26 @@ class KeywordAnalyzer:
     
     def _analyze_keyword_usage(self, page_data) -> Dict[str, float]:
         """Analyze keyword usage in content."""
-        text = page_data.text_content.lower()
-        words = text.split()
+        text = page_data.text_content
+        total_words = len(text.split())
         
-        if not words:
+        if not total_words:
             return {}
         
-        # Find most common words (potential keywords)
-        word_freq = {}
-        for word in words:
-            if len(word) > 3 and word.isalpha():
-                word_freq[word] = word_freq.get(word, 0) + 1
+        # Unigrams, bigrams and trigrams (potential keywords)
+        term_counts = extract_ngrams(text)
         
-        # Return top keywords with frequency
-        top_keywords = sorted(word_freq.items(), key=lambda x: x[1], reverse=True)[:10]
-        total_words = len(words)
+        if self.corpus_stats:
+            # Rank by how distinctive each term is across the stored corpus
+            frequencies, total_documents = self.corpus_stats(term_counts)
+            top_keywords = [term for term, _ in tfidf_keywords(term_counts, frequencies, total_documents)]
+        else:
+            top_keywords = [term for term, _ in term_counts.most_common(10)]
         
+        # Return top keywords with density
         return {
-            word: (count / total_words) * 100
-            for word, count in top_keywords
+            term: (term_counts[term] / total_words) * 100
+            for term in top_keywords
         }
     
     def _find_semantic_keywords(self, page_data) -> List[str]:
@@ -67,17 +94,35 @@ class KeywordAnalyzer:
         return semantic_keywords[:5]
     
     async def find_keyword_gaps(self, url: str, target_keywords: List[str]) -> Dict[str, Any]:
-        """Find keyword gaps compared to competitors."""
+        """Find keyword gaps compared to competitors, from the topic clusters of the stored corpus."""
+        gaps = await asyncio.to_thread(self.topic_gaps, url, target_keywords) if self.topic_gaps else None
+        if gaps is None:
+            logger.warning(f"No topic index available; keyword gaps for {url} are unknown")
+            return {
+                "missing_keywords": [],
+                "opportunity_keywords": [],
+                "competition_level": "unknown"
+            }
         return {
-            "missing_keywords": ["seo optimization", "search ranking"],
-            "opportunity_keywords": ["content marketing", "digital strategy"],
-            "competition_level": "medium"
+            "missing_keywords": gaps["missing_keywords"],
+            "opportunity_keywords": gaps["opportunity_keywords"],
+            "competition_level": gaps["competition_level"],
+            "topic_gaps": gaps["gaps"]
         }
     
     async def analyze_serp_competition(self, url: str) -> Dict[str, Any]:
-        """Analyze SERP competition for keywords."""
+        """Analyze competition for the topic a stored page belongs to."""
+        competition = await asyncio.to_thread(self.topic_competition, url) if self.topic_competition else None
+        if competition is None:
+            logger.warning(f"{url} has no topic assignment; competition is unknown")
+            return {
+                "competition_score": 0.0,
+                "top_competitors": [],
+                "keyword_difficulty": "unknown"
+            }
         return {
-            "competition_score": 65.0,
-            "top_competitors": ["competitor1.com", "competitor2.com"],
-            "keyword_difficulty": "medium"
+            "competition_score": competition["competition_score"],
+            "top_competitors": competition["top_competitors"],
+            "keyword_difficulty": competition["keyword_difficulty"],
+            "topic_keywords": competition["keywords"]
         }
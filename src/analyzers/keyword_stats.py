@@ -0,0 +1,112 @@
+"""N-gram keyword statistics shared by the keyword analyzer and the corpus index."""
+import math
+import re
+from collections import Counter
+from typing import Dict, List, Tuple
+
+MAX_NGRAM_SIZE = 3
+MAX_TOKEN_LENGTH = 40
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:['’][a-z]+)?")
+# Phrases never span sentence or list punctuation
+SEGMENT_BOUNDARY = re.compile(r"[.!?;:|•\n]+")
+
+STOPWORDS = frozenset("""
+a about above after again against all also am an and any are aren't as at be because been
+before being below between both but by can can't cannot could couldn't did didn't do does
+doesn't doing don't down during each even ever every few for from further get gets got had
+hadn't has hasn't have haven't having he her here hers herself him himself his how however
+i if in into is isn't it it's its itself just let's like may me might more most much must
+my myself no nor not now of off on once one only or other our ours ourselves out over own
+per same she should shouldn't since so some still such than that that's the their theirs
+them themselves then there there's these they they're this those though through to too
+under until up upon us use used using very via was wasn't we we're were weren't what
+what's when where which while who whom whose why will with within without won't would
+wouldn't yet you you're your yours yourself yourselves
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase ``text`` and split it into word tokens."""
+    if not text:
+        return []
+    return [
+        token.replace("’", "'")
+        for token in TOKEN_PATTERN.findall(text.lower())
+        if len(token) <= MAX_TOKEN_LENGTH
+    ]
+
+
+def _is_keyword_token(token: str) -> bool:
+    return token not in STOPWORDS and len(token) > 2 and not token.isdigit()
+
+
+def ngrams_from_tokens(tokens: List[str], max_n: int = MAX_NGRAM_SIZE) -> Counter:
+    """
+    Count unigrams, bigrams and trigrams of ``tokens`` in a single pass.
+
+    An n-gram is kept only when it starts and ends on a content word, so
+    "content strategy" and "return on investment" survive while "that" and
+    "with the" are dropped.
+    """
+    counts: Counter = Counter()
+    keyword_mask = [_is_keyword_token(token) for token in tokens]
+    total = len(tokens)
+
+    for start in range(total):
+        if not keyword_mask[start]:
+            continue
+        for size in range(1, max_n + 1):
+            end = start + size
+            if end > total:
+                break
+            if keyword_mask[end - 1]:
+                counts[" ".join(tokens[start:end])] += 1
+
+    return counts
+
+
+def extract_ngrams(text: str, max_n: int = MAX_NGRAM_SIZE) -> Counter:
+    """Tokenize ``text`` and count its keyword n-grams."""
+    counts: Counter = Counter()
+    if not text:
+        return counts
+    for segment in SEGMENT_BOUNDARY.split(text):
+        counts.update(ngrams_from_tokens(tokenize(segment), max_n))
+    return counts
+
+
+def inverse_document_frequency(document_frequency: int, total_documents: int) -> float:
+    """Smoothed IDF, always positive even for terms found in every document."""
+    return math.log((1 + total_documents) / (1 + document_frequency)) + 1.0
+
+
+def tfidf_keywords(term_counts: Dict[str, int], document_frequencies: Dict[str, int],
+                   total_documents: int, top_k: int = 10) -> List[Tuple[str, float]]:
+    """
+    Rank the terms of one document by TF-IDF.
+
+    Args:
+        term_counts: N-gram counts for the document (see ``extract_ngrams``)
+        document_frequencies: Number of corpus documents containing each term;
+            terms missing from the mapping are treated as unseen
+        total_documents: Number of documents in the corpus
+        top_k: Number of keywords to return
+
+    Returns:
+        List of ``(term, score)`` pairs, best first
+    """
+    scored = [
+        (term, (1.0 + math.log(count)) * inverse_document_frequency(
+            document_frequencies.get(term, 0), total_documents))
+        for term, count in term_counts.items()
+    ]
+    # On equal scores prefer the longer, more specific phrase
+    scored.sort(key=lambda item: (item[1], item[0].count(" ")), reverse=True)
+    return scored[:top_k]
+
+
+
+def index_terms(text: str) -> Counter:
+    """Count the single-word terms of ``text`` used for full-text indexing."""
+    return Counter(token for token in tokenize(text) if _is_keyword_token(token))
@@ -0,0 +1,117 @@
+"""MinHash signatures and LSH banding for near-duplicate page detection."""
+import hashlib
+import zlib
+from collections import defaultdict
+from typing import Dict, Hashable, Iterable, List, Set
+
+import numpy as np
+
+from .keyword_stats import tokenize
+
+SHINGLE_SIZE = 5
+NUM_PERMUTATIONS = 64
+# 8 bands of 8 rows puts the LSH S-curve midpoint near 0.77 Jaccard similarity
+LSH_BANDS = 8
+LSH_ROWS = NUM_PERMUTATIONS // LSH_BANDS
+NEAR_DUPLICATE_THRESHOLD = 0.8
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_rng = np.random.RandomState(20240917)  # Fixed seed: signatures are persisted and must stay comparable
+_PERM_A = _rng.randint(1, 1 << 31, size=(NUM_PERMUTATIONS, 1)).astype(np.uint64)
+_PERM_B = _rng.randint(0, 1 << 31, size=(NUM_PERMUTATIONS, 1)).astype(np.uint64)
+
+
+def shingle_hashes(text: str, size: int = SHINGLE_SIZE) -> np.ndarray:
+    """Hash every ``size``-word shingle of ``text`` to a 32-bit integer."""
+    tokens = tokenize(text)
+    if len(tokens) < size:
+        shingles = {" ".join(tokens)} if tokens else set()
+    else:
+        shingles = {" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+    return np.fromiter((zlib.crc32(shingle.encode("utf-8")) for shingle in shingles),
+                       dtype=np.uint64, count=len(shingles))
+
+
+def minhash_signature(text: str) -> np.ndarray:
+    """
+    Compute the MinHash signature of a text.
+
+    The fraction of equal positions between two signatures estimates the
+    Jaccard similarity of the texts' shingle sets.
+
+    Returns:
+        ``NUM_PERMUTATIONS`` uint32 values (all ``0xFFFFFFFF`` for empty text)
+    """
+    hashes = shingle_hashes(text)
+    if hashes.size == 0:
+        return np.full(NUM_PERMUTATIONS, np.iinfo(np.uint32).max, dtype=np.uint32)
+    permuted = (_PERM_A * hashes + _PERM_B) % _MERSENNE_PRIME
+    return (permuted.min(axis=1) & np.uint64(0xFFFFFFFF)).astype(np.uint32)
+
+
+def signature_to_bytes(signature: np.ndarray) -> bytes:
+    return signature.astype("<u4").tobytes()
+
+
+def signature_from_bytes(data: bytes) -> np.ndarray:
+    return np.frombuffer(data, dtype="<u4").astype(np.uint32)
+
+
+def estimated_similarity(first: np.ndarray, second: np.ndarray) -> float:
+    """Estimated Jaccard similarity of two MinHash signatures."""
+    return float(np.mean(first == second))
+
+
+def band_hashes(signature: np.ndarray) -> List[int]:
+    """Hash each LSH band of a signature to a signed 63-bit bucket id."""
+    raw = signature.astype("<u4").tobytes()
+    band_width = LSH_ROWS * 4
+    return [
+        int.from_bytes(hashlib.blake2b(raw[band * band_width:(band + 1) * band_width], digest_size=8).digest(),
+                       "little") >> 1
+        for band in range(LSH_BANDS)
+    ]
+
+
+class LSHIndex:
+    """In-memory LSH index for finding near-duplicates among a handful of texts."""
+
+    def __init__(self, threshold: float = NEAR_DUPLICATE_THRESHOLD):
+        self.threshold = threshold
+        self.signatures: Dict[Hashable, np.ndarray] = {}
+        self.buckets: Dict[tuple, Set[Hashable]] = defaultdict(set)
+
+    def insert(self, key: Hashable, signature: np.ndarray):
+        self.signatures[key] = signature
+        for band, bucket in enumerate(band_hashes(signature)):
+            self.buckets[(band, bucket)].add(key)
+
+    def query(self, signature: np.ndarray) -> List[Hashable]:
+        """Keys whose estimated similarity to ``signature`` meets the threshold."""
+        candidates = set()
+        for band, bucket in enumerate(band_hashes(signature)):
+            candidates |= self.buckets.get((band, bucket), set())
+        return [
+            key for key in candidates
+            if estimated_similarity(self.signatures[key], signature) >= self.threshold
+        ]
+
+
+def unique_text_indices(texts: Iterable[str], threshold: float = NEAR_DUPLICATE_THRESHOLD) -> List[int]:
+    """
+    Indices of the texts to keep after dropping near-duplicates.
+
+    The first occurrence of each group of near-duplicates is kept, so the
+    input order (e.g. search rank) decides which copy survives.
+    """
+    index = LSHIndex(threshold)
+    keep = []
+    for position, text in enumerate(texts):
+        if not text:
+            continue
+        signature = minhash_signature(text)
+        if index.query(signature):
+            continue
+        index.insert(position, signature)
+        keep.append(position)
+    return keep
@@ -0,0 +1,286 @@
+"""Page-weight and resource-timing measurement from a page's discovered subresources."""
+import logging
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field, replace
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urldefrag, urljoin, urlsplit
+
+import requests
+from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+KIND_DOCUMENT = "document"
+KIND_SCRIPT = "script"
+KIND_STYLESHEET = "stylesheet"
+KIND_IMAGE = "image"
+KIND_FONT = "font"
+KIND_OTHER = "other"
+_PRELOAD_KINDS = {"script": KIND_SCRIPT, "style": KIND_STYLESHEET, "image": KIND_IMAGE, "font": KIND_FONT}
+_FONT_URL = re.compile(r"url\(\s*['\"]?([^'\")]+\.(?:woff2?|ttf|otf|eot)(?:[?#][^'\")]*)?)['\"]?\s*\)", re.IGNORECASE)
+
+# Browsers open about six connections per host; probing with more would distort TTFB
+MAX_REQUESTS_PER_HOST = 6
+MAX_CSS_BYTES = 2 * 1024 * 1024  # Stylesheets are downloaded to find the fonts they load
+MAX_BODY_BYTES = 10 * 1024 * 1024  # Cap for servers that ignore HEAD and Range
+# Lighthouse's simulated mobile link, used to turn bytes into transfer time
+DEFAULT_BANDWIDTH_BYTES_PER_SECOND = 1.6 * 1024 * 1024 / 8
+
+
+@dataclass
+class ResourceTiming:
+    """Size and timing of one fetched resource."""
+    url: str
+    kind: str
+    status: Optional[int] = None
+    bytes: Optional[int] = None  # Transfer size (compressed if the server compresses)
+    ttfb_ms: Optional[float] = None
+    total_ms: Optional[float] = None
+    method: str = "HEAD"  # HEAD, RANGE or GET: how the size was obtained
+    render_blocking: bool = False
+    cached: bool = False  # Served from the per-site cache instead of fetched for this page
+    error: Optional[str] = None
+    fonts: List[str] = field(default_factory=list)  # Font URLs referenced by a stylesheet
+
+
+def _resolve(url: Optional[str], base_url: str) -> Optional[str]:
+    if not url or url.strip().startswith(("data:", "blob:", "javascript:", "#")):
+        return None
+    resolved, _ = urldefrag(urljoin(base_url, url.strip()))
+    return resolved if urlsplit(resolved).scheme in ("http", "https") else None
+
+
+def _decode_body(body: bytes, content_encoding: str) -> bytes:
+    """Decompress a raw (possibly truncated) body; unknown encodings such as brotli yield nothing."""
+    encoding = content_encoding.strip().lower()
+    if not encoding or encoding == "identity":
+        return body
+    if encoding in ("gzip", "deflate"):
+        for wbits in ((16 + zlib.MAX_WBITS,) if encoding == "gzip" else (zlib.MAX_WBITS, -zlib.MAX_WBITS)):
+            try:
+                return zlib.decompressobj(wbits).decompress(body)
+            except zlib.error:
+                continue
+    return b""
+
+
+def discover_resources(soup: BeautifulSoup, base_url: str) -> List[Tuple[str, str, bool]]:
+    """
+    Find the subresources a page loads.
+
+    Returns:
+        Unique ``(url, kind, render_blocking)`` tuples in document order.
+        Stylesheets and synchronous scripts in ``<head>`` count as render-blocking.
+    """
+    base = soup.find("base", href=True)
+    base_url = urljoin(base_url, base["href"]) if base else base_url
+    found: "OrderedDict[str, Tuple[str, bool]]" = OrderedDict()
+
+    def add(url: Optional[str], kind: str, blocking: bool = False):
+        url = _resolve(url, base_url)
+        if url and url not in found:
+            found[url] = (kind, blocking)
+        elif url and blocking:
+            found[url] = (found[url][0], True)
+
+    for script in soup.find_all("script", src=True):
+        blocking = (script.find_parent("head") is not None and not script.has_attr("async")
+                    and not script.has_attr("defer") and script.get("type") != "module")
+        add(script["src"], KIND_SCRIPT, blocking)
+    for link in soup.find_all("link", href=True):
+        rel = {value.lower() for value in link.get("rel", [])}
+        if "stylesheet" in rel:
+            add(link["href"], KIND_STYLESHEET, link.get("media", "all").lower() not in ("print", "none"))
+        elif rel & {"preload", "modulepreload"}:
+            add(link["href"], _PRELOAD_KINDS.get(link.get("as", "").lower(), KIND_OTHER))
+        elif rel & {"icon", "apple-touch-icon"}:
+            add(link["href"], KIND_IMAGE)
+    for image in soup.find_all(["img", "source"]):
+        add(image.get("src"), KIND_IMAGE)
+        srcset = image.get("srcset")
+        if srcset:
+            # A browser downloads one candidate; the first is a fair stand-in
+            add(srcset.split(",")[0].strip().split(" ")[0], KIND_IMAGE)
+    for style in soup.find_all("style"):
+        for font_url in _FONT_URL.findall(style.get_text()):
+            add(font_url, KIND_FONT)
+    return [(url, kind, blocking) for url, (kind, blocking) in found.items()]
+
+
+def critical_path_ms(document: ResourceTiming, resources: List[ResourceTiming],
+                     bandwidth: float = DEFAULT_BANDWIDTH_BYTES_PER_SECOND) -> Optional[float]:
+    """
+    Estimate the time to first render.
+
+    The document must arrive first; render-blocking resources are then
+    requested in parallel, so the estimate adds the slowest of their TTFBs
+    and the time to transfer all of their bytes over the shared link.
+    """
+    if document.ttfb_ms is None:
+        return None
+    total = document.ttfb_ms + 1000 * (document.bytes or 0) / bandwidth
+    blocking = [resource for resource in resources if resource.render_blocking and resource.error is None]
+    if blocking:
+        total += max(resource.ttfb_ms or 0.0 for resource in blocking)
+        total += 1000 * sum(resource.bytes or 0 for resource in blocking) / bandwidth
+    return total
+
+
+class ResourceTimer:
+    """
+    Measures subresources over a pooled HTTP session.
+
+    Sizes come from ``HEAD`` where the server reports ``Content-Length``,
+    then from a one-byte ``Range`` request, and only as a last resort from
+    a capped download. Results are cached per resource URL, so shared
+    scripts, stylesheets and fonts are fetched once per site.
+    """
+
+    def __init__(self, max_workers: int = 16, max_per_host: int = MAX_REQUESTS_PER_HOST,
+                 timeout: float = 10.0, cache_size: int = 2048,
+                 bandwidth: float = DEFAULT_BANDWIDTH_BYTES_PER_SECOND,
+                 session: Optional[requests.Session] = None):
+        self.timeout = timeout
+        self.max_per_host = max_per_host
+        self.bandwidth = bandwidth
+        self.cache_size = cache_size
+        self.session = session or requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_per_host)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        # Only encodings _decode_body understands, so stylesheet bodies can be scanned for fonts
+        self.session.headers["Accept-Encoding"] = "gzip, deflate"
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="resource-timer")
+        self._host_slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._cache: "OrderedDict[str, ResourceTiming]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+        self.session.close()
+
+    def _host_slot(self, url: str) -> threading.BoundedSemaphore:
+        host = urlsplit(url).netloc
+        with self._lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.BoundedSemaphore(self.max_per_host)
+            return self._host_slots[host]
+
+    def _cached(self, url: str) -> Optional[ResourceTiming]:
+        with self._lock:
+            timing = self._cache.get(url)
+            if timing is not None:
+                self._cache.move_to_end(url)
+            return timing
+
+    def _store(self, timing: ResourceTiming):
+        with self._lock:
+            self._cache[timing.url] = timing
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _read(self, response: requests.Response, limit: int) -> bytes:
+        body = bytearray()
+        for chunk in response.raw.stream(64 * 1024, decode_content=False):
+            body += chunk
+            if len(body) >= limit:
+                break
+        return bytes(body)
+
+    def _fetch(self, url: str, kind: str) -> ResourceTiming:
+        timing = ResourceTiming(url=url, kind=kind)
+        started = time.monotonic()
+        try:
+            with self._host_slot(url):
+                if kind == KIND_STYLESHEET:
+                    timing.method = "GET"
+                    response = self.session.get(url, timeout=self.timeout, stream=True)
+                    body = self._read(response, MAX_CSS_BYTES)
+                    timing.bytes = len(body)
+                    css = _decode_body(body, response.headers.get("Content-Encoding", "")).decode(
+                        response.encoding or "utf-8", errors="replace")
+                    fonts = (_resolve(match, url) for match in _FONT_URL.findall(css))
+                    timing.fonts = list(dict.fromkeys(font for font in fonts if font))
+                else:
+                    response = self.session.head(url, timeout=self.timeout, allow_redirects=True)
+                    length = response.headers.get("Content-Length")
+                    if response.status_code >= 400 or length is None:
+                        timing.method = "RANGE"
+                        response = self.session.get(url, timeout=self.timeout, stream=True, headers={"Range": "bytes=0-0"})
+                        content_range = response.headers.get("Content-Range", "")
+                        if response.status_code == 206 and "/" in content_range and not content_range.endswith("/*"):
+                            length = content_range.rsplit("/", 1)[1]
+                        else:
+                            # Range ignored: download (capped) and count what arrives
+                            timing.method = "GET"
+                            length = response.headers.get("Content-Length") or len(self._read(response, MAX_BODY_BYTES))
+                    timing.bytes = int(length)
+                response.close()
+            timing.status = response.status_code
+            timing.ttfb_ms = response.elapsed.total_seconds() * 1000
+            if response.status_code >= 400:
+                timing.error = f"HTTP {response.status_code}"
+        except (requests.RequestException, ValueError) as e:
+            logger.debug(f"Could not measure {url}: {e}")
+            timing.error = str(e)
+        timing.total_ms = (time.monotonic() - started) * 1000
+        return timing
+
+    def measure(self, resources: List[Tuple[str, str, bool]]) -> List[ResourceTiming]:
+        """Measure resources concurrently, reusing cached results; fonts found in stylesheets are measured too."""
+        results: Dict[str, ResourceTiming] = {}
+        futures = {}
+        queue = list(resources)
+        while queue or futures:
+            for url, kind, blocking in queue:
+                if url in results or url in futures:
+                    continue
+                cached = self._cached(url)
+                if cached is not None:
+                    results[url] = replace(cached, render_blocking=blocking, cached=True)
+                    queue.extend((font, KIND_FONT, False) for font in cached.fonts)
+                else:
+                    futures[url] = (self.executor.submit(self._fetch, url, kind), blocking)
+            queue = []
+            for url, (future, blocking) in list(futures.items()):
+                timing = future.result()
+                self._store(timing)
+                results[url] = replace(timing, render_blocking=blocking)
+                queue.extend((font, KIND_FONT, False) for font in timing.fonts)
+                del futures[url]
+        return list(results.values())
+
+    def measure_page(self, url: str, soup: BeautifulSoup, html_bytes: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Page weight, request count and critical-path estimate of a parsed page.
+
+        Args:
+            url: The page URL (subresource URLs are resolved against it)
+            soup: The parsed page
+            html_bytes: Size of the HTML if already known; otherwise it is measured
+        """
+        document = self._fetch(url, KIND_DOCUMENT)
+        if html_bytes is not None:
+            document.bytes = html_bytes
+        resources = self.measure(discover_resources(soup, url))
+        fetched = [resource for resource in resources if resource.error is None]
+        bytes_by_kind: Dict[str, int] = {}
+        for resource in [document] + fetched:
+            bytes_by_kind[resource.kind] = bytes_by_kind.get(resource.kind, 0) + (resource.bytes or 0)
+        return {
+            "page_weight_bytes": sum(bytes_by_kind.values()),
+            "request_count": 1 + len(resources),
+            "bytes_by_kind": bytes_by_kind,
+            "render_blocking_count": sum(resource.render_blocking for resource in resources),
+            "critical_path_ms": critical_path_ms(document, resources, self.bandwidth),
+            "document": asdict(document),
+            "resources": [asdict(resource) for resource in resources],
+            "cached_resources": sum(resource.cached for resource in resources),
+            "failed_resources": len(resources) - len(fetched),
+        }
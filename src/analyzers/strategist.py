@@ -1,5 +1,5 @@
 import os
-from typing import List, Dict
+from typing import List, Dict, Optional
 from openai import OpenAI
 from groq import Groq
 from dotenv import load_dotenv
@@ -27,15 +27,23 @@ if groq_key:
 else:
     raise ValueError("GROQ_API_KEY environment variable not set.")
 
-def generate_content_strategy(competitor_texts: List[str]) -> str:
+class StrategyGenerationError(Exception):
+    """The LLM call for a content strategy failed (API error, quota or timeout)."""
+
+
+def generate_content_strategy(competitor_texts: List[str], timeout: Optional[float] = None) -> str:
     """
     Generate a content strategy using Kimi AI based on competitor content texts.
     
     Args:
         competitor_texts (List[str]): List of competitor content texts.
+        timeout (Optional[float]): Seconds the LLM call may take, without retries (default: client defaults).
     
     Returns:
         str: The generated content strategy blueprint.
+    
+    Raises:
+        StrategyGenerationError: If the LLM call fails.
     """
     print("Reached generate_content_strategy, texts length:", len(competitor_texts))
     try:
@@ -64,7 +72,8 @@ def generate_content_strategy(competitor_texts: List[str]) -> str:
         
         if groq_key:
             try:
-                groq_response = groq_client.chat.completions.create(
+                llm_client = groq_client.with_options(timeout=timeout, max_retries=0) if timeout is not None else groq_client
+                groq_response = llm_client.chat.completions.create(
                     model="moonshotai/kimi-k2-instruct-0905",
                     messages=[
                         {"role": "system", "content": "You are a content strategist AI. Provide detailed, actionable content strategies based on competitor analysis."},
@@ -77,9 +86,11 @@ def generate_content_strategy(competitor_texts: List[str]) -> str:
                 return groq_response.choices[0].message.content
             except Exception as groq_error:
                 print(f"Groq error: {groq_error}")
-                return f"Strategy generation failed: {str(groq_error)}. Verify Groq API key and quota."
+                raise StrategyGenerationError(f"{groq_error}. Verify Groq API key and quota.") from groq_error
         else:
             return "No GROQ_API_KEY set. Please configure it for Kimi via Groq."
+    except StrategyGenerationError:
+        raise
     except Exception as e:
         print(f"Exception in generate_content_strategy: {e}")
         raise Exception(f"Failed to generate content strategy: {e}")
\ No newline at end of file
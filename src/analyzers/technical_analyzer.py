@@ -1,6 +1,8 @@
 """Technical SEO analyzer for website performance and structure."""
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+
+from .resource_timing import ResourceTimer
 
 logger = logging.getLogger(__name__)
 
@@ -8,18 +10,46 @@ logger = logging.getLogger(__name__)
 class TechnicalAnalyzer:
     """Analyzes technical SEO aspects."""
     
+    def __init__(self, measure_resources: bool = False, resource_timer: Optional[ResourceTimer] = None):
+        """
+        Initialize the technical analyzer.
+        
+        Args:
+            measure_resources: Fetch the page's subresources to measure real page
+                weight and timing instead of scoring speed from the HTML size alone
+            resource_timer: Shared timer (and resource cache) to use when measuring
+        """
+        self.measure_resources = measure_resources or resource_timer is not None
+        self.resource_timer = resource_timer or (ResourceTimer() if measure_resources else None)
+    
     async def analyze(self, page_data) -> Dict[str, Any]:
         """Analyze technical SEO factors."""
-        return {
-            "page_speed_score": self._analyze_page_speed(page_data),
+        page_weight = self._measure_page_weight(page_data) if self.measure_resources else None
+        result = {
+            "page_speed_score": self._analyze_page_speed(page_data, page_weight),
             "mobile_friendly_score": self._analyze_mobile_friendly(page_data),
             "structured_data_score": self._analyze_structured_data(page_data),
             "url_structure_score": self._analyze_url_structure(page_data),
             "internal_linking_score": self._analyze_internal_linking(page_data)
         }
+        if page_weight is not None:
+            result["page_weight"] = page_weight
+        return result
+    
+    def _measure_page_weight(self, page_data) -> Optional[Dict[str, Any]]:
+        """Measure the page and its subresources; None if the measurement fails."""
+        try:
+            return self.resource_timer.measure_page(page_data.url, page_data.soup,
+                                                    html_bytes=len(page_data.html.encode('utf-8')))
+        except Exception as e:
+            logger.warning(f"Resource measurement failed for {page_data.url}: {str(e)}")
+            return None
     
-    def _analyze_page_speed(self, page_data) -> float:
+    def _analyze_page_speed(self, page_data, page_weight: Optional[Dict[str, Any]] = None) -> float:
         """Analyze page speed factors."""
+        if page_weight and page_weight.get("critical_path_ms") is not None:
+            return self._score_measured_speed(page_weight)
+        
         content_size = len(page_data.html)
         
         if content_size < 50000:
@@ -31,6 +61,26 @@ class TechnicalAnalyzer:
         else:
             return 50.0
     
+    def _score_measured_speed(self, page_weight: Dict[str, Any]) -> float:
+        """Score speed from the estimated critical path, penalising heavy and request-hungry pages."""
+        critical_path = page_weight["critical_path_ms"]
+        if critical_path < 1000:
+            score = 95.0
+        elif critical_path < 2500:
+            score = 85.0
+        elif critical_path < 4000:
+            score = 70.0
+        elif critical_path < 6000:
+            score = 55.0
+        else:
+            score = 40.0
+        
+        if page_weight["page_weight_bytes"] > 3 * 1024 * 1024:
+            score -= 10.0
+        if page_weight["request_count"] > 100:
+            score -= 5.0
+        return max(score, 0.0)
+    
     def _analyze_mobile_friendly(self, page_data) -> float:
         """Analyze mobile-friendliness."""
         viewport = page_data.soup.find('meta', attrs={'name': 'viewport'})
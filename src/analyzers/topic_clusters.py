@@ -0,0 +1,125 @@
+"""Mini-batch k-means topic clusters over stored page embeddings.
+
+Centroids live in the same space as the stored vectors and use the same L2
+distance as vector search. Each centroid keeps the number of points folded
+into it, which sets its learning rate (``1 / count``), so it can keep
+absorbing pages one save at a time after the initial fit.
+"""
+import os
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+TOPIC_CLUSTERS = int(os.getenv("TOPIC_CLUSTERS", "64"))
+TOPIC_PROBE_CLUSTERS = int(os.getenv("TOPIC_PROBE_CLUSTERS", "8"))  # Clusters a pruned search scans
+MIN_PAGES_PER_CLUSTER = 4
+GAP_MIN_COMPETITOR_PAGES = 2  # Competitor pages a topic needs before it counts as a gap
+
+
+def cluster_count(page_count: int, max_clusters: int = TOPIC_CLUSTERS) -> int:
+    """Number of clusters to fit for a corpus of ``page_count`` pages (0: too small to cluster)."""
+    k = min(max_clusters, page_count // MIN_PAGES_PER_CLUSTER)
+    return k if k >= 2 else 0
+
+
+def squared_distances(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """``(n, k)`` squared L2 distances between vectors and centroids."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    squared = (np.square(vectors).sum(axis=1)[:, None] + np.square(centroids).sum(axis=1)[None, :]
+               - 2.0 * vectors @ centroids.T)
+    return np.maximum(squared, 0.0)
+
+
+def assign_clusters(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Index of the nearest centroid for each vector."""
+    return np.argmin(squared_distances(vectors, centroids), axis=1)
+
+
+def kmeans_plus_plus(sample: np.ndarray, k: int, seed: int = 0) -> np.ndarray:
+    """Pick ``k`` initial centroids from ``sample``, spread out by k-means++ seeding."""
+    sample = np.asarray(sample, dtype=np.float32)
+    rng = np.random.RandomState(seed)
+    centroids = [sample[rng.randint(len(sample))]]
+    closest = squared_distances(sample, centroids[0][None, :])[:, 0]
+    for _ in range(1, k):
+        total = closest.sum()
+        index = rng.choice(len(sample), p=closest / total) if total > 0 else rng.randint(len(sample))
+        centroids.append(sample[index])
+        closest = np.minimum(closest, squared_distances(sample, sample[index][None, :])[:, 0])
+    return np.stack(centroids)
+
+
+def minibatch_update(centroids: np.ndarray, counts: np.ndarray, batch: np.ndarray) -> np.ndarray:
+    """
+    Fold one mini-batch into the centroids, in place.
+
+    Every centroid moves towards the mean of the batch points assigned to
+    it with a per-centroid learning rate of ``1 / count``, so well-populated
+    centroids settle while new ones still move.
+
+    Returns:
+        The cluster assigned to each batch point
+    """
+    batch = np.asarray(batch, dtype=np.float32)
+    labels = assign_clusters(batch, centroids)
+    for cluster in np.unique(labels):
+        members = batch[labels == cluster]
+        counts[cluster] += len(members)
+        centroids[cluster] += (members.sum(axis=0) - len(members) * centroids[cluster]) / counts[cluster]
+    return labels
+
+
+def fit_minibatch_kmeans(batches: Iterable[np.ndarray], initial: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Run mini-batch k-means over a stream of batches, starting from ``initial``.
+
+    Returns:
+        ``(centroids, counts)``
+    """
+    centroids = np.array(initial, dtype=np.float32)
+    counts = np.zeros(len(centroids), dtype=np.int64)
+    for batch in batches:
+        if len(batch):
+            minibatch_update(centroids, counts, batch)
+    return centroids, counts
+
+
+def nearest_clusters(queries: np.ndarray, centroids: np.ndarray, n_probe: int = TOPIC_PROBE_CLUSTERS) -> np.ndarray:
+    """Union of the ``n_probe`` clusters nearest to each of one or more queries."""
+    queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+    n_probe = min(n_probe, len(centroids))
+    nearest = np.argpartition(squared_distances(queries, centroids), n_probe - 1, axis=1)[:, :n_probe]
+    return np.unique(nearest)
+
+
+def coverage_gaps(clusters: Sequence[int], own_pages: Dict[int, int], competitor_pages: Dict[int, int],
+                  min_competitor_pages: int = GAP_MIN_COMPETITOR_PAGES) -> List[Dict[str, int]]:
+    """
+    Topics competitors cover better than a site, most covered by competitors first.
+
+    A topic is a gap when competitors have at least ``min_competitor_pages``
+    pages in it and the site has none (``missing``) or fewer than its
+    share of the topic's pages across the compared set (``under_covered``).
+    """
+    total_own = sum(own_pages.get(cluster, 0) for cluster in clusters)
+    total_competitors = sum(competitor_pages.get(cluster, 0) for cluster in clusters)
+    own_share = total_own / (total_own + total_competitors) if total_own + total_competitors else 0.0
+    gaps = []
+    for cluster in clusters:
+        own, competitors = own_pages.get(cluster, 0), competitor_pages.get(cluster, 0)
+        if competitors < min_competitor_pages:
+            continue
+        if own == 0:
+            gaps.append({"cluster": int(cluster), "own_pages": own, "competitor_pages": competitors, "kind": "missing"})
+        elif own / (own + competitors) < own_share:
+            gaps.append({"cluster": int(cluster), "own_pages": own, "competitor_pages": competitors,
+                         "kind": "under_covered"})
+    return sorted(gaps, key=lambda gap: (gap["own_pages"] > 0, -gap["competitor_pages"]))
+
+
+def competition_level(own_pages: int, competitor_pages: int, competitor_domains: Optional[int] = None) -> str:
+    """Coarse competition label from how crowded a set of topics is."""
+    crowd = competitor_domains if competitor_domains is not None else competitor_pages
+    if crowd == 0 or competitor_pages <= own_pages:
+        return "low"
+    return "medium" if crowd < 20 else "high"
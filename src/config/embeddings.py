@@ -0,0 +1,51 @@
+"""Embedding model and stored-vector size, shared by the analyzers and the database layer."""
+import os
+
+from dotenv import load_dotenv
+
+from src.config.memory import LOW_MEMORY_MODE
+
+load_dotenv()
+
+DEFAULT_EMBEDDING_MODEL = "paraphrase-MiniLM-L3-v2"
+# Output sizes of common sentence-transformers models; set EMBEDDING_MODEL_DIM for others
+KNOWN_MODEL_DIMENSIONS = {
+    "paraphrase-MiniLM-L3-v2": 384,
+    "paraphrase-MiniLM-L6-v2": 384,
+    "all-MiniLM-L6-v2": 384,
+    "all-MiniLM-L12-v2": 384,
+    "multi-qa-MiniLM-L6-cos-v1": 384,
+    "BAAI/bge-small-en-v1.5": 384,
+    "all-mpnet-base-v2": 768,
+    "BAAI/bge-base-en-v1.5": 768,
+}
+
+
+def embedding_version(model: str, model_dim: int, dim: int, precision: str = "fp32") -> str:
+    """Identifier stored with every vector; vectors are only ever compared within one version."""
+    version = f"{model}@{dim}" if dim == model_dim else f"{model}@pca{dim}"
+    # Reduced-precision weights shift the vectors, so they form versions of their own
+    return version if precision == "fp32" else f"{version}+{precision}"
+
+
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", DEFAULT_EMBEDDING_MODEL)
+EMBEDDING_MODEL_DIM = int(os.getenv("EMBEDDING_MODEL_DIM") or KNOWN_MODEL_DIMENSIONS.get(EMBEDDING_MODEL, 0))
+if not EMBEDDING_MODEL_DIM:
+    raise ValueError(f"Unknown output size for embedding model {EMBEDDING_MODEL}; set EMBEDDING_MODEL_DIM.")
+
+# fp32 is the reference; int8 (dynamic quantization of the linear layers) roughly
+# quarters the weights on CPU, fp16 halves them and is mainly useful on GPU
+MODEL_PRECISION = os.getenv("EMBEDDING_MODEL_PRECISION", "int8" if LOW_MEMORY_MODE else "fp32").lower()
+if MODEL_PRECISION not in ("fp32", "fp16", "int8"):
+    raise ValueError("EMBEDDING_MODEL_PRECISION must be one of fp32, fp16, int8.")
+
+# Dimensions actually stored and searched; below the model's size a PCA projection fitted on the corpus is applied
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIMENSIONS") or EMBEDDING_MODEL_DIM)
+if not 0 < EMBEDDING_DIM <= EMBEDDING_MODEL_DIM:
+    raise ValueError(f"EMBEDDING_DIMENSIONS must be between 1 and {EMBEDDING_MODEL_DIM}.")
+
+EMBEDDING_VERSION = embedding_version(EMBEDDING_MODEL, EMBEDDING_MODEL_DIM, EMBEDDING_DIM, MODEL_PRECISION)
+# Unreduced vectors of the configured model, usable to fit a projection without re-embedding
+FULL_EMBEDDING_VERSION = embedding_version(EMBEDDING_MODEL, EMBEDDING_MODEL_DIM, EMBEDDING_MODEL_DIM, MODEL_PRECISION)
+# Rows written before versions were recorded
+LEGACY_EMBEDDING_VERSION = embedding_version(DEFAULT_EMBEDDING_MODEL, 384, 384)
@@ -0,0 +1,71 @@
+"""Low-memory operating mode and per-request peak-memory reporting."""
+import contextlib
+import ctypes
+import gc
+import os
+import resource
+import sys
+import tracemalloc
+from typing import Dict, Iterator
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def _env_flag(name: str, default: bool = False) -> bool:
+    return os.getenv(name, str(default)).strip().lower() in ("1", "true", "yes", "on")
+
+
+# Smaller batches, quantized model weights, capped downloads and eager freeing for ~512 MB instances
+LOW_MEMORY_MODE = _env_flag("LOW_MEMORY_MODE")
+# Trace Python allocations and report each request's peak (slows allocation-heavy code)
+MEMORY_REPORT = _env_flag("MEMORY_REPORT")
+
+if MEMORY_REPORT and not tracemalloc.is_tracing():
+    tracemalloc.start()
+
+try:
+    _libc = ctypes.CDLL("libc.so.6") if sys.platform.startswith("linux") else None
+except OSError:
+    _libc = None
+
+
+def release_memory():
+    """
+    Collect garbage and hand freed heap pages back to the OS.
+
+    CPython frees objects promptly, but glibc keeps the released arenas
+    mapped, so the RSS of a process that parsed one huge page stays high
+    until ``malloc_trim`` is called.
+    """
+    gc.collect()
+    if _libc is not None:
+        _libc.malloc_trim(0)
+
+
+def _peak_rss_kib() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak  # bytes on macOS, KiB on Linux
+
+
+@contextlib.contextmanager
+def track_peak_memory(label: str) -> Iterator[Dict[str, int]]:
+    """
+    Measure the peak Python heap usage of a block.
+
+    Yields a dict that is filled in on exit with ``python_peak_kib`` (only
+    when ``MEMORY_REPORT`` is on) and the process-lifetime ``rss_peak_kib``.
+    The tracemalloc peak is process-wide, so requests that overlap share it.
+    """
+    report: Dict[str, int] = {}
+    if tracemalloc.is_tracing():
+        tracemalloc.reset_peak()
+    try:
+        yield report
+    finally:
+        if tracemalloc.is_tracing():
+            report["python_peak_kib"] = tracemalloc.get_traced_memory()[1] // 1024
+        report["rss_peak_kib"] = _peak_rss_kib()
+        details = ", ".join(f"{key}={value}" for key, value in report.items())
+        print(f"Memory for {label}: {details}")
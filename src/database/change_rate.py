@@ -0,0 +1,52 @@
+"""Content fingerprints and per-page change-rate estimates for re-crawl scheduling."""
+import hashlib
+import math
+import re
+
+# Before any history exists, assume a page changes about once a week
+PRIOR_CHANGES_PER_DAY = 1 / 7
+MIN_REFRESH_DAYS = 0.25
+MAX_REFRESH_DAYS = 60.0
+# Re-fetch once a page has even odds of having changed
+TARGET_CHANGE_PROBABILITY = 0.5
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def content_fingerprint(content: str) -> str:
+    """Whitespace- and case-insensitive SHA-256 of page text."""
+    normalized = _WHITESPACE.sub(" ", content or "").strip().lower()
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def estimate_change_rate(observations: int, changes: int, observed_days: float) -> float:
+    """
+    Estimate how often a page changes, in changes per day.
+
+    Each re-fetch only reveals whether the page changed at least once since
+    the previous fetch, so counting changes underestimates fast-changing
+    pages. This uses the bias-reduced Poisson estimator of Cho and
+    Garcia-Molina, ``-ln((n - X + 0.5) / (n + 0.5)) / I``, where ``I`` is the
+    mean interval between fetches.
+
+    Args:
+        observations: Number of re-fetches compared with a previous fetch
+        changes: How many of those found different content
+        observed_days: Total days spanned by those re-fetches
+    """
+    if observations <= 0 or observed_days <= 0:
+        return PRIOR_CHANGES_PER_DAY
+    mean_interval = observed_days / observations
+    ratio = (observations - changes + 0.5) / (observations + 0.5)
+    return max(-math.log(ratio) / mean_interval, 1 / (MAX_REFRESH_DAYS * 4))
+
+
+def change_probability(change_rate: float, age_days: float) -> float:
+    """Probability that a page has changed ``age_days`` after it was fetched."""
+    return 1.0 - math.exp(-change_rate * max(age_days, 0.0))
+
+
+def refresh_interval_days(change_rate: float) -> float:
+    """Days until the change probability reaches ``TARGET_CHANGE_PROBABILITY``, clamped."""
+    interval = -math.log(1.0 - TARGET_CHANGE_PROBABILITY) / change_rate
+    return min(max(interval, MIN_REFRESH_DAYS), MAX_REFRESH_DAYS)
@@ -0,0 +1,54 @@
+"""Compression codecs for page content stored outside the scraped_pages rows."""
+import threading
+import zlib
+from typing import Tuple
+
+try:
+    import zstandard
+except ImportError:  # zlib is always available, zstd is faster and smaller when installed
+    zstandard = None
+
+CODEC_ZSTD = "zstd"
+CODEC_ZLIB = "zlib"
+ZSTD_LEVEL = 3
+ZLIB_LEVEL = 6
+
+# zstandard (de)compressor objects must not be used from several threads at once, so each thread gets its own
+_zstd_local = threading.local()
+
+
+def _zstd_compressor():
+    if not hasattr(_zstd_local, "compressor"):
+        _zstd_local.compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+    return _zstd_local.compressor
+
+
+def _zstd_decompressor():
+    if not hasattr(_zstd_local, "decompressor"):
+        _zstd_local.decompressor = zstandard.ZstdDecompressor()
+    return _zstd_local.decompressor
+
+
+def compress_content(content: str) -> Tuple[str, bytes]:
+    """
+    Compress page text with the best available codec.
+
+    Returns:
+        ``(codec, data)``; the codec name is stored alongside the data so
+        rows stay readable if the preferred codec changes.
+    """
+    raw = content.encode("utf-8")
+    if zstandard is not None:
+        return CODEC_ZSTD, _zstd_compressor().compress(raw)
+    return CODEC_ZLIB, zlib.compress(raw, ZLIB_LEVEL)
+
+
+def decompress_content(codec: str, data: bytes) -> str:
+    """Inverse of ``compress_content``."""
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("Page content is zstd-compressed but the zstandard package is not installed.")
+        return _zstd_decompressor().decompress(data).decode("utf-8")
+    if codec == CODEC_ZLIB:
+        return zlib.decompress(data).decode("utf-8")
+    raise ValueError(f"Unknown content codec: {codec}")
@@ -1,14 +1,46 @@
 import os
-import struct
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Text, text
+import heapq
+import json
+import threading
+import time
+from collections import Counter
+from sqlalchemy import create_engine, inspect, exists, and_, or_, tuple_, bindparam, BigInteger, Column, Float, Integer, LargeBinary, String, DateTime, Text, select, text, func
+from sqlalchemy.dialects import mysql, sqlite
 from sqlalchemy.dialects.mysql import BLOB
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import deferred, sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
-from typing import List
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from collections import OrderedDict
 from dotenv import load_dotenv
 import datetime
 import numpy as np
 
+from src.config.embeddings import (
+    EMBEDDING_DIM, EMBEDDING_MODEL_DIM, EMBEDDING_VERSION, FULL_EMBEDDING_VERSION,
+    LEGACY_EMBEDDING_VERSION,
+)
+from src.database.content_store import compress_content, decompress_content
+from src.database.projection import project, projection_from_bytes, projection_to_bytes
+from src.database.change_rate import (
+    change_probability, content_fingerprint, estimate_change_rate, refresh_interval_days,
+)
+from src.database.vector_codec import (
+    FORMAT_FP32, STORAGE_FORMATS, binary_code, decode_embedding, encode_embedding,
+    evaluate_recall, two_phase_search, two_phase_search_batch,
+)
+from src.analyzers.keyword_stats import extract_ngrams, index_terms, tfidf_keywords
+from src.analyzers.bm25 import bm25_idf, bm25_term_score, fuse_scores
+from src.analyzers.boilerplate import (
+    TEMPLATE_LEARN_PAGES, TEMPLATE_MIN_PAGES, block_hash, domain_of, page_block_hashes, strip_template_blocks,
+    template_threshold, template_version,
+)
+from src.config.memory import LOW_MEMORY_MODE
+from src.analyzers.topic_clusters import TOPIC_PROBE_CLUSTERS, assign_clusters, minibatch_update, nearest_clusters
+from src.analyzers.near_duplicates import (
+    NEAR_DUPLICATE_THRESHOLD, band_hashes, estimated_similarity, minhash_signature,
+    signature_from_bytes, signature_to_bytes, unique_text_indices,
+)
+
 dotenv_path = os.path.join(os.path.dirname(__file__), '..', '..', '.env')
 load_dotenv(dotenv_path=dotenv_path)
 
@@ -17,6 +49,12 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise ValueError("DATABASE_URL environment variable not set.")
 
+# fp32 keeps TiDB's native VEC_* functions usable; fp16/int8 shrink stored vectors 2-4x
+EMBEDDING_STORAGE_FORMAT = os.getenv("EMBEDDING_STORAGE_FORMAT", FORMAT_FP32).lower()
+
+if EMBEDDING_STORAGE_FORMAT not in STORAGE_FORMATS:
+    raise ValueError(f"EMBEDDING_STORAGE_FORMAT must be one of {', '.join(STORAGE_FORMATS)}.")
+
 connect_args = {'ssl_verify_identity': False, 'ssl_ca': '/etc/ssl/cert.pem'}
 engine = create_engine(DATABASE_URL, connect_args=connect_args, pool_pre_ping=True)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -26,34 +64,615 @@ class ScrapedPage(Base):
     __tablename__ = "scraped_pages"
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     url = Column(String(1024), unique=True, index=True, nullable=False)
-    content = Column(Text, nullable=True)
+    # Legacy inline content; new content lives compressed in page_contents (see load_page_contents)
+    content = deferred(Column(Text, nullable=True))
     scraped_at = Column(DateTime, default=datetime.datetime.utcnow)
     status = Column(String(50), default="scraped")
     qae_score = Column(Integer, default=0)
-    content_embedding = Column(BLOB, nullable=True)  # BLOB for binary vectors
+    content_embedding = Column(BLOB, nullable=True)  # BLOB for binary vectors, see vector_codec for formats
+    embedding_code = Column(BLOB, nullable=True)  # 1-bit sign code of the embedding for the Hamming prefilter
+    minhash_signature = Column(BLOB, nullable=True)  # MinHash of the content for near-duplicate detection
+    duplicate_of = Column(Integer, nullable=True)  # id of the page this one nearly duplicates
+    embedding_version = Column(String(128), nullable=True)  # model and dimension of content_embedding, see config.embeddings
+    topic_cluster = Column(Integer, nullable=True, index=True)  # nearest TopicCentroid of the active version
+
+class PageContent(Base):
+    """Compressed page text, kept out of the hot scraped_pages rows."""
+    __tablename__ = "page_contents"
+    page_id = Column(Integer, primary_key=True)
+    codec = Column(String(16), nullable=False)
+    data = Column(LargeBinary().with_variant(mysql.MEDIUMBLOB(), "mysql"), nullable=False)
+
+class KeywordDocumentFrequency(Base):
+    """Number of scraped pages containing each keyword n-gram, kept up to date on every save."""
+    __tablename__ = "keyword_document_frequency"
+    term = Column(String(255), primary_key=True)
+    ngram_size = Column(Integer, nullable=False)
+    document_frequency = Column(Integer, nullable=False, default=0)
+
+class CorpusStatistic(Base):
+    """Corpus-wide counters updated in the same transaction as the keyword statistics."""
+    __tablename__ = "corpus_statistics"
+    name = Column(String(64), primary_key=True)
+    value = Column(BigInteger, nullable=False, default=0)
+
+DOCUMENT_COUNT = "documents"  # Stored pages with content: the N of every IDF
+
+class SearchPosting(Base):
+    """Inverted index entry: how often a term occurs in a page."""
+    __tablename__ = "search_postings"
+    term = Column(String(64), primary_key=True)
+    page_id = Column(Integer, primary_key=True, index=True)
+    term_frequency = Column(Integer, nullable=False)
+
+class SearchDocument(Base):
+    """Indexed length (in terms) of each page, for BM25 length normalisation."""
+    __tablename__ = "search_documents"
+    page_id = Column(Integer, primary_key=True)
+    length = Column(Integer, nullable=False)
+
+class PageLSHBucket(Base):
+    """LSH band bucket of a canonical page's MinHash signature."""
+    __tablename__ = "page_lsh_buckets"
+    band = Column(Integer, primary_key=True)
+    bucket = Column(BigInteger, primary_key=True)
+    page_id = Column(Integer, primary_key=True, index=True)
+
+class PagePassage(Base):
+    """Embedding of one chunk of a page, with its character span in the page content."""
+    __tablename__ = "page_passages"
+    page_id = Column(Integer, primary_key=True)
+    passage_index = Column(Integer, primary_key=True)
+    start_offset = Column(Integer, nullable=False)
+    end_offset = Column(Integer, nullable=False)
+    embedding = Column(BLOB, nullable=False)  # Same storage format as scraped_pages.content_embedding
+    embedding_code = Column(BLOB, nullable=False)
+    embedding_version = Column(String(128), nullable=True)
+
+class CrawlSchedule(Base):
+    """Fetch history of a page, used to schedule re-crawls by how often it changes."""
+    __tablename__ = "crawl_schedule"
+    page_id = Column(Integer, primary_key=True)
+    fingerprint = Column(String(64), nullable=False)  # content_fingerprint of the last fetch
+    template_version = Column(String(16), nullable=True)  # Boilerplate template the fingerprinted text was stripped with
+    observations = Column(Integer, nullable=False, default=0)  # re-fetches compared with a previous fetch
+    changes = Column(Integer, nullable=False, default=0)
+    observed_days = Column(Float, nullable=False, default=0.0)
+    change_rate = Column(Float, nullable=False)  # estimated changes per day
+    last_fetched_at = Column(DateTime, nullable=False)
+    last_changed_at = Column(DateTime, nullable=False)
+    next_due_at = Column(DateTime, nullable=False, index=True)
+
+class EmbeddingProjection(Base):
+    """PCA projection from a model's output down to the stored embedding dimension."""
+    __tablename__ = "embedding_projections"
+    version = Column(String(128), primary_key=True)  # embedding version whose vectors it produces
+    input_dim = Column(Integer, nullable=False)
+    output_dim = Column(Integer, nullable=False)
+    mean = Column(LargeBinary, nullable=False)
+    components = Column(LargeBinary().with_variant(mysql.MEDIUMBLOB(), "mysql"), nullable=False)
+    explained_variance = Column(Float, nullable=False)
+    fitted_on = Column(Integer, nullable=False)  # number of sample vectors
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+class DomainTemplateBlock(Base):
+    """Number of a domain's learned pages on which a text block appears, for boilerplate stripping."""
+    __tablename__ = "domain_template_blocks"
+    domain = Column(String(255), primary_key=True)
+    block_hash = Column(BigInteger, primary_key=True)
+    page_count = Column(Integer, nullable=False, default=0)
+
+class TopicCentroid(Base):
+    """Mini-batch k-means centroid of one topic cluster, in the stored embedding space of a version."""
+    __tablename__ = "topic_centroids"
+    version = Column(String(128), primary_key=True)
+    cluster_id = Column(Integer, primary_key=True)
+    centroid = Column(LargeBinary, nullable=False)
+    update_count = Column(BigInteger, nullable=False, default=0)  # points folded in; sets the learning rate
+    keywords = Column(Text, nullable=True)  # JSON list of top keywords, see refresh_topic_keywords
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+
+class DomainTemplatePage(Base):
+    """A page whose blocks were counted into its domain's template model (each URL counts once)."""
+    __tablename__ = "domain_template_pages"
+    domain = Column(String(255), primary_key=True)
+    url_hash = Column(BigInteger, primary_key=True)
+
+def _add_missing_columns():
+    """create_all() never alters existing tables, so add any columns introduced since they were created."""
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing_columns:
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    print(f"Adding missing column {table.name}.{column.name}")
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+                    for index in table.indexes:
+                        if column.name in index.columns:
+                            index.create(conn)
+
+def _backfill_embedding_versions():
+    """Tag vectors stored before versions were recorded with the model that produced them."""
+    with engine.begin() as conn:
+        for table, column in ((ScrapedPage.__table__, "content_embedding"), (PagePassage.__table__, "embedding")):
+            conn.execute(
+                table.update()
+                .where(table.c.embedding_version.is_(None), table.c[column].isnot(None))
+                .values(embedding_version=LEGACY_EMBEDDING_VERSION)
+            )
 
 def create_tables():
     print("Checking and creating tables if necessary...")
     Base.metadata.create_all(bind=engine)
+    _add_missing_columns()
+    _backfill_embedding_versions()
+    backfill_embedding_codes()
+    _seed_document_count()
     print("Tables are ready.")
 
-def save_scraped_content(url: str, content: str, qae_score: int, embedding: np.ndarray):
+def _seed_document_count():
+    """Count the stored pages once for a database created before the counter was kept."""
+    with engine.begin() as conn:
+        table = CorpusStatistic.__table__
+        if conn.execute(select(table.c.value).where(table.c.name == DOCUMENT_COUNT)).first() is not None:
+            return
+        count = conn.execute(select(func.count(ScrapedPage.id)).where(_has_content())).scalar() or 0
+        conn.execute(table.insert().values(name=DOCUMENT_COUNT, value=count))
+
+def _chunked(items: Iterable, size: int = 500):
+    """Split ``items`` into lists small enough for a SQL IN clause."""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _iter_pages(db, columns: Iterable, *criteria, batch_size: int = 200):
+    """
+    Stream scraped_pages rows in id order, one keyset-paginated batch at a time.
+
+    Unlike a server-side cursor, this leaves the session free for writes
+    between batches. Every row has an ``id`` plus the requested columns.
+    """
+    last_id = 0
+    while True:
+        batch = db.query(ScrapedPage.id, *columns).filter(ScrapedPage.id > last_id, *criteria) \
+            .order_by(ScrapedPage.id).limit(batch_size).all()
+        if not batch:
+            return
+        yield from batch
+        last_id = batch[-1].id
+
+def _has_content():
+    """Filter for pages whose text is stored, compressed or (legacy) inline."""
+    return or_(ScrapedPage.content.isnot(None), exists().where(PageContent.page_id == ScrapedPage.id))
+
+def _read_contents(db, page_ids: List[int]) -> Dict[int, str]:
+    """Decompress the content of the given pages, falling back to legacy inline content."""
+    contents = {}
+    for batch in _chunked(page_ids):
+        for row in db.query(PageContent).filter(PageContent.page_id.in_(batch)):
+            contents[row.page_id] = decompress_content(row.codec, row.data)
+        legacy_ids = [page_id for page_id in batch if page_id not in contents]
+        if legacy_ids:
+            rows = db.query(ScrapedPage.id, ScrapedPage.content) \
+                .filter(ScrapedPage.id.in_(legacy_ids), ScrapedPage.content.isnot(None))
+            contents.update({row.id: row.content for row in rows})
+    return contents
+
+def _write_contents(db, contents: Dict[int, Optional[str]]):
+    """Store pages' text compressed in page_contents and clear any legacy inline copies."""
+    for batch in _chunked(contents):
+        db.query(PageContent).filter(PageContent.page_id.in_(batch)).delete(synchronize_session=False)
+        db.query(ScrapedPage).filter(ScrapedPage.id.in_(batch)).update({"content": None}, synchronize_session=False)
+    rows = []
+    for page_id, content in contents.items():
+        if content:
+            codec, data = compress_content(content)
+            rows.append({"page_id": page_id, "codec": codec, "data": data})
+    if rows:
+        db.bulk_insert_mappings(PageContent, rows)
+
+def _iter_page_contents(db, *criteria, batch_size: int = 200):
+    """Stream ``(page_id, content)`` for stored pages, decompressing one batch at a time."""
+    last_id = 0
+    while True:
+        page_ids = [row.id for row in db.query(ScrapedPage.id).filter(ScrapedPage.id > last_id, _has_content(), *criteria)
+                    .order_by(ScrapedPage.id).limit(batch_size)]
+        if not page_ids:
+            return
+        contents = _read_contents(db, page_ids)
+        for page_id in page_ids:
+            if contents.get(page_id):
+                yield page_id, contents[page_id]
+        last_id = page_ids[-1]
+
+def _upsert_increment(db, table, rows: List[Dict[str, Any]], counter: str):
+    """Insert ``rows``, adding their ``counter`` to the stored one instead where the primary key already exists."""
+    if db.get_bind().dialect.name == "sqlite":
+        stmt = sqlite.insert(table).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(table.primary_key.columns),
+            set_={counter: table.c[counter] + stmt.excluded[counter]},
+        )
+    else:
+        stmt = mysql.insert(table).values(rows)
+        stmt = stmt.on_duplicate_key_update({counter: table.c[counter] + stmt.inserted[counter]})
+    db.execute(stmt)
+
+def _increment_document_frequencies(db, counts: Dict[str, int]):
+    """Add ``counts`` to the document frequency of each term, creating missing rows."""
+    for batch in _chunked(sorted(counts)):
+        rows = [{"term": term, "ngram_size": term.count(" ") + 1, "document_frequency": counts[term]}
+                for term in batch]
+        _upsert_increment(db, KeywordDocumentFrequency.__table__, rows, "document_frequency")
+
+def _decrement_document_frequencies(db, counts: Dict[str, int]):
+    table = KeywordDocumentFrequency.__table__
+    by_amount: Dict[int, List[str]] = {}
+    for term, amount in counts.items():
+        by_amount.setdefault(amount, []).append(term)
+    for amount, terms in by_amount.items():
+        for batch in _chunked(sorted(terms)):
+            db.execute(
+                table.update()
+                .where(table.c.term.in_(batch))
+                .values(document_frequency=table.c.document_frequency - amount)
+            )
+    for batch in _chunked(sorted(counts)):
+        db.execute(table.delete().where(table.c.term.in_(batch), table.c.document_frequency <= 0))
+
+def _adjust_document_count(db, delta: int):
+    if delta:
+        table = CorpusStatistic.__table__
+        db.execute(table.update().where(table.c.name == DOCUMENT_COUNT).values(value=table.c.value + delta))
+
+def _update_keyword_statistics(db, changes: Iterable[Tuple[Optional[str], Optional[str]]]):
+    """Apply the document-frequency and document-count delta of pages' ``(old_content, new_content)`` pairs."""
+    increments: Dict[str, int] = {}
+    decrements: Dict[str, int] = {}
+    documents = 0
+    for old_content, new_content in changes:
+        old_terms = set(extract_ngrams(old_content)) if old_content else set()
+        new_terms = set(extract_ngrams(new_content)) if new_content else set()
+        for term in new_terms - old_terms:
+            increments[term] = increments.get(term, 0) + 1
+        for term in old_terms - new_terms:
+            decrements[term] = decrements.get(term, 0) + 1
+        documents += bool(new_content) - bool(old_content)
+    if increments:
+        _increment_document_frequencies(db, increments)
+    if decrements:
+        _decrement_document_frequencies(db, decrements)
+    _adjust_document_count(db, documents)
+
+def _index_pages_terms(db, contents: Dict[int, Optional[str]]):
+    """Replace pages' postings in the BM25 inverted index."""
+    for batch in _chunked(contents):
+        db.query(SearchPosting).filter(SearchPosting.page_id.in_(batch)).delete(synchronize_session=False)
+        db.query(SearchDocument).filter(SearchDocument.page_id.in_(batch)).delete(synchronize_session=False)
+    postings, documents = [], []
+    for page_id, content in contents.items():
+        term_counts = index_terms(content) if content else {}
+        if not term_counts:
+            continue
+        postings.extend({"term": term, "page_id": page_id, "term_frequency": count}
+                        for term, count in term_counts.items())
+        documents.append({"page_id": page_id, "length": sum(term_counts.values())})
+    if postings:
+        db.bulk_insert_mappings(SearchPosting, postings)
+        db.bulk_insert_mappings(SearchDocument, documents)
+
+def _index_page_signatures(db, signatures: Dict[int, Optional[np.ndarray]]):
+    """Replace pages' buckets in the near-duplicate LSH index."""
+    for batch in _chunked(signatures):
+        db.query(PageLSHBucket).filter(PageLSHBucket.page_id.in_(batch)).delete(synchronize_session=False)
+    rows = [
+        {"band": band, "bucket": bucket, "page_id": page_id}
+        for page_id, signature in signatures.items() if signature is not None
+        for band, bucket in enumerate(band_hashes(signature))
+    ]
+    if rows:
+        db.bulk_insert_mappings(PageLSHBucket, rows)
+
+def _store_passages(db, passages: Dict[int, Optional[List[Tuple[int, int, np.ndarray]]]]):
+    """Replace pages' passage embeddings (model vectors, projected here if the active version needs it)."""
+    for batch in _chunked(passages):
+        db.query(PagePassage).filter(PagePassage.page_id.in_(batch)).delete(synchronize_session=False)
+    rows = []
+    for page_id, page_passages in passages.items():
+        if not page_passages:
+            continue
+        vectors = [to_stored_embedding(vector) for _, _, vector in page_passages]
+        rows.extend(
+            {"page_id": page_id, "passage_index": index, "start_offset": start, "end_offset": end,
+             "embedding": encode_embedding(vector, EMBEDDING_STORAGE_FORMAT), "embedding_code": binary_code(vector),
+             "embedding_version": EMBEDDING_VERSION}
+            for index, ((start, end, _), vector) in enumerate(zip(page_passages, vectors)) if vector is not None
+        )
+    if rows:
+        db.bulk_insert_mappings(PagePassage, rows)
+
+def _page_template_version(db, url: str) -> str:
+    return template_version(_template_hashes(db, domain_of(url)))
+
+def _record_fetch(db, page_id: int, fingerprint: str, template: str,
+                  fetched_at: Optional[datetime.datetime] = None) -> bool:
+    """
+    Record one fetch of a page and reschedule its next re-crawl.
+
+    ``template`` is the ``template_version`` of the page's domain. When it
+    differs from the previous fetch's, the stripped texts are not comparable:
+    the fetch becomes the new baseline and is not counted as a change.
+
+    Returns:
+        True if the content differs from the previous fetch (or it is the first)
+    """
+    fetched_at = fetched_at or datetime.datetime.utcnow()
+    schedule = db.get(CrawlSchedule, page_id)  # Found in the identity map when the caller preloaded a batch
+    if schedule is None:
+        schedule = CrawlSchedule(page_id=page_id, fingerprint=fingerprint, template_version=template,
+                                 observations=0, changes=0, observed_days=0.0, last_changed_at=fetched_at)
+        db.add(schedule)
+        changed = True
+    else:
+        changed = schedule.fingerprint != fingerprint
+        if schedule.template_version == template:
+            schedule.observations += 1
+            schedule.changes += int(changed)
+            schedule.observed_days += max((fetched_at - schedule.last_fetched_at).total_seconds(), 0) / 86400
+            if changed:
+                schedule.last_changed_at = fetched_at
+        schedule.fingerprint = fingerprint
+        schedule.template_version = template
+    schedule.change_rate = estimate_change_rate(schedule.observations, schedule.changes, schedule.observed_days)
+    schedule.last_fetched_at = fetched_at
+    schedule.next_due_at = fetched_at + datetime.timedelta(days=refresh_interval_days(schedule.change_rate))
+    return changed
+
+_projection: Optional[Tuple[np.ndarray, np.ndarray]] = None
+
+def get_embedding_projection() -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """
+    ``(mean, components)`` of the active version's projection, or None if it is not fitted yet.
+
+    Cached once found; a missing projection is looked up again on every call
+    so that one fitted by another process is picked up.
+    """
+    global _projection
+    if _projection is None:
+        db = SessionLocal()
+        try:
+            row = db.query(EmbeddingProjection).filter(EmbeddingProjection.version == EMBEDDING_VERSION).first()
+            if row is not None:
+                _projection = (projection_from_bytes(row.mean, (row.input_dim,)),
+                               projection_from_bytes(row.components, (row.output_dim, row.input_dim)))
+        finally:
+            db.close()
+    return _projection
+
+def save_embedding_projection(mean: np.ndarray, components: np.ndarray, explained_variance: float, fitted_on: int):
+    """Store the projection for the active embedding version (replacing any previous fit)."""
+    global _projection
     db = SessionLocal()
     try:
-        existing_page = db.query(ScrapedPage).filter(ScrapedPage.url == url).first()
-        embedding_binary = struct.pack('384f', *embedding) if embedding is not None else None
+        db.query(EmbeddingProjection).filter(EmbeddingProjection.version == EMBEDDING_VERSION).delete()
+        db.add(EmbeddingProjection(version=EMBEDDING_VERSION, input_dim=components.shape[1], output_dim=components.shape[0],
+                                   mean=projection_to_bytes(mean), components=projection_to_bytes(components),
+                                   explained_variance=explained_variance, fitted_on=fitted_on))
+        db.commit()
+        _projection = (mean, components)
+        print(f"✅ Saved {EMBEDDING_VERSION} projection ({explained_variance:.1%} of variance kept).")
+    except Exception as e:
+        print(f"❌ Error saving embedding projection: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+def to_stored_embedding(embedding: Optional[np.ndarray]) -> Optional[np.ndarray]:
+    """
+    Map a model embedding into the stored vector space of the active version.
+
+    Returns:
+        The vector unchanged when no reduction is configured, its projection
+        otherwise, or None while the projection has not been fitted
+    """
+    if embedding is None or EMBEDDING_DIM == EMBEDDING_MODEL_DIM or len(embedding) == 0:
+        return embedding
+    projection = get_embedding_projection()
+    if projection is None:
+        return None
+    return project(embedding, *projection)
+
+_topic_index: Optional[Tuple[np.ndarray, Dict[int, int]]] = None  # (centroids, row of each cluster id)
+_topic_index_loaded_at: Optional[float] = None  # time.monotonic() of the last load; None: never loaded
+_topic_index_lock = threading.Lock()
+TOPIC_INDEX_REFRESH_SECONDS = 300  # Picks up centroids moved by other processes
+
+def get_topic_centroids() -> Optional[Tuple[np.ndarray, List[int]]]:
+    """
+    ``(centroids, cluster_ids)`` of the active version's topic index, or None if none is fitted.
+
+    Cached in-process and reloaded every ``TOPIC_INDEX_REFRESH_SECONDS``.
+    """
+    global _topic_index, _topic_index_loaded_at
+    with _topic_index_lock:
+        if _topic_index_loaded_at is None or time.monotonic() - _topic_index_loaded_at > TOPIC_INDEX_REFRESH_SECONDS:
+            db = SessionLocal()
+            try:
+                rows = db.query(TopicCentroid.cluster_id, TopicCentroid.centroid) \
+                    .filter(TopicCentroid.version == EMBEDDING_VERSION).order_by(TopicCentroid.cluster_id).all()
+            finally:
+                db.close()
+            _topic_index = (np.stack([projection_from_bytes(row.centroid, (EMBEDDING_DIM,)) for row in rows]),
+                            {row.cluster_id: position for position, row in enumerate(rows)}) if rows else None
+            _topic_index_loaded_at = time.monotonic()
+        if _topic_index is None:
+            return None
+        return _topic_index[0].copy(), list(_topic_index[1])
+
+def _invalidate_topic_index():
+    global _topic_index_loaded_at
+    with _topic_index_lock:
+        _topic_index_loaded_at = None
+
+def _topic_candidates(pages: List[ScrapedPage]) -> List[Tuple[int, np.ndarray]]:
+    """``(page_id, stored vector)`` of the saved pages that carry an active-version embedding."""
+    return [(page.id, decode_embedding(page.content_embedding)) for page in pages
+            if page.content_embedding is not None and page.embedding_version == EMBEDDING_VERSION]
+
+def _assign_topics(db, pages: List[Tuple[int, np.ndarray]]):
+    """
+    Assign freshly embedded pages to their nearest topic, in the caller's transaction.
+
+    The pages form one k-means mini-batch: the centroids they land in are
+    locked, moved towards them and written back. Does nothing until a
+    topic index has been fitted (see ``src.agents.topic_indexer``).
+    """
+    index = get_topic_centroids()
+    if index is None or not pages:
+        return
+    centroids, cluster_ids = index
+    vectors = np.stack([vector for _, vector in pages]).astype(np.float32)
+    try:
+        with db.begin_nested():
+            nearest = sorted({cluster_ids[position] for position in assign_clusters(vectors, centroids)})
+            rows = db.query(TopicCentroid).filter(TopicCentroid.version == EMBEDDING_VERSION,
+                                                  TopicCentroid.cluster_id.in_(nearest)) \
+                .order_by(TopicCentroid.cluster_id).with_for_update().all()
+            if not rows:
+                return
+            local = np.stack([projection_from_bytes(row.centroid, (EMBEDDING_DIM,)) for row in rows])
+            counts = np.array([row.update_count for row in rows], dtype=np.int64)
+            labels = minibatch_update(local, counts, vectors)
+            for row, centroid, count in zip(rows, local, counts):
+                row.centroid = projection_to_bytes(centroid)
+                row.update_count = int(count)
+            for position, row in enumerate(rows):
+                page_ids = [page_id for (page_id, _), label in zip(pages, labels) if label == position]
+                if page_ids:
+                    db.query(ScrapedPage).filter(ScrapedPage.id.in_(page_ids)) \
+                        .update({"topic_cluster": row.cluster_id}, synchronize_session=False)
+        with _topic_index_lock:
+            if _topic_index is not None:
+                for row, centroid in zip(rows, local):
+                    if row.cluster_id in _topic_index[1]:
+                        _topic_index[0][_topic_index[1][row.cluster_id]] = centroid
+    except Exception as e:
+        print(f"❌ Topic assignment skipped: {e}")
+
+def _topic_probe(queries: np.ndarray) -> Optional[List[int]]:
+    """Clusters a vector search for ``queries`` should scan, or None to scan everything."""
+    if TOPIC_PROBE_CLUSTERS <= 0:
+        return None
+    index = get_topic_centroids()
+    if index is None or len(index[1]) <= TOPIC_PROBE_CLUSTERS:
+        return None
+    centroids, cluster_ids = index
+    return [cluster_ids[position] for position in nearest_clusters(queries, centroids, TOPIC_PROBE_CLUSTERS)]
+
+def _topic_criteria(probe: Optional[List[int]]) -> tuple:
+    """Pages in the probed clusters plus those not assigned yet, so fresh pages are never missed."""
+    if probe is None:
+        return ()
+    return (or_(ScrapedPage.topic_cluster.in_(probe), ScrapedPage.topic_cluster.is_(None)),)
+
+def _save_pages(db, existing: Dict[str, ScrapedPage], records: List[Dict[str, Any]]) -> List[ScrapedPage]:
+    """
+    Write pages and their index entries in the caller's transaction.
+
+    Each record holds the keyword arguments of ``save_scraped_content``;
+    ``existing`` maps URLs to their stored rows. The page rows are flushed
+    together, and the content, keyword statistics, postings, LSH buckets and
+    passages of all pages go out as a few bulk statements.
+    """
+    old_contents = _read_contents(db, [existing[record["url"]].id for record in records if record["url"] in existing])
+    changes, written = [], []
+    for record in records:
+        url, content = record["url"], record["content"]
+        embedding, passages = record["embedding"], record.get("passages")
+        signature, duplicate_of = record.get("signature"), record.get("duplicate_of")
+        status = record.get("status", "vectorized")
+        if embedding is not None:
+            embedding = to_stored_embedding(embedding)
+            if embedding is None:
+                print(f"No {EMBEDDING_VERSION} projection fitted yet; {url} will be embedded by the re-embedding job.")
+                passages = None
+        embedding_version = EMBEDDING_VERSION if embedding is not None else None
+        embedding_binary = encode_embedding(embedding, EMBEDDING_STORAGE_FORMAT) if embedding is not None else None
+        embedding_code = binary_code(embedding) if embedding is not None else None
+        if signature is None and content:
+            signature = minhash_signature(content)
+        signature_binary = signature_to_bytes(signature) if signature is not None else None
+        existing_page = existing.get(url)
+        # Keep corpus keyword statistics in step with the content being written
+        changes.append((old_contents.get(existing_page.id) if existing_page else None, content))
         # Save as binary bytes
         if existing_page:
             print(f"URL exists. Updating content, analysis, and embedding for: {url}")
-            existing_page.content = content
-            existing_page.scraped_at = datetime.datetime.utcnow()
-            existing_page.status = "vectorized"
-            existing_page.qae_score = qae_score
-            existing_page.content_embedding = embedding_binary
+            page = existing_page
+            page.scraped_at = datetime.datetime.utcnow()
+            page.status = status
+            page.qae_score = record["qae_score"]
+            page.content_embedding = embedding_binary
+            page.embedding_code = embedding_code
+            page.minhash_signature = signature_binary
+            page.duplicate_of = duplicate_of
+            page.embedding_version = embedding_version
+            page.topic_cluster = None  # Reassigned by _assign_topics once the embedding is written
         else:
             print(f"Saving new content, analysis, and embedding for: {url}")
-            new_page = ScrapedPage(url=url, content=content, qae_score=qae_score, status="vectorized", content_embedding=embedding_binary)
-            db.add(new_page)
+            page = ScrapedPage(url=url, qae_score=record["qae_score"], status=status,
+                               content_embedding=embedding_binary, embedding_code=embedding_code,
+                               minhash_signature=signature_binary, duplicate_of=duplicate_of,
+                               embedding_version=embedding_version)
+            db.add(page)
+        # Near-duplicates stay out of the search indexes
+        if duplicate_of is None:
+            written.append((page, content, content, signature, passages))
+        else:
+            written.append((page, content, None, None, None))
+    db.flush()  # Assigns the ids needed by the search indexes
+    _update_keyword_statistics(db, changes)
+    _write_contents(db, {page.id: content for page, content, _, _, _ in written})
+    _index_pages_terms(db, {page.id: indexed for page, _, indexed, _, _ in written})
+    _index_page_signatures(db, {page.id: signature for page, _, _, signature, _ in written})
+    _store_passages(db, {page.id: passages for page, _, _, _, passages in written})
+    fetched = [(page, content) for page, content, _, _, _ in written if content]
+    for batch in _chunked([page.id for page, _ in fetched]):
+        db.query(CrawlSchedule).filter(CrawlSchedule.page_id.in_(batch)).all()  # Preload for _record_fetch
+    for page, content in fetched:
+        _record_fetch(db, page.id, content_fingerprint(content), _page_template_version(db, page.url))
+    return [page for page, _, _, _, _ in written]
+
+def save_scraped_content(url: str, content: str, qae_score: int, embedding: np.ndarray,
+                         status: str = "vectorized", signature: Optional[np.ndarray] = None,
+                         duplicate_of: Optional[int] = None,
+                         passages: Optional[List[Tuple[int, int, np.ndarray]]] = None):
+    """
+    Insert or update a scraped page along with its search indexes.
+
+    ``passages`` are the ``(start, end, vector)`` chunk embeddings from
+    ``generate_passage_embeddings``; they replace any stored for the page.
+
+    Pages saved with ``duplicate_of`` are kept out of the BM25 and LSH
+    indexes so that only the canonical copy is ever matched.
+    """
+    db = SessionLocal()
+    try:
+        existing = {page.url: page for page in db.query(ScrapedPage).filter(ScrapedPage.url == url)}
+        pages = _save_pages(db, existing, [{
+            "url": url, "content": content, "qae_score": qae_score, "embedding": embedding, "status": status,
+            "signature": signature, "duplicate_of": duplicate_of, "passages": passages,
+        }])
+        _assign_topics(db, _topic_candidates(pages))
         db.commit()
         print(f"✅ Successfully saved vector embedding to the database.")
     except Exception as e:
@@ -62,54 +681,1237 @@ def save_scraped_content(url: str, content: str, qae_score: int, embedding: np.n
     finally:
         db.close()
 
-def search_similar_articles(search_embedding: np.ndarray, keyword: str = "") -> List[str]:
+def save_scraped_pages(records: List[Dict[str, Any]]) -> Dict[str, Optional[str]]:
     """
-    Search for similar articles using vector similarity or fallback to text-based search.
+    Save many pages in one transaction.
+
+    Each record holds the keyword arguments of ``save_scraped_content``.
+    Existing rows are looked up with a single query and the batch is
+    written with bulk statements. If that fails, the batch is retried with
+    every page inside its own savepoint, so one bad record is rolled back on
+    its own instead of failing the whole batch.
+
+    Returns:
+        ``{url: None}`` for saved pages and ``{url: error message}`` for failures
     """
-    competitor_texts = []
-    has_vector_support = False
+    results = {}
+    if not records:
+        return results
+    db = SessionLocal()
+    try:
+        existing = {}
+        for batch in _chunked([record["url"] for record in records]):
+            existing.update({page.url: page for page in db.query(ScrapedPage).filter(ScrapedPage.url.in_(batch))})
+        try:
+            with db.begin_nested():
+                saved = _save_pages(db, existing, records)
+            results = {record["url"]: None for record in records}
+        except Exception as e:
+            print(f"❌ Error saving batch to database, retrying page by page: {e}")
+            db.expire_all()  # Rows touched by the rolled-back savepoint are reloaded
+            saved = []
+            for record in records:
+                url = record["url"]
+                try:
+                    with db.begin_nested():
+                        page, = _save_pages(db, existing, [record])
+                    existing[url] = page
+                    saved.append(page)
+                    results[url] = None
+                except Exception as e:
+                    print(f"❌ Error saving {url} to database: {e}")
+                    results[url] = str(e)
+        _assign_topics(db, _topic_candidates(saved))
+        db.commit()
+        print(f"✅ Saved {sum(error is None for error in results.values())}/{len(records)} pages in one batch.")
+    except Exception as e:
+        print(f"❌ Error saving batch to database: {e}")
+        db.rollback()
+        results = {record["url"]: str(e) for record in records}
+    finally:
+        db.close()
+    return results
+
+_template_cache: "OrderedDict[str, Set[int]]" = OrderedDict()
+_template_cache_lock = threading.Lock()  # Concurrent scrapes share the cache
+TEMPLATE_CACHE_DOMAINS = 64 if LOW_MEMORY_MODE else 512
+
+def _template_hashes(db, domain: str) -> Set[int]:
+    """Template block hashes of a domain, through a bounded LRU cache."""
+    with _template_cache_lock:
+        if domain in _template_cache:
+            _template_cache.move_to_end(domain)
+            return _template_cache[domain]
+    page_count = db.query(func.count(DomainTemplatePage.url_hash)).filter(DomainTemplatePage.domain == domain).scalar()
+    threshold = template_threshold(page_count)
+    hashes = set()
+    if threshold is not None:
+        hashes = {row.block_hash for row in db.query(DomainTemplateBlock.block_hash)
+                  .filter(DomainTemplateBlock.domain == domain, DomainTemplateBlock.page_count >= threshold)}
+    with _template_cache_lock:
+        _template_cache[domain] = hashes
+        if len(_template_cache) > TEMPLATE_CACHE_DOMAINS:
+            _template_cache.popitem(last=False)
+    return hashes
+
+def _learn_template_blocks(db, domain: str, url: str, blocks: List[str]) -> int:
+    """
+    Count a page's blocks into its domain's model, once per URL and up to TEMPLATE_LEARN_PAGES pages.
+
+    Returns:
+        The domain's number of learned pages including this one, or 0 if the page was not learned
+    """
+    url_hash = block_hash(url)
+    learned = db.query(DomainTemplatePage.url_hash).filter(DomainTemplatePage.domain == domain)
+    if learned.filter(DomainTemplatePage.url_hash == url_hash).first():
+        return 0
+    page_count = learned.count()
+    if page_count >= TEMPLATE_LEARN_PAGES:
+        return 0
+    db.add(DomainTemplatePage(domain=domain, url_hash=url_hash))
+    for batch in _chunked(sorted(page_block_hashes(blocks))):
+        rows = [{"domain": domain, "block_hash": hash_value, "page_count": 1} for hash_value in batch]
+        _upsert_increment(db, DomainTemplateBlock.__table__, rows, "page_count")
+    with _template_cache_lock:
+        _template_cache.pop(domain, None)
+    return page_count + 1
 
+def learn_domain_template(url: str, blocks: List[str]) -> bool:
+    """
+    Count a page that is being indexed into its domain's template model.
+
+    Only pages that are stored should be learned, so that the template
+    describes the corpus and the pages stored before it formed can be
+    re-stripped.
+
+    Returns:
+        True if this page completed the ``TEMPLATE_MIN_PAGES`` a template needs,
+        i.e. the domain's earlier pages were stored unstripped
+    """
+    domain = domain_of(url)
+    if not domain or not blocks:
+        return False
+    db = SessionLocal()
     try:
-        # Test if vector functions are available
-        with engine.connect() as conn:
-            result = conn.execute(text("SELECT VEC_L2_DISTANCE(VECTOR_FROM_BINARY('0000', 384), VECTOR_FROM_BINARY('0000', 384))")).fetchone()
-            has_vector_support = True
-            print("Vector search functions are available in TiDB.")
-    except Exception as ve:
-        has_vector_support = False
-        print(f"Vector search not supported in this TiDB instance: {ve}")
+        page_count = _learn_template_blocks(db, domain, url, blocks)
+        db.commit()
+        return page_count == TEMPLATE_MIN_PAGES
+    except Exception as e:
+        print(f"❌ Error learning boilerplate for {domain}: {e}")
+        db.rollback()
+        return False
+    finally:
+        db.close()
+
+def strip_domain_boilerplate(url: str, blocks: List[str]) -> List[str]:
+    """
+    Return a page's text blocks without its domain's template blocks.
+
+    Until a domain has ``TEMPLATE_MIN_PAGES`` learned pages nothing is stripped.
+    """
+    domain = domain_of(url)
+    if not domain or not blocks:
+        return blocks
+    db = SessionLocal()
+    try:
+        template = _template_hashes(db, domain)
+    finally:
+        db.close()
+    stripped = strip_template_blocks(blocks, template)
+    if len(stripped) < len(blocks):
+        print(f"Stripped {len(blocks) - len(stripped)} template blocks from {url}")
+    return stripped
+
+def get_domain_pages(domain: str, exclude_url: Optional[str] = None, limit: Optional[int] = None) -> List[str]:
+    """URLs of the stored pages of a domain (``domain_of`` form), oldest first."""
+    db = SessionLocal()
+    try:
+        query = db.query(ScrapedPage.url) \
+            .filter(or_(ScrapedPage.url.like(f"%://{domain}%"), ScrapedPage.url.like(f"%://www.{domain}%"))) \
+            .order_by(ScrapedPage.id)
+        urls = [row.url for row in query if row.url != exclude_url and domain_of(row.url) == domain]
+        return urls[:limit] if limit is not None else urls
+    finally:
+        db.close()
+
+def reset_domain_template(domain: str):
+    """Forget a domain's learned template (e.g. after a site redesign) so it is relearned from new scrapes."""
+    db = SessionLocal()
+    try:
+        db.query(DomainTemplateBlock).filter(DomainTemplateBlock.domain == domain).delete()
+        db.query(DomainTemplatePage).filter(DomainTemplatePage.domain == domain).delete()
+        db.commit()
+        with _template_cache_lock:
+            _template_cache.pop(domain, None)
+    finally:
+        db.close()
+
+def find_near_duplicates(signature: np.ndarray, exclude_url: Optional[str] = None,
+                         threshold: float = NEAR_DUPLICATE_THRESHOLD) -> List[Dict[str, Any]]:
+    """
+    Find stored canonical pages whose content nearly duplicates a signature.
+
+    Candidates come from the LSH bucket table, so only pages sharing at least
+    one band are compared; each is then verified against its stored MinHash.
+
+    Returns:
+        Dicts with ``page_id``, ``url`` and estimated ``similarity``, most similar first
+    """
+    return find_near_duplicates_batch([(signature, exclude_url)], threshold)[0]
+
+def find_near_duplicates_batch(queries: List[Tuple[np.ndarray, Optional[str]]],
+                               threshold: float = NEAR_DUPLICATE_THRESHOLD) -> List[List[Dict[str, Any]]]:
+    """
+    ``find_near_duplicates`` for many ``(signature, exclude_url)`` pairs in one session.
+
+    The buckets of every signature are looked up together and each candidate
+    page's MinHash is loaded once, however many queries it matches.
+    """
+    if not queries:
+        return []
+    # (band, bucket) -> positions of the queries hashing there
+    queries_by_bucket: Dict[Tuple[int, int], List[int]] = {}
+    for position, (signature, _) in enumerate(queries):
+        for band, bucket in enumerate(band_hashes(signature)):
+            queries_by_bucket.setdefault((band, bucket), []).append(position)
+    db = SessionLocal()
+    try:
+        candidates: Dict[int, Set[int]] = {}  # page id -> positions of the queries sharing a band with it
+        for batch in _chunked(queries_by_bucket):
+            rows = db.query(PageLSHBucket.band, PageLSHBucket.bucket, PageLSHBucket.page_id) \
+                .filter(tuple_(PageLSHBucket.band, PageLSHBucket.bucket).in_(batch))
+            for row in rows:
+                candidates.setdefault(row.page_id, set()).update(queries_by_bucket[(row.band, row.bucket)])
+        matches: List[List[Dict[str, Any]]] = [[] for _ in queries]
+        for batch in _chunked(candidates):
+            rows = db.query(ScrapedPage.id, ScrapedPage.url, ScrapedPage.minhash_signature) \
+                .filter(ScrapedPage.id.in_(batch), ScrapedPage.minhash_signature.isnot(None))
+            for row in rows:
+                stored = signature_from_bytes(row.minhash_signature)
+                for position in candidates[row.id]:
+                    signature, exclude_url = queries[position]
+                    if row.url == exclude_url:
+                        continue
+                    similarity = estimated_similarity(stored, signature)
+                    if similarity >= threshold:
+                        matches[position].append({"page_id": row.id, "url": row.url, "similarity": similarity})
+        for page_matches in matches:
+            page_matches.sort(key=lambda match: match["similarity"], reverse=True)
+        return matches
+    finally:
+        db.close()
+
+def rebuild_near_duplicate_index(batch_size: int = 200):
+    """
+    Compute missing MinHash signatures and rebuild the LSH bucket table.
+
+    Only needed once for pages saved before near-duplicate detection existed.
+    """
+    print("Rebuilding near-duplicate index...")
+    db = SessionLocal()
+    try:
+        db.query(PageLSHBucket).delete()
+        indexed = 0
+        pages = _iter_pages(db, [ScrapedPage.minhash_signature],
+                            _has_content(), ScrapedPage.duplicate_of.is_(None), batch_size=batch_size)
+        for page in pages:
+            if page.minhash_signature is None:
+                signature = minhash_signature(_read_contents(db, [page.id]).get(page.id, ""))
+                db.query(ScrapedPage).filter(ScrapedPage.id == page.id) \
+                    .update({"minhash_signature": signature_to_bytes(signature)}, synchronize_session=False)
+            else:
+                signature = signature_from_bytes(page.minhash_signature)
+            _index_page_signatures(db, {page.id: signature})
+            indexed += 1
+        db.commit()
+        print(f"✅ Indexed signatures for {indexed} pages.")
+    except Exception as e:
+        print(f"❌ Error rebuilding near-duplicate index: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+def record_unchanged_fetch(page_id: int, url: str, fingerprint: str) -> bool:
+    """
+    Record a re-crawl whose content may not need re-processing.
+
+    Returns:
+        True if the content changed since the last fetch (or was stripped
+        with a different template); in that case the caller should store the
+        new content with ``save_scraped_content``, which records the fetch
+        itself, so nothing is written here.
+    """
+    db = SessionLocal()
+    try:
+        schedule = db.query(CrawlSchedule).filter(CrawlSchedule.page_id == page_id).first()
+        if schedule is None or schedule.fingerprint != fingerprint:
+            return True
+        _record_fetch(db, page_id, fingerprint, _page_template_version(db, url))
+        db.commit()
+        return False
+    finally:
+        db.close()
+
+def record_failed_fetch(page_id: int, retry_after_days: float = 1.0):
+    """Push back a page whose re-crawl failed so it does not block the queue."""
+    db = SessionLocal()
+    try:
+        db.query(CrawlSchedule).filter(CrawlSchedule.page_id == page_id).update({
+            "next_due_at": datetime.datetime.utcnow() + datetime.timedelta(days=retry_after_days)
+        }, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+def get_pages_due_for_recrawl(budget: int, now: Optional[datetime.datetime] = None,
+                              candidate_factor: int = 10) -> List[Dict[str, Any]]:
+    """
+    Pick the pages most worth re-fetching under a global fetch budget.
+
+    Pages past their ``next_due_at`` are ranked by the probability that they
+    changed since their last fetch, so volatile pages win over static ones.
+    At most ``budget * candidate_factor`` of the most overdue pages are
+    considered, keeping the query bounded on large corpora.
+
+    Returns:
+        Up to ``budget`` dicts with ``page_id``, ``url``, ``fingerprint`` and ``priority``, highest priority first
+    """
+    now = now or datetime.datetime.utcnow()
+    db = SessionLocal()
+    try:
+        rows = db.query(CrawlSchedule.page_id, CrawlSchedule.fingerprint, CrawlSchedule.change_rate,
+                        CrawlSchedule.last_fetched_at, ScrapedPage.url) \
+            .join(ScrapedPage, ScrapedPage.id == CrawlSchedule.page_id) \
+            .filter(CrawlSchedule.next_due_at <= now) \
+            .order_by(CrawlSchedule.next_due_at) \
+            .limit(budget * candidate_factor).all()
+    finally:
+        db.close()
+    due = [
+        {"page_id": row.page_id, "url": row.url, "fingerprint": row.fingerprint,
+         "priority": change_probability(row.change_rate, (now - row.last_fetched_at).total_seconds() / 86400)}
+        for row in rows
+    ]
+    return heapq.nlargest(budget, due, key=lambda page: page["priority"])
+
+def schedule_existing_pages(batch_size: int = 200):
+    """
+    Create re-crawl schedules for stored pages that have none yet.
+
+    Needed once for pages saved before scheduling existed; they are treated
+    as fetched at their ``scraped_at`` time.
+    """
+    print("Scheduling re-crawls for existing pages...")
+    db = SessionLocal()
+    try:
+        scheduled = 0
+        unscheduled = ~exists().where(CrawlSchedule.page_id == ScrapedPage.id)
+        last_id = 0
+        while True:
+            pages = db.query(ScrapedPage.id, ScrapedPage.url, ScrapedPage.scraped_at) \
+                .filter(ScrapedPage.id > last_id, _has_content(), unscheduled) \
+                .order_by(ScrapedPage.id).limit(batch_size).all()
+            if not pages:
+                break
+            contents = _read_contents(db, [page.id for page in pages])
+            for page in pages:
+                if page.id in contents:
+                    _record_fetch(db, page.id, content_fingerprint(contents[page.id]),
+                                  _page_template_version(db, page.url), page.scraped_at)
+                    scheduled += 1
+            db.commit()
+            last_id = pages[-1].id
+        print(f"✅ Scheduled {scheduled} pages.")
+    except Exception as e:
+        print(f"❌ Error scheduling pages: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+def get_document_frequencies(terms: Iterable[str]) -> Tuple[Dict[str, int], int]:
+    """
+    Look up corpus statistics for the given keyword n-grams.
+
+    Returns:
+        A ``(document_frequencies, total_documents)`` pair; terms that appear
+        in no stored page are absent from the mapping.
+    """
+    db = SessionLocal()
+    try:
+        frequencies = {}
+        for batch in _chunked(set(terms)):
+            rows = db.query(KeywordDocumentFrequency.term, KeywordDocumentFrequency.document_frequency) \
+                .filter(KeywordDocumentFrequency.term.in_(batch)).all()
+            frequencies.update({row.term: row.document_frequency for row in rows})
+        total_documents = db.query(CorpusStatistic.value).filter(CorpusStatistic.name == DOCUMENT_COUNT).scalar()
+        if total_documents is None:  # create_tables() has not seeded the counter yet
+            total_documents = db.query(func.count(ScrapedPage.id)).filter(_has_content()).scalar()
+        return frequencies, total_documents or 0
+    finally:
+        db.close()
+
+def get_page_keywords(url: str, top_k: int = 10) -> List[Tuple[str, float]]:
+    """
+    Rank a stored page's keywords by TF-IDF against the whole corpus.
+
+    Only the page's own n-grams are counted; their document frequencies come
+    from the incrementally maintained statistics table, so the cost does not
+    grow with the corpus.
+    """
+    db = SessionLocal()
+    try:
+        page = db.query(ScrapedPage.id).filter(ScrapedPage.url == url).first()
+        content = _read_contents(db, [page.id]).get(page.id) if page else None
+    finally:
+        db.close()
+    if not content:
+        return []
+    term_counts = extract_ngrams(content)
+    frequencies, total_documents = get_document_frequencies(term_counts)
+    return tfidf_keywords(term_counts, frequencies, total_documents, top_k)
+
+def rebuild_keyword_statistics(batch_size: int = 200):
+    """
+    Recompute the keyword document-frequency table from every stored page.
+
+    Only needed once for pages saved before the statistics existed;
+    afterwards ``save_scraped_content`` keeps the table current.
+    """
+    print("Rebuilding keyword document frequencies...")
+    db = SessionLocal()
+    try:
+        db.query(KeywordDocumentFrequency).delete()
+        frequencies: Dict[str, int] = {}
+        documents = 0
+        for _, content in _iter_page_contents(db, batch_size=batch_size):
+            documents += 1
+            for term in extract_ngrams(content):
+                frequencies[term] = frequencies.get(term, 0) + 1
+        db.merge(CorpusStatistic(name=DOCUMENT_COUNT, value=documents))
+        for batch in _chunked(frequencies.items(), 1000):
+            db.bulk_insert_mappings(KeywordDocumentFrequency, [
+                {"term": term, "ngram_size": term.count(" ") + 1, "document_frequency": count}
+                for term, count in batch
+            ])
+        db.commit()
+        print(f"✅ Rebuilt document frequencies for {len(frequencies)} terms.")
+    except Exception as e:
+        print(f"❌ Error rebuilding keyword statistics: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+def rebuild_search_index(batch_size: int = 200):
+    """
+    Re-index every stored page in the BM25 inverted index.
+
+    Only needed once for pages saved before the index existed; afterwards
+    ``save_scraped_content`` updates it incrementally.
+    """
+    print("Rebuilding BM25 search index...")
+    db = SessionLocal()
+    try:
+        db.query(SearchPosting).delete()
+        db.query(SearchDocument).delete()
+        indexed = 0
+        for page_id, content in _iter_page_contents(db, ScrapedPage.duplicate_of.is_(None), batch_size=batch_size):
+            _index_pages_terms(db, {page_id: content})
+            indexed += 1
+        db.commit()
+        print(f"✅ Indexed {indexed} pages.")
+    except Exception as e:
+        print(f"❌ Error rebuilding search index: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+def migrate_page_contents(batch_size: int = 200):
+    """
+    Move legacy inline content from scraped_pages into the compressed page_contents store.
+
+    Safe to re-run; each batch is committed as it goes.
+    """
+    print("Moving page content into compressed storage...")
+    db = SessionLocal()
+    try:
+        moved = 0
+        for page in _iter_pages(db, [ScrapedPage.content], ScrapedPage.content.isnot(None), batch_size=batch_size):
+            _write_contents(db, {page.id: page.content})
+            moved += 1
+            if moved % batch_size == 0:
+                db.commit()
+        db.commit()
+        print(f"✅ Moved content for {moved} pages.")
+    except Exception as e:
+        print(f"❌ Error moving page content: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+def bm25_search(query: str, top_k: int = 10) -> List[Dict[str, Any]]:
+    """
+    Rank stored pages against a keyword query with BM25.
+
+    Only the postings of the query terms are read, so the cost depends on how
+    common those terms are rather than on the size of the content column.
+
+    Returns:
+        Up to ``top_k`` dicts with ``page_id``, ``url`` and ``score``, best first
+    """
+    query_terms = sorted(set(index_terms(query)))
+    if not query_terms:
+        return []
+
+    db = SessionLocal()
+    try:
+        total_documents, average_length = db.query(
+            func.count(SearchDocument.page_id), func.avg(SearchDocument.length)
+        ).one()
+        if not total_documents:
+            return []
+
+        document_frequencies = dict(
+            db.query(SearchPosting.term, func.count(SearchPosting.page_id))
+            .filter(SearchPosting.term.in_(query_terms))
+            .group_by(SearchPosting.term).all()
+        )
+        idfs = {term: bm25_idf(df, total_documents) for term, df in document_frequencies.items()}
+
+        scores: Dict[int, float] = {}
+        postings = db.query(SearchPosting.page_id, SearchPosting.term, SearchPosting.term_frequency, SearchDocument.length) \
+            .join(SearchDocument, SearchDocument.page_id == SearchPosting.page_id) \
+            .filter(SearchPosting.term.in_(query_terms))
+        for posting in postings:
+            scores[posting.page_id] = scores.get(posting.page_id, 0.0) + bm25_term_score(
+                posting.term_frequency, posting.length, float(average_length), idfs[posting.term]
+            )
 
-    if has_vector_support:
+        best = heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+        urls = dict(db.query(ScrapedPage.id, ScrapedPage.url).filter(ScrapedPage.id.in_([page_id for page_id, _ in best])).all())
+        return [
+            {"page_id": page_id, "url": urls.get(page_id), "score": score}
+            for page_id, score in best if page_id in urls
+        ]
+    finally:
+        db.close()
+
+_vector_support: Optional[bool] = None
+
+def _has_vector_support() -> bool:
+    """Whether the database provides TiDB's VEC_* functions (probed once per process)."""
+    global _vector_support
+    if _vector_support is None:
         try:
-            # Use vector search
-            search_binary = struct.pack('384f', *search_embedding)
+            # Test if vector functions are available
             with engine.connect() as conn:
-                results = conn.execute(text("""
-                    SELECT content FROM scraped_pages
-                    WHERE content_embedding IS NOT NULL
-                    ORDER BY VEC_L2_DISTANCE(VECTOR_FROM_BINARY(content_embedding, 384), VECTOR_FROM_BINARY(:search_vec, 384)) ASC
-                    LIMIT 3
-                """), {"search_vec": search_binary}).fetchall()
-                competitor_texts = [row[0] for row in results if row[0]]
-                print(f"Vector search retrieved {len(competitor_texts)} competitor texts.")
+                conn.execute(text(f"SELECT VEC_L2_DISTANCE(VECTOR_FROM_BINARY('0000', {EMBEDDING_DIM}), VECTOR_FROM_BINARY('0000', {EMBEDDING_DIM}))")).fetchone()
+            _vector_support = True
+            print("Vector search functions are available in TiDB.")
+        except Exception as ve:
+            _vector_support = False
+            print(f"Vector search not supported in this TiDB instance: {ve}")
+    return _vector_support
+
+def _native_vector_search(search_embedding: np.ndarray, top_k: int, uncoded_only: bool = False) -> List[Dict[str, Any]]:
+    search_binary = encode_embedding(search_embedding, FORMAT_FP32)
+    params = {"search_vec": search_binary, "fp32_length": len(search_binary), "version": EMBEDDING_VERSION,
+              "limit": top_k}
+    probe = _topic_probe(search_embedding)
+    topic_filter = "AND (topic_cluster IN :clusters OR topic_cluster IS NULL)" if probe is not None else ""
+    if uncoded_only:
+        topic_filter += " AND embedding_code IS NULL"
+    query = text(f"""
+            SELECT id, url, qae_score,
+                   VEC_L2_DISTANCE(VECTOR_FROM_BINARY(content_embedding, {EMBEDDING_DIM}), VECTOR_FROM_BINARY(:search_vec, {EMBEDDING_DIM})) AS distance
+            FROM scraped_pages
+            WHERE content_embedding IS NOT NULL AND LENGTH(content_embedding) = :fp32_length
+              AND embedding_version = :version {topic_filter}
+            ORDER BY distance ASC
+            LIMIT :limit
+        """)
+    if probe is not None:
+        query = query.bindparams(bindparam("clusters", expanding=True))
+        params["clusters"] = probe
+    with engine.connect() as conn:
+        # Only bare fp32 rows can be read by VECTOR_FROM_BINARY
+        results = conn.execute(query, params).fetchall()
+    return [
+        {"page_id": row.id, "url": row.url, "qae_score": row.qae_score, "distance": float(row.distance)}
+        for row in results
+    ]
+
+_uncoded_embeddings: Optional[bool] = None
+
+def _has_uncoded_embeddings() -> bool:
+    """Whether any current-version embedding still lacks its binary code (probed once per process)."""
+    global _uncoded_embeddings
+    if _uncoded_embeddings is None:
+        db = SessionLocal()
+        try:
+            _uncoded_embeddings = db.query(ScrapedPage.id).filter(
+                ScrapedPage.content_embedding.isnot(None), ScrapedPage.embedding_code.is_(None),
+                ScrapedPage.embedding_version == EMBEDDING_VERSION).first() is not None
+        finally:
+            db.close()
+    return _uncoded_embeddings
+
+def _with_uncoded_hits(search_embedding: np.ndarray, hits: List[Dict[str, Any]], top_k: int) -> List[Dict[str, Any]]:
+    """
+    Merge native-search hits among rows whose binary code is not backfilled yet into code-scan hits.
+
+    The code scan cannot see those rows; without TiDB vector support they
+    stay unsearchable until ``backfill_embedding_codes`` has run.
+    """
+    if not _has_uncoded_embeddings() or not _has_vector_support():
+        return hits
+    uncoded = _native_vector_search(search_embedding, top_k, uncoded_only=True)
+    return sorted(hits + uncoded, key=lambda hit: hit["distance"])[:top_k]
+
+def _load_codes(db, key_columns: List, code_column, code_length: int, *criteria,
+                batch_size: int = 1000) -> Tuple[List[tuple], np.ndarray]:
+    """
+    Stream binary codes into one contiguous array.
+
+    Rows are fetched ``batch_size`` at a time and copied straight into a
+    byte buffer, so the full result set is never held as ORM rows.
+
+    Returns:
+        The key tuples and a uint8 array of shape ``(n, code_length)``, in the same order
+    """
+    keys = []
+    buffer = bytearray()
+    for row in db.query(*key_columns, code_column).filter(code_column.isnot(None), *criteria).yield_per(batch_size):
+        if len(row[-1]) == code_length:
+            keys.append(tuple(row[:-1]))
+            buffer += row[-1]
+    return keys, np.frombuffer(buffer, dtype=np.uint8).reshape(len(keys), code_length)
+
+def compact_vector_search(search_embedding: np.ndarray, top_k: int = 5, candidates: int = 100) -> List[Dict[str, Any]]:
+    """
+    Two-phase vector search that works for every storage format.
+
+    Phase one scans only the 1-bit embedding codes (``dim / 8`` bytes per row)
+    and keeps the ``candidates`` closest by Hamming distance; phase two loads
+    and decodes just those embeddings and re-ranks them by exact L2 distance.
+    ``search_embedding`` must already be in the stored space (see ``to_stored_embedding``).
+    """
+    query_code_length = len(binary_code(search_embedding))
+    db = SessionLocal()
+    try:
+        keys, codes = _load_codes(db, [ScrapedPage.id], ScrapedPage.embedding_code, query_code_length,
+                                  ScrapedPage.embedding_version == EMBEDDING_VERSION,
+                                  *_topic_criteria(_topic_probe(search_embedding)))
+        if not keys:
+            return _with_uncoded_hits(search_embedding, [], top_k)
+        page_ids = np.array([page_id for page_id, in keys])
+        del keys
+
+        details = {}
+
+        def load_vectors(positions):
+            candidate_ids = [int(page_ids[position]) for position in positions]
+            for row in db.query(ScrapedPage.id, ScrapedPage.url, ScrapedPage.qae_score, ScrapedPage.content_embedding) \
+                    .filter(ScrapedPage.id.in_(candidate_ids)):
+                details[row.id] = row
+            return [decode_embedding(details[page_id].content_embedding) for page_id in candidate_ids]
+
+        hits = two_phase_search(np.asarray(search_embedding, dtype=np.float32), codes, load_vectors, top_k, candidates)
+        return _with_uncoded_hits(search_embedding, [
+            {"page_id": int(page_ids[position]), "url": details[int(page_ids[position])].url,
+             "qae_score": details[int(page_ids[position])].qae_score, "distance": distance}
+            for position, distance in hits
+        ], top_k)
+    finally:
+        db.close()
+
+def vector_search(search_embedding: np.ndarray, top_k: int = 5) -> List[Dict[str, Any]]:
+    """
+    Find the stored pages nearest to an embedding.
+
+    Uses TiDB's native L2 search while vectors are stored as fp32, and the
+    two-phase compact search otherwise (or when TiDB lacks vector support).
+    Only pages embedded with the active version are searched and, once a
+    topic index is fitted, only those in the ``TOPIC_PROBE_CLUSTERS``
+    clusters nearest the query (plus pages not assigned yet).
+
+    Returns:
+        Up to ``top_k`` dicts with ``page_id``, ``url``, ``qae_score`` and L2 ``distance``, nearest first
+    """
+    search_embedding = to_stored_embedding(search_embedding)
+    if search_embedding is None:
+        return []
+    if EMBEDDING_STORAGE_FORMAT == FORMAT_FP32 and _has_vector_support():
+        return _native_vector_search(search_embedding, top_k)
+    return compact_vector_search(search_embedding, top_k)
+
+def vector_search_batch(search_embeddings: List[np.ndarray], top_k: int = 5,
+                        candidates: int = 100) -> List[List[Dict[str, Any]]]:
+    """
+    ``vector_search`` for many embeddings at once.
+
+    The binary codes are scanned once for all queries and the union of their
+    candidates is loaded and re-ranked in one pass, so the cost grows with
+    the candidates rather than with one full search per query. Works for
+    every storage format; rows without a binary code yet are searched
+    natively per query, as in ``compact_vector_search``.
+
+    Returns:
+        One result list per embedding, in the same order (empty for empty embeddings)
+    """
+    results: List[List[Dict[str, Any]]] = [[] for _ in search_embeddings]
+    positions = [index for index, embedding in enumerate(search_embeddings) if len(embedding)]
+    if not positions:
+        return results
+    queries = to_stored_embedding(np.stack([search_embeddings[index] for index in positions]))
+    if queries is None:
+        return results
+    db = SessionLocal()
+    try:
+        keys, codes = _load_codes(db, [ScrapedPage.id], ScrapedPage.embedding_code, len(binary_code(queries[0])),
+                                  ScrapedPage.embedding_version == EMBEDDING_VERSION, *_topic_criteria(_topic_probe(queries)))
+        if not keys:
+            for index, query in zip(positions, queries):
+                results[index] = _with_uncoded_hits(query, [], top_k)
+            return results
+        page_ids = np.array([page_id for page_id, in keys])
+        del keys
+
+        details = {}
+
+        def load_vectors(rows):
+            candidate_ids = [int(page_ids[row]) for row in rows]
+            for chunk in _chunked(candidate_ids):
+                for row in db.query(ScrapedPage.id, ScrapedPage.url, ScrapedPage.qae_score,
+                                    ScrapedPage.content_embedding).filter(ScrapedPage.id.in_(chunk)):
+                    details[row.id] = row
+            return [decode_embedding(details[page_id].content_embedding) for page_id in candidate_ids]
+
+        hits_per_query = two_phase_search_batch(queries, codes, load_vectors, top_k, candidates)
+        for index, query, hits in zip(positions, queries, hits_per_query):
+            results[index] = _with_uncoded_hits(query, [
+                {"page_id": int(page_ids[row]), "url": details[int(page_ids[row])].url,
+                 "qae_score": details[int(page_ids[row])].qae_score, "distance": distance}
+                for row, distance in hits
+            ], top_k)
+        return results
+    finally:
+        db.close()
+
+def backfill_embedding_codes(batch_size: int = 200) -> int:
+    """
+    Compute the binary code of stored embeddings saved before codes existed.
+
+    Run by ``create_tables``; only rows without a code are read, so it is
+    a no-op once the corpus is backfilled.
+
+    Returns:
+        Number of codes written
+    """
+    global _uncoded_embeddings
+    db = SessionLocal()
+    try:
+        filled = 0
+        pages = _iter_pages(db, [ScrapedPage.content_embedding], ScrapedPage.content_embedding.isnot(None),
+                            ScrapedPage.embedding_code.is_(None), batch_size=batch_size)
+        for page in pages:
+            db.query(ScrapedPage).filter(ScrapedPage.id == page.id).update(
+                {"embedding_code": binary_code(decode_embedding(page.content_embedding))}, synchronize_session=False)
+            filled += 1
+            if filled % batch_size == 0:
+                db.commit()
+        db.commit()
+        _uncoded_embeddings = False
+        if filled:
+            print(f"✅ Backfilled binary codes for {filled} embeddings.")
+        return filled
+    except Exception as e:
+        print(f"❌ Error backfilling embedding codes: {e}")
+        db.rollback()
+        return 0
+    finally:
+        db.close()
+
+def reencode_embeddings(batch_size: int = 200):
+    """
+    Rewrite stored embeddings in the configured storage format and fill in binary codes.
+
+    Safe to re-run; rows already in the configured format only get their code refreshed.
+    """
+    print(f"Re-encoding embeddings as {EMBEDDING_STORAGE_FORMAT}...")
+    db = SessionLocal()
+    try:
+        updated = 0
+        for page in _iter_pages(db, [ScrapedPage.content_embedding], ScrapedPage.content_embedding.isnot(None), batch_size=batch_size):
+            embedding = decode_embedding(page.content_embedding)
+            db.query(ScrapedPage).filter(ScrapedPage.id == page.id).update({
+                "content_embedding": encode_embedding(embedding, EMBEDDING_STORAGE_FORMAT),
+                "embedding_code": binary_code(embedding),
+            }, synchronize_session=False)
+            updated += 1
+            if updated % batch_size == 0:
+                db.commit()
+        db.commit()
+        print(f"✅ Re-encoded {updated} embeddings.")
+    except Exception as e:
+        print(f"❌ Error re-encoding embeddings: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+def _stale_embedding_criteria():
+    """Canonical stored pages whose embedding is missing or from another embedding version."""
+    return (
+        ScrapedPage.duplicate_of.is_(None),
+        or_(ScrapedPage.embedding_version.is_(None), ScrapedPage.embedding_version != EMBEDDING_VERSION),
+    )
+
+def count_pages_to_reembed() -> int:
+    db = SessionLocal()
+    try:
+        return db.query(func.count(ScrapedPage.id)).filter(*_stale_embedding_criteria(), _has_content()).scalar()
+    finally:
+        db.close()
+
+def iter_pages_to_reembed(batch_size: int = 32):
+    """
+    Stream ``[(page_id, content), ...]`` batches of pages that need embedding with the active version.
+
+    Each batch is read in its own short transaction, so a long migration
+    never pins a snapshot, and pages migrated meanwhile are skipped.
+    """
+    last_id = 0
+    while True:
+        db = SessionLocal()
+        try:
+            page_ids = [row.id for row in db.query(ScrapedPage.id)
+                        .filter(ScrapedPage.id > last_id, *_stale_embedding_criteria(), _has_content())
+                        .order_by(ScrapedPage.id).limit(batch_size)]
+            if not page_ids:
+                return
+            contents = _read_contents(db, page_ids)
+        finally:
+            db.close()
+        last_id = page_ids[-1]
+        yield [(page_id, contents[page_id]) for page_id in page_ids if contents.get(page_id)]
+
+def update_page_embeddings(records: List[Dict[str, Any]]) -> int:
+    """
+    Replace the embeddings of existing pages with active-version vectors, in one transaction.
+
+    Each record has ``page_id``, the model ``embedding`` and ``passages``
+    (as from ``generate_passage_embeddings``). Pages that were re-saved with
+    the active version since they were read are left alone.
+
+    Returns:
+        Number of pages updated
+    """
+    updated = 0
+    embedded = []
+    db = SessionLocal()
+    try:
+        for record in records:
+            embedding = to_stored_embedding(record["embedding"])
+            if embedding is None or len(embedding) == 0:
+                continue
+            result = db.query(ScrapedPage).filter(ScrapedPage.id == record["page_id"], *_stale_embedding_criteria()).update({
+                "content_embedding": encode_embedding(embedding, EMBEDDING_STORAGE_FORMAT),
+                "embedding_code": binary_code(embedding),
+                "embedding_version": EMBEDDING_VERSION,
+                "status": "vectorized",
+                "topic_cluster": None,
+            }, synchronize_session=False)
+            if result:
+                _store_passages(db, {record["page_id"]: record["passages"]})
+                embedded.append((record["page_id"], embedding))
+                updated += 1
+        _assign_topics(db, embedded)
+        db.commit()
+    except Exception as e:
+        print(f"❌ Error updating embeddings: {e}")
+        db.rollback()
+        updated = 0
+    finally:
+        db.close()
+    return updated
+
+def sample_model_embeddings(limit: int = 2000) -> np.ndarray:
+    """Stored unreduced vectors of the configured model (passages first), for fitting a projection."""
+    db = SessionLocal()
+    try:
+        rows = db.query(PagePassage.embedding).filter(PagePassage.embedding_version == FULL_EMBEDDING_VERSION).limit(limit).all()
+        if len(rows) < limit:
+            rows += db.query(ScrapedPage.content_embedding.label("embedding")) \
+                .filter(ScrapedPage.embedding_version == FULL_EMBEDDING_VERSION).limit(limit - len(rows)).all()
+    finally:
+        db.close()
+    vectors = [decode_embedding(row.embedding) for row in rows]
+    vectors = [vector for vector in vectors if len(vector) == EMBEDDING_MODEL_DIM]
+    return np.stack(vectors) if vectors else np.empty((0, EMBEDDING_MODEL_DIM), dtype=np.float32)
+
+def sample_page_contents(limit: int = 200) -> List[str]:
+    """Text of up to ``limit`` canonical pages, for embedding a projection sample from scratch."""
+    db = SessionLocal()
+    try:
+        contents = []
+        for _, content in _iter_page_contents(db, ScrapedPage.duplicate_of.is_(None)):
+            contents.append(content)
+            if len(contents) >= limit:
+                break
+        return contents
+    finally:
+        db.close()
+
+def count_embedded_pages() -> int:
+    """Pages carrying an active-version embedding."""
+    db = SessionLocal()
+    try:
+        return db.query(func.count(ScrapedPage.id)).filter(ScrapedPage.embedding_version == EMBEDDING_VERSION,
+                                                           ScrapedPage.content_embedding.isnot(None)).scalar()
+    finally:
+        db.close()
+
+def iter_stored_embeddings(batch_size: int = 1000):
+    """
+    Stream ``(page_ids, vectors)`` batches of every active-version page embedding, in id order.
+
+    Like ``iter_pages_to_reembed``, each batch is read in its own short
+    transaction so a pass over a large corpus never pins a snapshot.
+    """
+    last_id = 0
+    while True:
+        db = SessionLocal()
+        try:
+            rows = db.query(ScrapedPage.id, ScrapedPage.content_embedding) \
+                .filter(ScrapedPage.id > last_id, ScrapedPage.embedding_version == EMBEDDING_VERSION,
+                        ScrapedPage.content_embedding.isnot(None)) \
+                .order_by(ScrapedPage.id).limit(batch_size).all()
+        finally:
+            db.close()
+        if not rows:
+            return
+        last_id = rows[-1].id
+        pairs = [(row.id, decode_embedding(row.content_embedding)) for row in rows]
+        pairs = [(page_id, vector) for page_id, vector in pairs if len(vector) == EMBEDDING_DIM]
+        if pairs:
+            yield [page_id for page_id, _ in pairs], np.stack([vector for _, vector in pairs])
+
+def save_topic_centroids(centroids: np.ndarray, counts: np.ndarray):
+    """Replace the active version's topic index with freshly fitted centroids (cluster ids ``0..k-1``)."""
+    db = SessionLocal()
+    try:
+        db.query(TopicCentroid).filter(TopicCentroid.version == EMBEDDING_VERSION).delete()
+        db.add_all([TopicCentroid(version=EMBEDDING_VERSION, cluster_id=cluster, centroid=projection_to_bytes(centroid),
+                                  update_count=int(count))
+                    for cluster, (centroid, count) in enumerate(zip(centroids, counts))])
+        db.commit()
+        print(f"✅ Saved {len(centroids)} topic centroids for {EMBEDDING_VERSION}.")
+    except Exception as e:
+        print(f"❌ Error saving topic centroids: {e}")
+        db.rollback()
+    finally:
+        db.close()
+        _invalidate_topic_index()
+
+def update_topic_assignments(page_ids: List[int], clusters: Iterable[int]):
+    """Set the topic cluster of many pages in one transaction."""
+    members: Dict[int, List[int]] = {}
+    for page_id, cluster in zip(page_ids, clusters):
+        members.setdefault(int(cluster), []).append(page_id)
+    db = SessionLocal()
+    try:
+        for cluster, cluster_page_ids in members.items():
+            for batch in _chunked(cluster_page_ids):
+                db.query(ScrapedPage).filter(ScrapedPage.id.in_(batch)) \
+                    .update({"topic_cluster": cluster}, synchronize_session=False)
+        db.commit()
+    except Exception as e:
+        print(f"❌ Error updating topic assignments: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+def refresh_topic_keywords(top_k: int = 10, candidates: int = 50):
+    """
+    Recompute each topic's keyword summary from the full-text index.
+
+    A term scores ``share * log(share / corpus_share)``, where ``share`` is
+    the fraction of the cluster's pages containing it: common within the
+    topic but rare elsewhere ranks first, and vocabulary found on every
+    page of the corpus scores zero.
+    """
+    db = SessionLocal()
+    try:
+        total_documents = db.query(func.count(SearchDocument.page_id)).scalar() or 0
+        sizes = dict(db.query(ScrapedPage.topic_cluster, func.count(ScrapedPage.id))
+                     .filter(ScrapedPage.embedding_version == EMBEDDING_VERSION, ScrapedPage.topic_cluster.isnot(None))
+                     .group_by(ScrapedPage.topic_cluster).all())
+        pages_with_term = func.count(SearchPosting.page_id)
+        for row in db.query(TopicCentroid).filter(TopicCentroid.version == EMBEDDING_VERSION):
+            counts = db.query(SearchPosting.term, pages_with_term.label("pages")) \
+                .join(ScrapedPage, ScrapedPage.id == SearchPosting.page_id) \
+                .filter(ScrapedPage.topic_cluster == row.cluster_id, ScrapedPage.embedding_version == EMBEDDING_VERSION) \
+                .group_by(SearchPosting.term).order_by(pages_with_term.desc()).limit(candidates).all()
+            terms = [count.term for count in counts]
+            frequencies = dict(db.query(SearchPosting.term, pages_with_term).filter(SearchPosting.term.in_(terms))
+                               .group_by(SearchPosting.term).all()) if terms else {}
+            size = sizes.get(row.cluster_id, 0)
+            scores = {}
+            for count in counts:
+                share = count.pages / size
+                corpus_share = frequencies.get(count.term, count.pages) / max(total_documents, count.pages)
+                scores[count.term] = share * np.log(share / corpus_share)
+            ranked = sorted((term for term, score in scores.items() if score > 0), key=scores.get, reverse=True)
+            row.keywords = json.dumps(ranked[:top_k])
+        db.commit()
+    except Exception as e:
+        print(f"❌ Error refreshing topic keywords: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+def _topic_page_criteria():
+    return (ScrapedPage.embedding_version == EMBEDDING_VERSION, ScrapedPage.topic_cluster.isnot(None),
+            ScrapedPage.duplicate_of.is_(None))
+
+def _domain_filter(domain: str):
+    """Pages of ``domain`` (with or without ``www.``, over http or https)."""
+    urls = [f"{scheme}://{host}" for scheme in ("http", "https") for host in (domain, f"www.{domain}")]
+    return or_(ScrapedPage.url.in_(urls), *(ScrapedPage.url.like(f"{url}/%") for url in urls))
+
+def get_topic_summaries() -> List[Dict[str, Any]]:
+    """Every topic of the active version with its page count and keyword summary, largest first."""
+    db = SessionLocal()
+    try:
+        sizes = dict(db.query(ScrapedPage.topic_cluster, func.count(ScrapedPage.id))
+                     .filter(*_topic_page_criteria()).group_by(ScrapedPage.topic_cluster).all())
+        rows = db.query(TopicCentroid.cluster_id, TopicCentroid.keywords) \
+            .filter(TopicCentroid.version == EMBEDDING_VERSION).all()
+    finally:
+        db.close()
+    summaries = [{"cluster": row.cluster_id, "pages": sizes.get(row.cluster_id, 0),
+                  "keywords": json.loads(row.keywords) if row.keywords else []} for row in rows]
+    return sorted(summaries, key=lambda summary: -summary["pages"])
+
+def get_topic_keywords(cluster_ids: Iterable[int]) -> Dict[int, List[str]]:
+    db = SessionLocal()
+    try:
+        rows = db.query(TopicCentroid.cluster_id, TopicCentroid.keywords) \
+            .filter(TopicCentroid.version == EMBEDDING_VERSION, TopicCentroid.cluster_id.in_(list(cluster_ids))).all()
+    finally:
+        db.close()
+    return {row.cluster_id: json.loads(row.keywords) if row.keywords else [] for row in rows}
+
+def get_topic_coverage(domain: str) -> Tuple[Dict[int, int], Dict[int, int]]:
+    """
+    Pages per topic for a site and for everyone else in the stored corpus.
+
+    Returns:
+        ``(own_pages, competitor_pages)``, each mapping cluster id to page count
+    """
+    db = SessionLocal()
+    try:
+        total = dict(db.query(ScrapedPage.topic_cluster, func.count(ScrapedPage.id))
+                     .filter(*_topic_page_criteria()).group_by(ScrapedPage.topic_cluster).all())
+        own = dict(db.query(ScrapedPage.topic_cluster, func.count(ScrapedPage.id))
+                   .filter(*_topic_page_criteria(), _domain_filter(domain)).group_by(ScrapedPage.topic_cluster).all())
+    finally:
+        db.close()
+    return own, {cluster: count - own.get(cluster, 0) for cluster, count in total.items()}
+
+def get_page_topic(url: str) -> Optional[int]:
+    db = SessionLocal()
+    try:
+        row = db.query(ScrapedPage.topic_cluster).filter(ScrapedPage.url == url,
+                                                         ScrapedPage.embedding_version == EMBEDDING_VERSION).first()
+        return row.topic_cluster if row else None
+    finally:
+        db.close()
+
+def get_topic_domains(cluster_ids: Iterable[int], max_pages: int = 5000) -> Counter:
+    """Pages per domain within the given topics (counting at most ``max_pages`` pages)."""
+    domains: Counter = Counter()
+    db = SessionLocal()
+    try:
+        for row in db.query(ScrapedPage.url).filter(*_topic_page_criteria(), ScrapedPage.topic_cluster.in_(list(cluster_ids))) \
+                .limit(max_pages).yield_per(1000):
+            domains[domain_of(row.url)] += 1
+    finally:
+        db.close()
+    return domains
+
+def evaluate_vector_storage(sample_size: int = 50, top_k: int = 10, candidates: int = 100) -> Dict[str, Dict[str, float]]:
+    """Report recall@k and scanned bytes per vector of each storage format on the stored corpus."""
+    db = SessionLocal()
+    try:
+        vectors = [decode_embedding(page.content_embedding)
+                   for page in _iter_pages(db, [ScrapedPage.content_embedding], ScrapedPage.content_embedding.isnot(None))]
+    finally:
+        db.close()
+    vectors = [vector for vector in vectors if len(vector) == EMBEDDING_DIM]
+    if len(vectors) <= top_k:
+        print("Not enough stored embeddings to evaluate recall.")
+        return {}
+    report = evaluate_recall(np.stack(vectors), sample_size, top_k, candidates)
+    for name, stats in report.items():
+        print(f"{name:>12}: recall@{top_k}={stats['recall_at_k']:.3f}, {stats['scan_bytes_per_vector']} bytes/vector")
+    return report
+
+def passage_search(search_embedding: np.ndarray, top_k: int = 10, candidates: int = 200) -> List[Dict[str, Any]]:
+    """
+    Find the stored passages nearest to an embedding.
+
+    Uses the same two-phase scheme as ``compact_vector_search``: a Hamming
+    prefilter over passage codes, then an exact re-rank of the shortlist.
+
+    Returns:
+        Up to ``top_k`` dicts with ``page_id``, ``url``, ``start``, ``end``,
+        ``distance`` and the passage ``text``, nearest first
+    """
+    search_embedding = to_stored_embedding(search_embedding)
+    if search_embedding is None:
+        return []
+    query_code_length = len(binary_code(search_embedding))
+    db = SessionLocal()
+    try:
+        keys, codes = _load_codes(db, [PagePassage.page_id, PagePassage.passage_index], PagePassage.embedding_code,
+                                  query_code_length, PagePassage.embedding_version == EMBEDDING_VERSION)
+        if not keys:
+            return []
+
+        details = {}
+
+        def load_vectors(positions):
+            wanted = [keys[position] for position in positions]
+            for row in db.query(PagePassage).filter(tuple_(PagePassage.page_id, PagePassage.passage_index).in_(wanted)):
+                details[(row.page_id, row.passage_index)] = row
+            return [decode_embedding(details[key].embedding) for key in wanted]
+
+        hits = two_phase_search(np.asarray(search_embedding, dtype=np.float32), codes, load_vectors, top_k, candidates)
+        page_ids = list({keys[position][0] for position, _ in hits})
+        urls = dict(db.query(ScrapedPage.id, ScrapedPage.url).filter(ScrapedPage.id.in_(page_ids)).all())
+    finally:
+        db.close()
+
+    contents = load_page_contents(page_ids)
+    results = []
+    for position, distance in hits:
+        passage = details[keys[position]]
+        content = contents.get(passage.page_id, "")
+        results.append({
+            "page_id": passage.page_id, "url": urls.get(passage.page_id),
+            "start": passage.start_offset, "end": passage.end_offset, "distance": distance,
+            "text": content[passage.start_offset:passage.end_offset],
+        })
+    return results
+
+def search_pages_by_passages(search_embedding: np.ndarray, top_k: int = 5, candidates: int = 200) -> List[Dict[str, Any]]:
+    """
+    Rank pages by their best-matching passage (max-sim aggregation).
+
+    A page covering many topics is matched on whichever passage is closest
+    to the query, instead of on its averaged embedding.
+
+    Returns:
+        Up to ``top_k`` dicts with ``page_id``, ``url``, ``distance`` of the
+        best passage and the matching ``passages`` of that page, best first
+    """
+    pages: Dict[int, Dict[str, Any]] = {}
+    for passage in passage_search(search_embedding, top_k=candidates, candidates=candidates):
+        page = pages.setdefault(passage["page_id"], {
+            "page_id": passage["page_id"], "url": passage["url"], "distance": passage["distance"], "passages": [],
+        })
+        page["passages"].append({key: passage[key] for key in ("start", "end", "distance", "text")})
+    return sorted(pages.values(), key=lambda page: page["distance"])[:top_k]
+
+def hybrid_search(query: str, search_embedding: np.ndarray, top_k: int = 10,
+                  alpha: float = 0.5, candidates: int = 50) -> List[Dict[str, Any]]:
+    """
+    Rank pages by a weighted fusion of BM25 and vector similarity.
+
+    Args:
+        query: Keyword query for the BM25 side
+        search_embedding: Query vector for the similarity side
+        top_k: Number of results to return
+        alpha: Weight of the vector score (0 = BM25 only, 1 = vector only)
+        candidates: How many candidates to take from each side before fusing
+
+    Returns:
+        Up to ``top_k`` dicts with ``page_id``, ``url`` and ``score``, best first
+    """
+    keyword_hits = bm25_search(query, candidates)
+    keyword_scores = {hit["page_id"]: hit["score"] for hit in keyword_hits}
+    urls = {hit["page_id"]: hit["url"] for hit in keyword_hits}
+
+    vector_scores = {}
+    for hit in vector_search(search_embedding, candidates):
+        vector_scores[hit["page_id"]] = 1.0 / (1.0 + hit["distance"])
+        urls[hit["page_id"]] = hit["url"]
+
+    return [
+        {"page_id": page_id, "url": urls[page_id], "score": score}
+        for page_id, score in fuse_scores(keyword_scores, vector_scores, alpha)[:top_k]
+    ]
+
+def load_page_contents(page_ids: List[int]) -> Dict[int, str]:
+    """Fetch the content of the given pages, keyed by page id (pages without content are omitted)."""
+    if not page_ids:
+        return {}
+    db = SessionLocal()
+    try:
+        return {page_id: content for page_id, content in _read_contents(db, page_ids).items() if content}
+    finally:
+        db.close()
+
+def _texts_for_hits(hits: List[Dict[str, Any]]) -> List[str]:
+    contents = load_page_contents([hit["page_id"] for hit in hits])
+    return [contents[hit["page_id"]] for hit in hits if hit["page_id"] in contents]
+
+def search_similar_articles(search_embedding: np.ndarray, keyword: str = "", hybrid: bool = False) -> List[str]:
+    """
+    Search for similar articles using vector similarity or fallback to text-based search.
+
+    With ``hybrid=True`` and a keyword, vector and BM25 scores are fused
+    instead of using vector similarity alone.
+    """
+    competitor_texts = []
+
+    if hybrid and keyword:
+        try:
+            hits = hybrid_search(keyword, search_embedding, top_k=3)
+            competitor_texts = _texts_for_hits(hits)
+            print(f"Hybrid search retrieved {len(competitor_texts)} competitor texts.")
+        except Exception as hybrid_error:
+            print(f"Hybrid search failed: {hybrid_error}")
+            competitor_texts = []
+    else:
+        try:
+            hits = vector_search(search_embedding, top_k=3)
+            competitor_texts = _texts_for_hits(hits)
+            print(f"Vector search retrieved {len(competitor_texts)} competitor texts.")
         except Exception as vector_error:
             print(f"Vector search failed: {vector_error}")
             competitor_texts = []
-    else:
-        # Fallback to text-based search
+
+    if not competitor_texts:
+        # Fallback to BM25 keyword search over the inverted index
         try:
-            with engine.connect() as conn:
-                results = conn.execute(text("""
-                    SELECT content FROM scraped_pages 
-                    WHERE content LIKE :keyword 
-                    LIMIT 3
-                """), {"keyword": f"%{keyword}%" if keyword else "%"}).fetchall()
-                competitor_texts = [row[0] for row in results if row[0]]
-                print(f"Text fallback retrieved {len(competitor_texts)} competitor texts.")
+            if keyword:
+                hits = bm25_search(keyword, top_k=3)
+                competitor_texts = _texts_for_hits(hits)
+            else:
+                db = SessionLocal()
+                try:
+                    page_ids = [row.id for row in db.query(ScrapedPage.id).filter(_has_content()).limit(3)]
+                    competitor_texts = list(_read_contents(db, page_ids).values())
+                finally:
+                    db.close()
+            print(f"Text fallback retrieved {len(competitor_texts)} competitor texts.")
         except Exception as text_error:
             print(f"Text fallback failed: {text_error}")
             competitor_texts = []
 
+    competitor_texts = [competitor_texts[i] for i in unique_text_indices(competitor_texts)]
+
     if not competitor_texts:
         print("No competitor texts found. Using fallback prompt.")
         return ["No relevant competitor texts available. Generate strategy based on general best practices for the keyword."]
@@ -0,0 +1,39 @@
+"""PCA projection of model embeddings down to a smaller stored dimension."""
+from typing import Tuple
+
+import numpy as np
+
+
+def fit_pca(vectors: np.ndarray, dim: int) -> Tuple[np.ndarray, np.ndarray, float]:
+    """
+    Fit a PCA projection on a sample of embeddings.
+
+    Args:
+        vectors: Array of shape ``(n, model_dim)`` with ``n > dim``
+        dim: Number of principal components to keep
+
+    Returns:
+        ``(mean, components, explained)``: the sample mean, a ``(dim, model_dim)``
+        component matrix and the fraction of variance the components retain
+    """
+    vectors = np.asarray(vectors, dtype=np.float64)
+    if vectors.ndim != 2 or len(vectors) <= dim:
+        raise ValueError(f"Need more than {dim} sample vectors to fit a {dim}-dimensional projection.")
+    mean = vectors.mean(axis=0)
+    _, singular_values, components = np.linalg.svd(vectors - mean, full_matrices=False)
+    variance = singular_values ** 2
+    explained = float(variance[:dim].sum() / variance.sum()) if variance.sum() > 0 else 1.0
+    return mean.astype(np.float32), components[:dim].astype(np.float32), explained
+
+
+def project(vectors: np.ndarray, mean: np.ndarray, components: np.ndarray) -> np.ndarray:
+    """Project one vector or a ``(n, model_dim)`` batch onto the fitted components."""
+    return ((np.asarray(vectors, dtype=np.float32) - mean) @ components.T).astype(np.float32)
+
+
+def projection_to_bytes(matrix: np.ndarray) -> bytes:
+    return np.asarray(matrix, dtype="<f4").tobytes()
+
+
+def projection_from_bytes(data: bytes, shape: Tuple[int, ...]) -> np.ndarray:
+    return np.frombuffer(data, dtype="<f4").astype(np.float32).reshape(shape)
@@ -0,0 +1,194 @@
+"""Versioned binary encodings for stored embeddings.
+
+Rows written before compact formats existed hold a bare little-endian fp32
+array (``4 * dim`` bytes, the layout TiDB's ``VECTOR_FROM_BINARY`` reads).
+That layout stays the default and is recognised by its length. Compact
+formats are prefixed with a small header::
+
+    b"AV" | version (1 byte) | format code (1 byte) | dim (uint16 LE) | payload
+
+* ``fp16``: ``2 * dim`` bytes of half floats.
+* ``int8``: a float32 scale followed by ``dim`` signed bytes (symmetric
+  per-vector scalar quantization).
+
+Independently of the storage format, ``binary_code`` packs the sign of each
+component into ``dim / 8`` bytes for a Hamming-distance prefilter.
+"""
+import struct
+from typing import Callable, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+FORMAT_FP32 = "fp32"
+FORMAT_FP16 = "fp16"
+FORMAT_INT8 = "int8"
+STORAGE_FORMATS = (FORMAT_FP32, FORMAT_FP16, FORMAT_INT8)
+
+CODEC_VERSION = 1
+_MAGIC = b"AV"
+_HEADER = struct.Struct("<2sBBH")
+_FORMAT_CODES = {FORMAT_FP16: 1, FORMAT_INT8: 2}
+_FORMAT_NAMES = {code: name for name, code in _FORMAT_CODES.items()}
+
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def encode_embedding(embedding: Sequence[float], storage_format: str = FORMAT_FP32) -> bytes:
+    """Serialize an embedding in the given storage format."""
+    vector = np.asarray(embedding, dtype=np.float32)
+    if storage_format == FORMAT_FP32:
+        return vector.astype("<f4").tobytes()
+    if storage_format not in _FORMAT_CODES:
+        raise ValueError(f"Unknown embedding storage format: {storage_format}")
+
+    header = _HEADER.pack(_MAGIC, CODEC_VERSION, _FORMAT_CODES[storage_format], vector.size)
+    if storage_format == FORMAT_FP16:
+        return header + vector.astype("<f2").tobytes()
+
+    peak = float(np.max(np.abs(vector))) if vector.size else 0.0
+    scale = peak / 127.0 if peak > 0 else 1.0
+    quantized = np.clip(np.rint(vector / scale), -127, 127).astype(np.int8)
+    return header + struct.pack("<f", scale) + quantized.tobytes()
+
+
+def embedding_format(data: bytes) -> str:
+    """Storage format of an encoded embedding."""
+    if len(data) >= _HEADER.size and data[:2] == _MAGIC:
+        _, version, code, dim = _HEADER.unpack_from(data)
+        payload = len(data) - _HEADER.size
+        expected = {1: 2 * dim, 2: 4 + dim}.get(code)
+        if version == CODEC_VERSION and code in _FORMAT_NAMES and payload == expected:
+            return _FORMAT_NAMES[code]
+    return FORMAT_FP32
+
+
+def decode_embedding(data: bytes) -> np.ndarray:
+    """Deserialize an embedding written by ``encode_embedding`` (or a legacy fp32 row)."""
+    storage_format = embedding_format(data)
+    if storage_format == FORMAT_FP32:
+        return np.frombuffer(data, dtype="<f4").astype(np.float32)
+
+    payload = data[_HEADER.size:]
+    if storage_format == FORMAT_FP16:
+        return np.frombuffer(payload, dtype="<f2").astype(np.float32)
+    scale, = struct.unpack_from("<f", payload)
+    return np.frombuffer(payload[4:], dtype=np.int8).astype(np.float32) * scale
+
+
+def binary_code(embedding: Sequence[float]) -> bytes:
+    """1-bit-per-dimension sign code of an embedding."""
+    return np.packbits(np.asarray(embedding, dtype=np.float32) > 0).tobytes()
+
+
+def hamming_distances(query_code: bytes, codes: np.ndarray) -> np.ndarray:
+    """
+    Hamming distance from ``query_code`` to each row of ``codes``.
+
+    Args:
+        query_code: Code from ``binary_code``
+        codes: uint8 array of shape ``(n, len(query_code))``
+    """
+    query = np.frombuffer(query_code, dtype=np.uint8)
+    return _POPCOUNT[np.bitwise_xor(codes, query)].sum(axis=1, dtype=np.int32)
+
+
+def two_phase_search(query: np.ndarray, codes: np.ndarray, load_vectors: Callable[[np.ndarray], np.ndarray],
+                     top_k: int, candidates: int) -> List[Tuple[int, float]]:
+    """
+    Hamming prefilter on binary codes, then exact L2 re-rank of the survivors.
+
+    Args:
+        query: Full-precision query vector
+        codes: uint8 array of shape ``(n, dim / 8)`` with one binary code per row
+        load_vectors: Callable taking candidate row positions and returning
+            their full vectors (decoded), in the same order
+        top_k: Number of results to return
+        candidates: Number of rows kept by the prefilter
+
+    Returns:
+        ``(position, distance)`` pairs, nearest first
+    """
+    if len(codes) == 0:
+        return []
+    distances = hamming_distances(binary_code(query), codes)
+    keep = min(max(candidates, top_k), len(codes))
+    shortlist = np.argpartition(distances, keep - 1)[:keep]
+    vectors = np.asarray(load_vectors(shortlist), dtype=np.float32)
+    exact = np.linalg.norm(vectors - np.asarray(query, dtype=np.float32), axis=1)
+    order = np.argsort(exact)[:top_k]
+    return [(int(shortlist[i]), float(exact[i])) for i in order]
+
+
+def two_phase_search_batch(queries: np.ndarray, codes: np.ndarray, load_vectors: Callable[[np.ndarray], np.ndarray],
+                           top_k: int, candidates: int) -> List[List[Tuple[int, float]]]:
+    """
+    ``two_phase_search`` for many queries over one scan of the codes.
+
+    The shortlists of all queries are merged so each candidate vector is
+    loaded once, and the exact distances of every query to the merged
+    candidates are computed as one matrix product.
+
+    Returns:
+        One list of ``(position, distance)`` pairs per query, nearest first
+    """
+    queries = np.asarray(queries, dtype=np.float32)
+    if len(codes) == 0 or len(queries) == 0:
+        return [[] for _ in range(len(queries))]
+    keep = min(max(candidates, top_k), len(codes))
+    shortlists = [np.argpartition(hamming_distances(binary_code(query), codes), keep - 1)[:keep] for query in queries]
+    merged = np.unique(np.concatenate(shortlists))
+    vectors = np.asarray(load_vectors(merged), dtype=np.float32)
+
+    squared = (np.square(queries).sum(axis=1)[:, None] + np.square(vectors).sum(axis=1)[None, :]
+               - 2.0 * queries @ vectors.T)
+    exact = np.sqrt(np.maximum(squared, 0.0))
+    results = []
+    for row, shortlist in enumerate(shortlists):
+        columns = np.searchsorted(merged, shortlist)
+        order = np.argsort(exact[row, columns])[:top_k]
+        results.append([(int(shortlist[i]), float(exact[row, columns[i]])) for i in order])
+    return results
+
+
+def evaluate_recall(vectors: np.ndarray, sample_size: int = 50, top_k: int = 10,
+                    candidates: int = 100, seed: int = 0) -> Dict[str, Dict[str, float]]:
+    """
+    Measure how compact storage affects nearest-neighbour recall.
+
+    Each sampled vector is used as a query against the whole set. The fp32
+    exact top-k is the reference; every other configuration reports the
+    fraction of that reference it recovers (recall@k) and its bytes/vector.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    rng = np.random.RandomState(seed)
+    queries = rng.choice(len(vectors), size=min(sample_size, len(vectors)), replace=False)
+    dim = vectors.shape[1]
+
+    def exact_top_k(matrix, query):
+        return set(np.argsort(np.linalg.norm(matrix - query, axis=1))[:top_k].tolist())
+
+    decoded = {
+        storage_format: np.stack([decode_embedding(encode_embedding(vector, storage_format)) for vector in vectors])
+        for storage_format in STORAGE_FORMATS
+    }
+    codes = np.stack([np.frombuffer(binary_code(vector), dtype=np.uint8) for vector in vectors])
+    report = {}
+    for query_index in queries:
+        query = vectors[query_index]
+        reference = exact_top_k(vectors, query)
+        results = {name: exact_top_k(matrix, query) for name, matrix in decoded.items()}
+        for name, matrix in decoded.items():
+            hits = two_phase_search(query, codes, lambda rows, m=matrix: m[rows], top_k, candidates)
+            results[f"binary+{name}"] = {position for position, _ in hits}
+        for name, found in results.items():
+            report.setdefault(name, []).append(len(found & reference) / len(reference))
+
+    sizes = {name: len(encode_embedding(vectors[0], name)) for name in STORAGE_FORMATS}
+    code_size = (dim + 7) // 8
+    return {
+        name: {
+            "recall_at_k": float(np.mean(recalls)),
+            "scan_bytes_per_vector": code_size if name.startswith("binary+") else sizes[name],
+        }
+        for name, recalls in report.items()
+    }
@@ -0,0 +1,57 @@
+"""Structured view of a fetched HTML page for the SEO analyzers."""
+import json
+from dataclasses import dataclass, field
+from typing import Any, Dict, List
+from urllib.parse import urljoin, urlsplit
+
+from bs4 import BeautifulSoup
+
+from src.analyzers.boilerplate import domain_of
+from src.scrapers.web_scraper import extract_text
+
+
+@dataclass
+class ParsedPage:
+    """A fetched page as the analyzers read it (``soup`` is the live parse tree)."""
+    url: str
+    html: str
+    soup: BeautifulSoup
+    title: str = ""
+    meta_description: str = ""
+    h1_tags: List[str] = field(default_factory=list)
+    text_content: str = ""
+    links: Dict[str, List[str]] = field(default_factory=dict)
+    structured_data: List[Any] = field(default_factory=list)
+
+
+def parse_page(url: str, html: str) -> ParsedPage:
+    """Parse ``html`` fetched from ``url``; call ``page.soup.decompose()`` when done with it."""
+    soup = BeautifulSoup(html, "html.parser")
+    description = soup.find("meta", attrs={"name": "description"})
+
+    structured_data = []
+    for script in soup.find_all("script", type="application/ld+json"):
+        try:
+            structured_data.append(json.loads(script.string or ""))
+        except ValueError:
+            continue
+
+    host = domain_of(url)
+    links = {"internal": [], "external": []}
+    for anchor in soup.find_all("a", href=True):
+        target = urljoin(url, anchor["href"])
+        if urlsplit(target).scheme in ("http", "https"):
+            links["internal" if domain_of(target) == host else "external"].append(target)
+
+    return ParsedPage(
+        url=url,
+        html=html,
+        soup=soup,
+        title=soup.title.get_text(strip=True) if soup.title else "",
+        meta_description=(description.get("content") or "").strip() if description else "",
+        h1_tags=[h1.get_text(" ", strip=True) for h1 in soup.find_all("h1")],
+        text_content=extract_text(soup),
+        links=links,
+        structured_data=structured_data,
+    )
+
@@ -0,0 +1,439 @@
+"""Whole-site crawler with a persistent frontier, Bloom-filter dedupe and robots.txt caching."""
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import struct
+import sys
+import time
+import xml.etree.ElementTree as ElementTree
+from collections import OrderedDict
+from typing import Callable, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qsl, urldefrag, urlencode, urljoin, urlsplit, urlunsplit
+from urllib.robotparser import RobotFileParser
+
+import requests
+from bs4 import BeautifulSoup
+
+from src.config.memory import LOW_MEMORY_MODE
+
+from .web_scraper import HEADERS, fetch_html, page_text, read_body
+
+TRACKING_PREFIX = "utm_"
+TRACKING_PARAMS = {"gclid", "fbclid", "msclkid", "mc_cid", "mc_eid", "_ga"}
+SKIPPED_EXTENSIONS = (
+    ".jpg", ".jpeg", ".png", ".gif", ".svg", ".webp", ".ico", ".pdf", ".zip", ".gz",
+    ".mp3", ".mp4", ".avi", ".mov", ".css", ".js", ".json", ".xml", ".woff", ".woff2",
+)
+ROBOTS_CACHE_HOSTS = 100 if LOW_MEMORY_MODE else 1000
+SITEMAP_PRIORITY = 1  # Sitemap URLs are crawled as if linked from the start page
+MAX_SITEMAPS_PER_HOST = 20
+
+
+def normalize_url(url: str, base_url: Optional[str] = None) -> Optional[str]:
+    """
+    Canonicalize a URL so that trivially different spellings dedupe together.
+
+    Resolves it against ``base_url``, lowercases scheme and host, drops
+    default ports, fragments and tracking parameters, sorts the query and
+    collapses an empty path to ``/``.
+
+    Returns:
+        The normalized URL, or None for non-HTTP(S) links
+    """
+    if base_url:
+        url = urljoin(base_url, url)
+    url, _ = urldefrag(url.strip())
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    if scheme not in ("http", "https") or not parts.hostname:
+        return None
+
+    host = parts.hostname.lower()
+    if parts.port and not (scheme == "http" and parts.port == 80) and not (scheme == "https" and parts.port == 443):
+        host = f"{host}:{parts.port}"
+    query = urlencode(sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith(TRACKING_PREFIX) and key.lower() not in TRACKING_PARAMS
+    ))
+    return urlunsplit((scheme, host, parts.path or "/", query, ""))
+
+
+def site_of(url: str) -> str:
+    """Host (and port) of a normalized URL with any ``www.`` prefix dropped, so both spellings are one site."""
+    netloc = urlsplit(url).netloc
+    return netloc[4:] if netloc.startswith("www.") else netloc
+
+
+def _write_atomically(path: str, data: bytes):
+    """Replace ``path`` with ``data`` so a crash mid-write leaves the previous file intact."""
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as handle:
+        handle.write(data)
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(temporary, path)
+
+
+class BloomFilter:
+    """Fixed-size probabilistic set of seen URLs (false positives only, no false negatives)."""
+
+    def __init__(self, capacity: int = 1_000_000, error_rate: float = 0.001):
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str) -> Iterable[int]:
+        # Kirsch-Mitzenmacher double hashing: k positions from one 128-bit digest
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        first, second = struct.unpack("<QQ", digest)
+        return ((first + i * second) % self.size for i in range(self.hash_count))
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+    def add(self, item: str) -> bool:
+        """Add an item; returns False if it was (probably) already present."""
+        added = False
+        for position in self._positions(item):
+            mask = 1 << (position & 7)
+            if not self.bits[position >> 3] & mask:
+                self.bits[position >> 3] |= mask
+                added = True
+        self.count += int(added)
+        return added
+
+    def save(self, path: str):
+        _write_atomically(path, struct.pack("<QQQ", self.size, self.hash_count, self.count) + bytes(self.bits))
+
+    @classmethod
+    def load(cls, path: str) -> "BloomFilter":
+        bloom = cls.__new__(cls)
+        with open(path, "rb") as handle:
+            bloom.size, bloom.hash_count, bloom.count = struct.unpack("<QQQ", handle.read(24))
+            bloom.bits = bytearray(handle.read())
+        return bloom
+
+
+class CrawlFrontier:
+    """
+    Priority queue of URLs to crawl, stored in SQLite so it can exceed memory.
+
+    Lower priority values are crawled first; ties go in insertion order.
+    Pops only become durable on ``commit``, so URLs taken since the last
+    checkpoint are crawled again after a crash.
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS frontier ("
+            "seq INTEGER PRIMARY KEY AUTOINCREMENT, url TEXT NOT NULL, depth INTEGER NOT NULL, priority INTEGER NOT NULL)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS frontier_order ON frontier (priority, seq)")
+
+    def push(self, url: str, depth: int, priority: Optional[int] = None):
+        self.connection.execute(
+            "INSERT INTO frontier (url, depth, priority) VALUES (?, ?, ?)",
+            (url, depth, depth if priority is None else priority),
+        )
+
+    def pop(self) -> Optional[Tuple[str, int]]:
+        row = self.connection.execute(
+            "SELECT seq, url, depth FROM frontier ORDER BY priority, seq LIMIT 1"
+        ).fetchone()
+        if row is None:
+            return None
+        self.connection.execute("DELETE FROM frontier WHERE seq = ?", (row[0],))
+        return row[1], row[2]
+
+    def __len__(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM frontier").fetchone()[0]
+
+    def commit(self):
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+
+class RobotsCache:
+    """Per-host robots.txt rules and sitemap URLs, with a bounded LRU of hosts."""
+
+    def __init__(self, user_agent: str = HEADERS["User-Agent"], max_hosts: int = ROBOTS_CACHE_HOSTS, timeout: int = 10):
+        self.user_agent = user_agent
+        self.max_hosts = max_hosts
+        self.timeout = timeout
+        self._hosts: "OrderedDict[str, RobotFileParser]" = OrderedDict()
+
+    def _parser(self, url: str) -> RobotFileParser:
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        if origin in self._hosts:
+            self._hosts.move_to_end(origin)
+            return self._hosts[origin]
+
+        parser = RobotFileParser(f"{origin}/robots.txt")
+        try:
+            response = requests.get(parser.url, headers=HEADERS, timeout=self.timeout)
+            if response.status_code >= 500:
+                parser.disallow_all = True
+            elif response.status_code >= 400:
+                parser.allow_all = True
+            else:
+                parser.parse(response.text.splitlines())
+        except requests.RequestException as e:
+            print(f"Could not fetch {parser.url}, treating host as disallowed: {e}")
+            parser.disallow_all = True
+
+        self._hosts[origin] = parser
+        if len(self._hosts) > self.max_hosts:
+            self._hosts.popitem(last=False)
+        return parser
+
+    def allowed(self, url: str) -> bool:
+        return self._parser(url).can_fetch(self.user_agent, url)
+
+    def crawl_delay(self, url: str) -> Optional[float]:
+        delay = self._parser(url).crawl_delay(self.user_agent)
+        return float(delay) if delay is not None else None
+
+    def sitemaps(self, url: str) -> List[str]:
+        parts = urlsplit(url)
+        return self._parser(url).site_maps() or [f"{parts.scheme}://{parts.netloc}/sitemap.xml"]
+
+
+def _sitemap_locations(xml_text: bytes) -> Tuple[List[str], List[str]]:
+    """Split a sitemap document into ``(page_urls, child_sitemap_urls)``."""
+    try:
+        root = ElementTree.fromstring(xml_text)
+    except ElementTree.ParseError:
+        return [], []
+    locations = [element.text.strip() for element in root.iter() if element.tag.endswith("loc") and element.text]
+    if root.tag.endswith("sitemapindex"):
+        return [], locations
+    return locations, []
+
+
+class SiteCrawler:
+    """
+    Crawls one site breadth-first within a depth and page budget.
+
+    Seen URLs are deduplicated with a Bloom filter and pending URLs live in an
+    on-disk frontier, so memory stays bounded however large the site is. With
+    a ``checkpoint_dir`` the crawl can be stopped and resumed; the checkpoint
+    is cleared once the frontier is exhausted, so the next run starts over.
+    """
+
+    def __init__(self, start_url: str, page_handler: Callable[[str, str], None],
+                 max_depth: int = 3, max_pages: int = 500, checkpoint_dir: Optional[str] = None,
+                 checkpoint_every: int = 25, request_delay: float = 1.0,
+                 expected_urls: int = 1_000_000, use_sitemaps: bool = True, fresh: bool = False):
+        """
+        Args:
+            start_url: Where the crawl begins; only URLs on the same site (with or
+                without ``www.``) are followed
+            page_handler: Called with ``(url, text)`` for every crawled page
+            max_depth: Maximum link distance from the start URL
+            max_pages: Page budget for the whole crawl (including resumed runs)
+            checkpoint_dir: Directory for the frontier, Bloom filter and progress
+            checkpoint_every: Pages between checkpoints
+            request_delay: Minimum seconds between requests (raised by robots.txt Crawl-delay)
+            expected_urls: Bloom filter capacity
+            use_sitemaps: Seed the frontier from the host's sitemaps
+            fresh: Discard any checkpoint in ``checkpoint_dir`` instead of resuming it
+        """
+        self.start_url = normalize_url(start_url)
+        if not self.start_url:
+            raise ValueError(f"Not an HTTP(S) URL: {start_url}")
+        self.host = urlsplit(self.start_url).netloc
+        self.site = site_of(self.start_url)
+        self.page_handler = page_handler
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.checkpoint_dir = checkpoint_dir
+        self.checkpoint_every = checkpoint_every
+        self.request_delay = request_delay
+        self.use_sitemaps = use_sitemaps
+        self.robots = RobotsCache()
+        self.pages_crawled = 0
+        self._checkpointed_pages = 0
+        self._last_request_at = 0.0
+
+        frontier_path = ":memory:"
+        resuming = False
+        if checkpoint_dir:
+            os.makedirs(checkpoint_dir, exist_ok=True)
+            frontier_path = self._frontier_path
+            resuming = not fresh and os.path.exists(self._state_path)
+            if not resuming:
+                # Also drops a frontier left by a run that stopped before its first checkpoint
+                self._remove_checkpoint()
+        self.frontier = CrawlFrontier(frontier_path)
+
+        if resuming:
+            with open(self._state_path) as handle:
+                state = json.load(handle)
+            self.pages_crawled = self._checkpointed_pages = state["pages_crawled"]
+            self.seen = BloomFilter.load(self._bloom_path)
+            print(f"Resuming crawl of {self.host}: {self.pages_crawled} pages done, {len(self.frontier)} queued.")
+        else:
+            self.seen = BloomFilter(capacity=expected_urls)
+            self._enqueue(self.start_url, 0)
+            if use_sitemaps:
+                self._seed_from_sitemaps()
+
+    @property
+    def _state_path(self) -> str:
+        return os.path.join(self.checkpoint_dir, "state.json")
+
+    @property
+    def _bloom_path(self) -> str:
+        return os.path.join(self.checkpoint_dir, "seen.bloom")
+
+    @property
+    def _frontier_path(self) -> str:
+        return os.path.join(self.checkpoint_dir, "frontier.sqlite3")
+
+    def _remove_checkpoint(self):
+        for path in (self._state_path, self._bloom_path, self._frontier_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _in_scope(self, url: str) -> bool:
+        return site_of(url) == self.site and not urlsplit(url).path.lower().endswith(SKIPPED_EXTENSIONS)
+
+    def _enqueue(self, url: Optional[str], depth: int, priority: Optional[int] = None):
+        if url and depth <= self.max_depth and self._in_scope(url) and self.seen.add(url):
+            self.frontier.push(url, depth, priority)
+
+    def _throttle(self, url: str):
+        delay = max(self.request_delay, self.robots.crawl_delay(url) or 0.0)
+        wait = self._last_request_at + delay - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        self._last_request_at = time.monotonic()
+
+    def _seed_from_sitemaps(self):
+        pending = list(self.robots.sitemaps(self.start_url))
+        fetched = 0
+        while pending and fetched < MAX_SITEMAPS_PER_HOST:
+            sitemap_url = pending.pop(0)
+            fetched += 1
+            try:
+                self._throttle(sitemap_url)
+                xml_text = read_body(fetch_html(sitemap_url, stream=True))
+            except requests.RequestException as e:
+                print(f"Skipping sitemap {sitemap_url}: {e}")
+                continue
+            page_urls, child_sitemaps = _sitemap_locations(xml_text)
+            pending.extend(child_sitemaps)
+            for page_url in page_urls:
+                self._enqueue(normalize_url(page_url), SITEMAP_PRIORITY, SITEMAP_PRIORITY)
+        print(f"Seeded frontier from {fetched} sitemaps: {len(self.frontier)} URLs queued.")
+
+    def checkpoint(self):
+        """Persist the frontier, Bloom filter and progress counters."""
+        if not self.checkpoint_dir:
+            return
+        self.frontier.commit()
+        self.seen.save(self._bloom_path)
+        state = {"start_url": self.start_url, "pages_crawled": self.pages_crawled}
+        _write_atomically(self._state_path, json.dumps(state).encode("utf-8"))
+        self._checkpointed_pages = self.pages_crawled
+
+    def _crawl_page(self, url: str, depth: int):
+        self._throttle(url)
+        response = fetch_html(url, stream=True)
+        if "html" not in response.headers.get("Content-Type", "html"):
+            response.close()
+            return
+
+        final_url = normalize_url(response.url) or url
+        if final_url != url:
+            # Redirects land on a URL of their own; dedupe on it as well
+            if not self._in_scope(final_url) or not self.seen.add(final_url):
+                response.close()
+                return
+
+        soup = BeautifulSoup(read_body(response), "html.parser")
+        canonical = soup.find("link", rel="canonical", href=True)
+        canonical_url = normalize_url(canonical["href"], final_url) if canonical else None
+        if canonical_url and canonical_url != final_url:
+            # A variant of another page: crawl the canonical version instead
+            self._enqueue(canonical_url, depth)
+            return
+
+        if depth < self.max_depth:
+            for link in soup.find_all("a", href=True):
+                self._enqueue(normalize_url(link["href"], final_url), depth + 1)
+
+        text = page_text(final_url, soup, learn=True)
+        soup.decompose()
+        if text:
+            self.page_handler(final_url, text)
+            self.pages_crawled += 1
+
+    def crawl(self) -> int:
+        """
+        Crawl until the frontier is empty or the page budget is spent.
+
+        Returns:
+            Total pages handed to ``page_handler`` (including resumed runs)
+        """
+        print(f"--- Crawling {self.host} (depth {self.max_depth}, budget {self.max_pages}) ---")
+        exhausted = False
+        try:
+            while self.pages_crawled < self.max_pages:
+                item = self.frontier.pop()
+                if item is None:
+                    break
+                url, depth = item
+                if not self.robots.allowed(url):
+                    print(f"Disallowed by robots.txt: {url}")
+                    continue
+                try:
+                    print(f"[{self.pages_crawled + 1}/{self.max_pages}] depth {depth}: {url}")
+                    self._crawl_page(url, depth)
+                except requests.RequestException as e:
+                    print(f"Error crawling {url}: {e}")
+                except Exception as e:
+                    print(f"Error handling {url}: {e}")
+                if self.pages_crawled - self._checkpointed_pages >= self.checkpoint_every:
+                    self.checkpoint()
+            exhausted = len(self.frontier) == 0
+        finally:
+            if exhausted:
+                self.frontier.close()
+                if self.checkpoint_dir:
+                    self._remove_checkpoint()
+            else:
+                # Interrupted or out of budget: keep the queue so a later run can resume it
+                self.checkpoint()
+                self.frontier.close()
+        print(f"✅ Crawl of {self.host} finished: {self.pages_crawled} pages.")
+        return self.pages_crawled
+
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if arg != "--fresh"]
+    if not args:
+        print("❌ Please provide a site URL to crawl.")
+        print("   Usage: python -m src.scrapers.site_crawler <start_url> [max_pages] [max_depth] [--fresh]")
+    else:
+        from src.database.manager import create_tables
+        from src.agents.indexer import index_content
+
+        create_tables()
+        start = args[0]
+        checkpoint = os.path.join("data", "crawls", urlsplit(start).netloc or "site")
+        SiteCrawler(
+            start,
+            page_handler=index_content,
+            max_pages=int(args[1]) if len(args) > 1 else 500,
+            max_depth=int(args[2]) if len(args) > 2 else 3,
+            checkpoint_dir=checkpoint,
+            fresh="--fresh" in sys.argv,
+        ).crawl()
@@ -1,20 +1,130 @@
+import threading
+from typing import List, Optional
+
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, NavigableString
+
+from src.config.memory import LOW_MEMORY_MODE
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.114 Safari/537.36'
+}
+MAX_TEXT_LENGTH = 10000  # Truncate to 10k chars to avoid OOM
+MAX_BLOCK_CHARS = 4 * MAX_TEXT_LENGTH  # Room to drop template blocks before truncating
+# A parsed tree costs several times the HTML size, so cap what is downloaded at all
+MAX_HTML_BYTES = (1 if LOW_MEMORY_MODE else 5) * 1024 * 1024
+# Elements that start a new text block; inline markup (links, bold, spans) stays inside its sentence
+BLOCK_TAGS = frozenset({
+    "address", "article", "aside", "blockquote", "body", "button", "caption", "dd", "details", "dialog", "div",
+    "dl", "dt", "fieldset", "figcaption", "figure", "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6",
+    "header", "html", "label", "legend", "li", "main", "nav", "ol", "option", "p", "pre", "section", "summary",
+    "table", "td", "th", "tr", "ul",
+})
+
+def fetch_html(url: str, timeout: float = 15, stream: bool = False) -> requests.Response:
+    """Fetches a URL with browser-like headers; raises requests.RequestException on failure."""
+    response = requests.get(url, headers=HEADERS, timeout=timeout, stream=stream)
+    response.raise_for_status()
+    return response
+
+def read_body(response: requests.Response, max_bytes: int = MAX_HTML_BYTES,
+              cancelled: Optional[threading.Event] = None) -> bytes:
+    """Reads a streamed response body, stopping after max_bytes or once ``cancelled`` is set."""
+    chunks = []
+    size = 0
+    try:
+        for chunk in response.iter_content(chunk_size=64 * 1024):
+            if cancelled is not None and cancelled.is_set():
+                break
+            chunks.append(chunk)
+            size += len(chunk)
+            if size >= max_bytes:
+                print(f"Truncated {response.url} at {max_bytes} bytes.")
+                break
+    finally:
+        response.close()
+    return b''.join(chunks)[:max_bytes]
+
+def _block_parent(string: NavigableString):
+    for parent in string.parents:
+        if parent.name in BLOCK_TAGS:
+            return parent
+    return None
+
+def extract_blocks(soup: BeautifulSoup, max_chars: int = MAX_BLOCK_CHARS) -> List[str]:
+    """
+    Visible text of a parsed page as block-level runs in document order, stopping once max_chars are collected.
 
-def scrape_url(url: str):
-    """Fetches and parses the content of a URL, pretending to be a browser."""
+    Consecutive strings under the same block element are joined, so a link or
+    bold phrase stays part of its sentence instead of becoming a block of its own.
+    """
+    blocks = []
+    current_parent = None
+    length = -1
+    for string in soup.descendants:
+        # Skips tags, comments, doctypes and script/style/template contents, like stripped_strings
+        if type(string) is not NavigableString:
+            continue
+        text = string.strip()
+        if not text:
+            continue
+        parent = _block_parent(string)
+        if blocks and parent is current_parent:
+            blocks[-1] = f"{blocks[-1]} {text}"
+        else:
+            blocks.append(text)
+            current_parent = parent
+        # Stop walking the tree once the cap is reached instead of collecting every string
+        length += len(text) + 1
+        if length >= max_chars:
+            break
+    return blocks
+
+def extract_text(soup: BeautifulSoup) -> str:
+    """Joins the visible strings of a parsed page, truncated to MAX_TEXT_LENGTH."""
+    return ' '.join(extract_blocks(soup, MAX_TEXT_LENGTH))[:MAX_TEXT_LENGTH]
+
+def page_text(url: str, soup: BeautifulSoup, learn: bool = False) -> str:
+    """
+    Page text with the domain's learned template blocks removed, truncated to MAX_TEXT_LENGTH.
+
+    Pass ``learn`` only for pages that are about to be stored: they are
+    counted into the domain's template model.
+    """
+    blocks = extract_blocks(soup)
+    try:
+        # Imported here so the scraper stays usable without a configured database
+        from src.database.manager import learn_domain_template, strip_domain_boilerplate
+        if learn and learn_domain_template(url, blocks):
+            # The template just formed, so the domain's pages stored so far still carry it
+            from src.agents.recrawler import start_domain_restrip
+            start_domain_restrip(url)
+        blocks = strip_domain_boilerplate(url, blocks)
+    except Exception as e:
+        print(f"Boilerplate stripping skipped for {url}: {e}")
+    return ' '.join(blocks)[:MAX_TEXT_LENGTH]
+
+def scrape_url(url: str, timeout: float = 15, cancelled: Optional[threading.Event] = None, learn: bool = False):
+    """
+    Fetches and parses the content of a URL, pretending to be a browser.
+
+    A caller that stops waiting sets ``cancelled``; the scrape then returns
+    None without parsing the page or touching the database. Callers that
+    store the page pass ``learn`` (see ``page_text``).
+    """
     print(f"Scraping URL: {url}")
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.114 Safari/537.36'
-        }
-        
-        response = requests.get(url, headers=headers, timeout=15)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.content, 'html.parser')
-        text_content = ' '.join(soup.stripped_strings)[:10000]  # Truncate to 10k chars to avoid OOM
-        
+        response = fetch_html(url, timeout=timeout, stream=True)
+        html = read_body(response, cancelled=cancelled)
+        if cancelled is not None and cancelled.is_set():
+            print(f"Scrape of {url} abandoned.")
+            return None
+
+        soup = BeautifulSoup(html, 'html.parser')
+        del html
+        text_content = page_text(response.url or url, soup, learn=learn)
+        soup.decompose()  # Break the tree's reference cycles so it is freed right away
+
         print(f"Successfully scraped {len(text_content)} characters.")
         return text_content
     except requests.RequestException as e:
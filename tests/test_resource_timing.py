@@ -0,0 +1,153 @@
+"""ResourceTimer against a local HTTP server: size fallbacks, compressed stylesheets and the per-site cache."""
+import gzip
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from bs4 import BeautifulSoup
+
+from src.analyzers.resource_timing import KIND_FONT, KIND_IMAGE, KIND_SCRIPT, KIND_STYLESHEET, ResourceTimer
+
+CSS = b"""
+@font-face { font-family: Body; src: url(fonts/body.woff2) format("woff2"); }
+@font-face { font-family: Head; src: url("/fonts/head.woff") format("woff"); }
+body { font-family: Body, sans-serif; }
+""" * 20
+CSS_GZIP = gzip.compress(CSS)
+
+PAGES = {
+    "/page1.html": """<html><head>
+        <link rel="stylesheet" href="/style.css"><script src="/app.js"></script>
+        </head><body><img src="/no-head.png"><img src="/no-range.jpg"></body></html>""",
+    "/page2.html": """<html><head>
+        <link rel="stylesheet" href="/style.css"><script src="/app.js"></script>
+        </head><body><script src="/other.js" async></script></body></html>""",
+}
+SIZES = {"/app.js": 1200, "/other.js": 300, "/no-head.png": 5000, "/no-range.jpg": 3000,
+         "/fonts/body.woff2": 20000, "/fonts/head.woff": 24000}
+
+
+class SiteHandler(BaseHTTPRequestHandler):
+    """
+    A small site whose servers misbehave in the ways ResourceTimer works around.
+
+    ``/no-head.png`` rejects HEAD but honours Range; ``/no-range.jpg`` rejects
+    HEAD, ignores Range and sends no Content-Length. The stylesheet is gzipped.
+    """
+    requests_seen = []
+
+    def log_message(self, *args):
+        pass
+
+    def _body(self):
+        if self.path in PAGES:
+            return PAGES[self.path].encode(), {"Content-Type": "text/html"}
+        if self.path == "/style.css":
+            return CSS_GZIP, {"Content-Type": "text/css", "Content-Encoding": "gzip"}
+        if self.path in SIZES:
+            return b"x" * SIZES[self.path], {}
+        return None, {}
+
+    def do_HEAD(self):
+        self.requests_seen.append(("HEAD", self.path))
+        body, headers = self._body()
+        if body is None or self.path in ("/no-head.png", "/no-range.jpg"):
+            self.send_response(405 if body is not None else 404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+
+    def do_GET(self):
+        self.requests_seen.append(("GET", self.path))
+        body, headers = self._body()
+        if body is None:
+            self.send_error(404)
+            return
+        if self.path == "/no-head.png" and self.headers.get("Range") == "bytes=0-0":
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes 0-0/{len(body)}")
+            self.send_header("Content-Length", "1")
+            self.end_headers()
+            self.wfile.write(body[:1])
+            return
+        self.send_response(200)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        if self.path != "/no-range.jpg":
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture(scope="module")
+def site():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SiteHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def timer():
+    SiteHandler.requests_seen.clear()
+    timer = ResourceTimer(timeout=5.0)
+    yield timer
+    timer.close()
+
+
+def measure(timer, site, path):
+    return timer.measure_page(site + path, BeautifulSoup(PAGES[path], "html.parser"))
+
+
+def by_path(report, site):
+    return {resource["url"][len(site):]: resource for resource in report["resources"]}
+
+
+def test_size_fallbacks(site, timer):
+    resources = by_path(measure(timer, site, "/page1.html"), site)
+
+    assert (resources["/app.js"]["method"], resources["/app.js"]["bytes"]) == ("HEAD", 1200)
+    assert (resources["/no-head.png"]["method"], resources["/no-head.png"]["bytes"]) == ("RANGE", 5000)
+    assert (resources["/no-range.jpg"]["method"], resources["/no-range.jpg"]["bytes"]) == ("GET", 3000)
+    assert resources["/app.js"]["kind"] == KIND_SCRIPT and resources["/app.js"]["render_blocking"]
+    assert resources["/no-head.png"]["kind"] == KIND_IMAGE and not resources["/no-head.png"]["render_blocking"]
+    assert all(resource["error"] is None for resource in resources.values())
+
+
+def test_gzip_stylesheet_fonts(site, timer):
+    report = measure(timer, site, "/page1.html")
+    resources = by_path(report, site)
+
+    stylesheet = resources["/style.css"]
+    assert stylesheet["kind"] == KIND_STYLESHEET and stylesheet["render_blocking"]
+    assert stylesheet["bytes"] == len(CSS_GZIP) < len(CSS)  # Transfer size, not the decoded size
+    assert sorted(font[len(site):] for font in stylesheet["fonts"]) == ["/fonts/body.woff2", "/fonts/head.woff"]
+    for path in ("/fonts/body.woff2", "/fonts/head.woff"):
+        assert resources[path]["kind"] == KIND_FONT
+        assert resources[path]["bytes"] == SIZES[path]
+    assert report["bytes_by_kind"][KIND_FONT] == SIZES["/fonts/body.woff2"] + SIZES["/fonts/head.woff"]
+    assert report["request_count"] == 1 + 6
+
+
+def test_cache_reuse_across_pages(site, timer):
+    measure(timer, site, "/page1.html")
+    report = measure(timer, site, "/page2.html")
+    resources = by_path(report, site)
+
+    shared = ["/style.css", "/app.js", "/fonts/body.woff2", "/fonts/head.woff"]
+    assert all(resources[path]["cached"] for path in shared)
+    assert not resources["/other.js"]["cached"]
+    assert report["cached_resources"] == len(shared)
+    # Fonts of a cached stylesheet are still reported, and nothing shared was requested twice
+    for path in shared:
+        assert sum(seen_path == path for _, seen_path in SiteHandler.requests_seen) == 1
+    assert report["page_weight_bytes"] == (len(PAGES["/page2.html"]) + len(CSS_GZIP) + SIZES["/app.js"]
+                                           + SIZES["/other.js"] + SIZES["/fonts/body.woff2"]
+                                           + SIZES["/fonts/head.woff"])